@@ -1,8 +1,25 @@
-import streamlit as st
+import uuid
+from dataclasses import astuple
+
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+import streamlit as st
+import streamlit.components.v1 as components
+
+from sandbox import cache, profiling
+from sandbox.broadcast import broadcast_hub, mixed_content, valid_room
+from sandbox.channel import CHANNEL_RISK_LIMIT, simulate_channel
+from sandbox.cube import open_cube
+from sandbox.jobs import job_pool
+from sandbox.loanbook import apply_losses, book_for_volume, credit_losses
+from sandbox.model import CALIBRATION, DEFAULT_COEFFICIENTS, DRIVERS, RISK_THRESHOLD, WATERFALL_ITEMS, IncrementalModel
+from sandbox.optimizer import Constraints, optimize
+from sandbox.projection import project
+from sandbox.sensitivity import elasticities
+from sandbox.simulation import simulate_progressive
+from sandbox.sobol import RADAR_DRIVERS, sobol_progressive
+from sandbox.store import ScenarioStore
+from sandbox.surface import SURFACES, profit_surface
+from sandbox.theme import STYLESHEETS, THEME_LABELS
 
 # ===============================
 # 页面设置 Page Config
@@ -14,540 +31,46 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 性能剖析 (?profile=1), 未开启时只读时钟
+laps = profiling.stopwatch()
+
 # ===============================
-# 主题切换器 (放在最前面)
+# 观众模式 (?view=<房间>): 只嵌入主讲人的广播页面, 不运行模型
 # ===============================
-if 'theme' not in st.session_state:
-    st.session_state.theme = "dark"
+viewer_room = st.query_params.get("view")
+if valid_room(viewer_room):
+    hub = broadcast_hub()
+    if hub.error is not None:
+        st.error(f"📡 Broadcast server unavailable / 广播服务不可用: {hub.error}")
+    else:
+        url = hub.url(viewer_room, st.context.headers.get("host"))
+        if mixed_content(url, st.context.headers):
+            # HTTPS 页面中的 http:// iframe 会被浏览器拦截, 改为新标签页打开
+            st.warning(
+                "📡 HTTPS dashboards cannot embed the http:// viewer page; set SANDBOX_BROADCAST_URL / "
+                f"HTTPS 页面无法嵌入 http:// 观众页面, 请设置 SANDBOX_BROADCAST_URL: [{url}]({url})"
+            )
+        else:
+            components.iframe(url, height=2000, scrolling=True)
+    st.stop()
 
 # ===============================
-# CSS 样式定义 - 支持亮色和暗色主题
+# 主题切换 (放在最前面) - 绑定 session_state, 单次运行即生效
 # ===============================
-def get_css(theme):
-    if theme == "light":
-        return """
-<style>
-/* 隐藏 Streamlit 默认顶部导航栏 */
-#MainMenu {visibility: hidden;}
-header {visibility: hidden;}
-.stDeployButton {display: none;}
-
-/* 移除顶部空白 */
-.block-container {
-    padding-top: 1rem !important;
-    padding-bottom: 0rem !important;
-}
-
-/* 主背景 - 亮色系 */
-.stApp {
-    background: linear-gradient(135deg, #f0f4f8 0%, #e6eef7 100%);
-}
-
-/* 侧边栏 - 亮色玻璃拟态 */
-[data-testid="stSidebar"] {
-    background: rgba(255, 255, 255, 0.95) !important;
-    backdrop-filter: blur(10px);
-    border-right: 1px solid rgba(0, 100, 200, 0.1);
-}
-
-/* 侧边栏文字 - 深灰色确保可见 */
-[data-testid="stSidebar"] .stMarkdown,
-[data-testid="stSidebar"] .stSlider label,
-[data-testid="stSidebar"] .stSelectbox label,
-[data-testid="stSidebar"] .stExpander label,
-[data-testid="stSidebar"] p,
-[data-testid="stSidebar"] span,
-[data-testid="stSidebar"] div {
-    color: #1a202c !important;
-}
-
-/* 侧边栏标题 */
-[data-testid="stSidebar"] h1 {
-    color: #0066cc !important;
-    font-weight: 600;
-    font-size: 1.2rem;
-    letter-spacing: 0.5px;
-    text-transform: uppercase;
-}
-
-/* 滑块样式 - 蓝色系 */
-.stSlider > div > div > div {
-    background: linear-gradient(90deg, #0066cc, #00a8e8) !important;
-}
-
-/* 下拉菜单 */
-.stSelectbox > div > div {
-    background: rgba(255, 255, 255, 0.9) !important;
-    border: 1px solid rgba(0, 100, 200, 0.3) !important;
-    border-radius: 8px !important;
-    color: #1a202c !important;
-}
-
-/* 主标题区域 - 亮色科技感 */
-.main-title {
-    background: linear-gradient(135deg, rgba(0, 102, 204, 0.1) 0%, rgba(0, 168, 232, 0.05) 100%);
-    padding: 2rem;
-    border-radius: 16px;
-    border: 1px solid rgba(0, 102, 204, 0.2);
-    margin-bottom: 2rem;
-    position: relative;
-    overflow: hidden;
-}
-
-.main-title::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 2px;
-    background: linear-gradient(90deg, #0066cc, #00a8e8, #0066cc);
-    animation: scanline 3s linear infinite;
-}
-
-@keyframes scanline {
-    0% { transform: translateX(-100%); }
-    100% { transform: translateX(100%); }
-}
-
-/* 标题文字 - 深色 */
-h1 {
-    color: #1a202c !important;
-    font-weight: 700 !important;
-    font-size: 2.5rem !important;
-    margin-bottom: 0.5rem !important;
-    background: linear-gradient(90deg, #0066cc, #00a8e8);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-}
-
-h2 {
-    color: #0066cc !important;
-    font-weight: 600 !important;
-    font-size: 1.5rem !important;
-    margin-top: 2rem !important;
-    margin-bottom: 1rem !important;
-    padding-bottom: 0.5rem;
-    border-bottom: 1px solid rgba(0, 102, 204, 0.3);
-}
-
-h3 {
-    color: #4a5568 !important;
-    font-weight: 500 !important;
-    font-size: 1.1rem !important;
-}
-
-/* 副标题 */
-.caption-text {
-    color: #4a5568;
-    font-size: 1rem;
-    letter-spacing: 1px;
-    text-transform: uppercase;
-}
-
-/* KPI卡片 - 亮色玻璃拟态 */
-.metric-card {
-    background: rgba(255, 255, 255, 0.8);
-    backdrop-filter: blur(10px);
-    border: 1px solid rgba(0, 102, 204, 0.15);
-    border-radius: 16px;
-    padding: 1.5rem;
-    transition: all 0.3s ease;
-    position: relative;
-    overflow: hidden;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
-}
-
-.metric-card:hover {
-    transform: translateY(-2px);
-    border-color: rgba(0, 102, 204, 0.4);
-    box-shadow: 0 10px 40px rgba(0, 102, 204, 0.1);
-}
-
-.metric-card::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 3px;
-    background: linear-gradient(90deg, #0066cc, #00a8e8);
-    opacity: 0.7;
-}
-
-.metric-label {
-    color: #4a5568;
-    font-size: 0.85rem;
-    font-weight: 500;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin-bottom: 0.5rem;
-}
-
-.metric-value {
-    color: #1a202c;
-    font-size: 2rem;
-    font-weight: 700;
-    font-family: 'Inter', sans-serif;
-}
-
-.metric-delta {
-    color: #0066cc;
-    font-size: 0.9rem;
-    font-weight: 500;
-}
-
-/* 风险状态标签 - 亮色适配 */
-.risk-stable {
-    color: #059669 !important;
-    background: rgba(5, 150, 105, 0.15) !important;
-    padding: 0.25rem 0.75rem;
-    border-radius: 20px;
-    font-size: 0.85rem;
-    font-weight: 600;
-}
-
-.risk-high {
-    color: #dc2626 !important;
-    background: rgba(220, 38, 38, 0.15) !important;
-    padding: 0.25rem 0.75rem;
-    border-radius: 20px;
-    font-size: 0.85rem;
-    font-weight: 600;
-    animation: pulse 2s infinite;
-}
-
-@keyframes pulse {
-    0%, 100% { opacity: 1; }
-    50% { opacity: 0.7; }
-}
-
-/* 图表容器 */
-.chart-container {
-    background: rgba(255, 255, 255, 0.6);
-    border-radius: 16px;
-    padding: 1.5rem;
-    border: 1px solid rgba(0, 102, 204, 0.1);
-    margin-bottom: 2rem;
-}
-
-/* 成功提示 */
-.success-box {
-    background: linear-gradient(135deg, rgba(0, 102, 204, 0.1) 0%, rgba(0, 168, 232, 0.1) 100%);
-    border: 1px solid rgba(0, 102, 204, 0.3);
-    border-radius: 12px;
-    padding: 1rem 1.5rem;
-    color: #0066cc;
-    font-weight: 500;
-    text-align: center;
-    margin-top: 2rem;
-}
-
-/* 分割线 */
-hr {
-    border: none;
-    height: 1px;
-    background: linear-gradient(90deg, transparent, rgba(0, 102, 204, 0.3), transparent);
-    margin: 2rem 0;
-}
-
-/* 滚动条美化 */
-::-webkit-scrollbar {
-    width: 8px;
-    height: 8px;
-}
-
-::-webkit-scrollbar-track {
-    background: #f0f4f8;
-}
-
-::-webkit-scrollbar-thumb {
-    background: #0066cc;
-    border-radius: 4px;
-}
-
-::-webkit-scrollbar-thumb:hover {
-    background: #00a8e8;
-}
-
-/* 确保所有输入标签可见 */
-.stSlider label, .stSelectbox label {
-    color: #1a202c !important;
-    font-weight: 500 !important;
-}
-</style>
-"""
-    else:  # dark theme
-        return """
-<style>
-/* 隐藏 Streamlit 默认顶部导航栏 */
-#MainMenu {visibility: hidden;}
-header {visibility: hidden;}
-.stDeployButton {display: none;}
-
-/* 移除顶部空白 */
-.block-container {
-    padding-top: 1rem !important;
-    padding-bottom: 0rem !important;
-}
-
-/* 主背景 - 深蓝黑色 */
-.stApp {
-    background: linear-gradient(135deg, #0a0e1a 0%, #1a1f2e 100%);
-}
-
-/* 侧边栏 - 玻璃拟态效果 */
-[data-testid="stSidebar"] {
-    background: rgba(15, 20, 35, 0.95) !important;
-    backdrop-filter: blur(10px);
-    border-right: 1px solid rgba(0, 245, 255, 0.1);
-}
-
-/* 侧边栏文字 - 白色确保可见 */
-[data-testid="stSidebar"] .stMarkdown,
-[data-testid="stSidebar"] .stSlider label,
-[data-testid="stSidebar"] .stSelectbox label,
-[data-testid="stSidebar"] .stExpander label,
-[data-testid="stSidebar"] p,
-[data-testid="stSidebar"] span,
-[data-testid="stSidebar"] div {
-    color: #ffffff !important;
-}
-
-/* 侧边栏标题 */
-[data-testid="stSidebar"] h1 {
-    color: #00f5ff !important;
-    font-weight: 600;
-    font-size: 1.2rem;
-    letter-spacing: 0.5px;
-    text-transform: uppercase;
-}
-
-/* 滑块样式 */
-.stSlider > div > div > div {
-    background: linear-gradient(90deg, #00f5ff, #0080ff) !important;
-}
-
-/* 下拉菜单 */
-.stSelectbox > div > div {
-    background: rgba(30, 35, 50, 0.8) !important;
-    border: 1px solid rgba(0, 245, 255, 0.3) !important;
-    border-radius: 8px !important;
-    color: #ffffff !important;
-}
-
-/* 主标题区域 */
-.main-title {
-    background: linear-gradient(135deg, rgba(0, 245, 255, 0.1) 0%, rgba(0, 128, 255, 0.05) 100%);
-    padding: 2rem;
-    border-radius: 16px;
-    border: 1px solid rgba(0, 245, 255, 0.2);
-    margin-bottom: 2rem;
-    position: relative;
-    overflow: hidden;
-}
-
-.main-title::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 2px;
-    background: linear-gradient(90deg, #00f5ff, #0080ff, #00f5ff);
-    animation: scanline 3s linear infinite;
-}
-
-@keyframes scanline {
-    0% { transform: translateX(-100%); }
-    100% { transform: translateX(100%); }
-}
-
-/* 标题文字 */
-h1 {
-    color: #ffffff !important;
-    font-weight: 700 !important;
-    font-size: 2.5rem !important;
-    margin-bottom: 0.5rem !important;
-    background: linear-gradient(90deg, #00f5ff, #0080ff);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-}
-
-h2 {
-    color: #00f5ff !important;
-    font-weight: 600 !important;
-    font-size: 1.5rem !important;
-    margin-top: 2rem !important;
-    margin-bottom: 1rem !important;
-    padding-bottom: 0.5rem;
-    border-bottom: 1px solid rgba(0, 245, 255, 0.3);
-}
-
-h3 {
-    color: #a0a8b8 !important;
-    font-weight: 500 !important;
-    font-size: 1.1rem !important;
-}
-
-/* 副标题 */
-.caption-text {
-    color: #6b7280;
-    font-size: 1rem;
-    letter-spacing: 1px;
-    text-transform: uppercase;
-}
-
-/* KPI卡片 - 玻璃拟态 */
-.metric-card {
-    background: rgba(20, 25, 40, 0.6);
-    backdrop-filter: blur(10px);
-    border: 1px solid rgba(0, 245, 255, 0.15);
-    border-radius: 16px;
-    padding: 1.5rem;
-    transition: all 0.3s ease;
-    position: relative;
-    overflow: hidden;
-}
-
-.metric-card:hover {
-    transform: translateY(-2px);
-    border-color: rgba(0, 245, 255, 0.4);
-    box-shadow: 0 10px 40px rgba(0, 245, 255, 0.1);
-}
-
-.metric-card::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 3px;
-    background: linear-gradient(90deg, #00f5ff, #0080ff);
-    opacity: 0.7;
-}
-
-.metric-label {
-    color: #6b7280;
-    font-size: 0.85rem;
-    font-weight: 500;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin-bottom: 0.5rem;
-}
-
-.metric-value {
-    color: #ffffff;
-    font-size: 2rem;
-    font-weight: 700;
-    font-family: 'Inter', sans-serif;
-}
-
-.metric-delta {
-    color: #00f5ff;
-    font-size: 0.9rem;
-    font-weight: 500;
-}
-
-/* 风险状态标签 */
-.risk-stable {
-    color: #10b981 !important;
-    background: rgba(16, 185, 129, 0.15) !important;
-    padding: 0.25rem 0.75rem;
-    border-radius: 20px;
-    font-size: 0.85rem;
-    font-weight: 600;
-}
-
-.risk-high {
-    color: #ef4444 !important;
-    background: rgba(239, 68, 68, 0.15) !important;
-    padding: 0.25rem 0.75rem;
-    border-radius: 20px;
-    font-size: 0.85rem;
-    font-weight: 600;
-    animation: pulse 2s infinite;
-}
-
-@keyframes pulse {
-    0%, 100% { opacity: 1; }
-    50% { opacity: 0.7; }
-}
-
-/* 图表容器 */
-.chart-container {
-    background: rgba(20, 25, 40, 0.4);
-    border-radius: 16px;
-    padding: 1.5rem;
-    border: 1px solid rgba(0, 245, 255, 0.1);
-    margin-bottom: 2rem;
-}
-
-/* 成功提示 */
-.success-box {
-    background: linear-gradient(135deg, rgba(0, 245, 255, 0.1) 0%, rgba(0, 128, 255, 0.1) 100%);
-    border: 1px solid rgba(0, 245, 255, 0.3);
-    border-radius: 12px;
-    padding: 1rem 1.5rem;
-    color: #00f5ff;
-    font-weight: 500;
-    text-align: center;
-    margin-top: 2rem;
-}
-
-/* 分割线 */
-hr {
-    border: none;
-    height: 1px;
-    background: linear-gradient(90deg, transparent, rgba(0, 245, 255, 0.3), transparent);
-    margin: 2rem 0;
-}
-
-/* 滚动条美化 */
-::-webkit-scrollbar {
-    width: 8px;
-    height: 8px;
-}
-
-::-webkit-scrollbar-track {
-    background: #0a0e1a;
-}
-
-::-webkit-scrollbar-thumb {
-    background: #00f5ff;
-    border-radius: 4px;
-}
-
-::-webkit-scrollbar-thumb:hover {
-    background: #0080ff;
-}
-
-/* 确保所有输入标签为白色 */
-.stSlider label, .stSelectbox label {
-    color: #ffffff !important;
-    font-weight: 500 !important;
-}
-</style>
-"""
+theme = st.sidebar.selectbox(
+    "🎨 Theme / 主题",
+    list(THEME_LABELS),
+    format_func=THEME_LABELS.get,
+    key="theme"
+)
 
-# 应用当前主题的CSS
-st.markdown(get_css(st.session_state.theme), unsafe_allow_html=True)
+# 应用当前主题的CSS (导入时预构建)
+st.markdown(STYLESHEETS[theme], unsafe_allow_html=True)
+laps.lap("styles")
 
 # ===============================
-# 主题和语言切换
+# 语言切换
 # ===============================
-theme_option = st.sidebar.selectbox("🎨 Theme / 主题", ["Dark (深色)", "Light (亮色)"], 
-                                    index=0 if st.session_state.theme == "dark" else 1)
-
-if theme_option == "Light (亮色)" and st.session_state.theme != "light":
-    st.session_state.theme = "light"
-    st.rerun()
-elif theme_option == "Dark (深色)" and st.session_state.theme != "dark":
-    st.session_state.theme = "dark"
-    st.rerun()
-
 language = st.sidebar.selectbox("🌐 Language / 语言", ["English", "中文"], index=1)
 
 def t(en, cn):
@@ -556,7 +79,7 @@ def t(en, cn):
 # ===============================
 # 标题区域 - 带装饰效果
 # ===============================
-st.markdown("""
+header_html = """
 <div class="main-title">
     <h1>🚜 {}</h1>
     <div class="caption-text">{}</div>
@@ -564,148 +87,504 @@ st.markdown("""
 """.format(
     t("Strategic Profit Sandbox", "LG战略利润沙盘系统"),
     t("Executive Value Chain War-Room", "价值链战略驾驶舱")
-), unsafe_allow_html=True)
+)
+st.markdown(header_html, unsafe_allow_html=True)
+laps.lap("header")
 
 # ===============================
 # 战略参数 Strategic Controls
 # ===============================
 st.sidebar.markdown(f"### ⚙️ {t('Strategic Controls', '战略参数')}")
 
+DRIVER_LABELS = {
+    "volume": ("Production Volume (units)", "产量 (台)"),
+    "rd_rate": ("R&D Capitalization %", "研发资本化比例 %"),
+    "raw_material_increase": ("Raw Material Cost Increase %", "原材料涨价 %"),
+    "inventory_growth": ("Dealer Inventory Growth %", "经销商库存增长 %"),
+    "bad_debt_rate": ("Finance Bad Debt %", "金融坏账率 %"),
+    "service_growth": ("Aftermarket Growth %", "售后市场增长率 %"),
+}
+
+COEFFICIENT_LABELS = {
+    "revenue_per_unit": ("Revenue per Unit", "单台收入"),
+    "material_per_unit": ("Material per Unit", "单台材料成本"),
+    "fixed_cost": ("Fixed Cost", "固定成本"),
+    "variable_per_unit": ("Variable Cost per Unit", "单台变动成本"),
+    "rd_total": ("Total R&D Spend", "研发总投入"),
+    "rd_years": ("R&D Amortization Years", "研发摊销年限"),
+    "service_per_unit": ("Service Revenue per Unit", "单台售后收入"),
+    "service_cost_ratio": ("Service Cost Ratio", "售后成本率"),
+    "finance_per_unit": ("Finance Revenue per Unit", "单台金融收入"),
+    "finance_cost_per_unit": ("Finance Cost per Unit", "单台资金成本"),
+    "used_per_unit": ("Used Equipment Profit per Unit", "单台二手机利润"),
+}
+
+def driver_slider(name, help):
+    # 以参数名为 key, 语言切换不会重置滑块, 优化器也可以回写
+    driver = DRIVERS[name]
+    st.session_state.setdefault(name, driver.default)
+    return st.slider(t(*DRIVER_LABELS[name]), driver.min, driver.max, step=driver.step, key=name, help=help)
+
 with st.sidebar.expander(t("📊 Production", "📊 生产参数"), expanded=True):
-    volume = st.slider(
-        t("Production Volume (units)", "产量 (台)"),
-        200, 2000, 1800, step=50,
+    volume = driver_slider(
+        "volume",
         help=t("Annual production volume", "年度生产台数")
     )
     
-    rd_rate = st.slider(
-        t("R&D Capitalization %", "研发资本化比例 %"),
-        0.0, 1.0, 0.6, step=0.05,
+    rd_rate = driver_slider(
+        "rd_rate",
         help=t("Percentage of R&D costs capitalized", "研发费用资本化比例")
     )
+    
+    portfolio_mode = st.toggle(
+        t("🏭 Portfolio Mode", "🏭 产品组合模式"),
+        value=False,
+        help=t(
+            "Evaluate every product line of a coefficient table; volume scales all lines relative to its default",
+            "按系数表逐条产品线计算; 产量滑块按默认值的比例缩放所有产品线"
+        )
+    )
+    if portfolio_mode:
+        portfolio_file = st.file_uploader(
+            t("Coefficient table (CSV/Parquet)", "系数表 (CSV/Parquet)"),
+            type=["csv", "parquet"],
+            help=t(
+                "Columns: model, plant, region, volume and optional per-unit coefficients. Empty = demo portfolio",
+                "列: model, plant, region, volume 及可选的单位系数. 留空使用示例组合"
+            )
+        )
 
 with st.sidebar.expander(t("💰 Cost & Risk", "💰 成本与风险"), expanded=True):
-    raw_material_increase = st.slider(
-        t("Raw Material Cost Increase %", "原材料涨价 %"),
-        0, 30, 10, step=1,
+    raw_material_increase = driver_slider(
+        "raw_material_increase",
         help=t("Year-over-year raw material cost increase", "原材料成本同比上涨")
     )
     
-    inventory_growth = st.slider(
-        t("Dealer Inventory Growth %", "经销商库存增长 %"),
-        0, 50, 20, step=5,
+    inventory_growth = driver_slider(
+        "inventory_growth",
         help=t("Channel inventory growth rate", "渠道库存增长率")
     )
     
-    bad_debt_rate = st.slider(
-        t("Finance Bad Debt %", "金融坏账率 %"),
-        0, 20, 5, step=1,
+    bad_debt_rate = driver_slider(
+        "bad_debt_rate",
         help=t("Bad debt ratio for financing business", "金融业务坏账率")
     )
     
-    service_growth = st.slider(
-        t("Aftermarket Growth %", "售后市场增长率 %"),
-        0, 50, 15, step=5,
+    service_growth = driver_slider(
+        "service_growth",
         help=t("Service revenue growth rate", "售后服务收入增长率")
     )
+    
+    simulation_mode = st.toggle(
+        t("🎲 Monte Carlo Simulation", "🎲 蒙特卡洛模拟"),
+        value=False,
+        disabled=portfolio_mode,
+        help=t("Treat the four risk drivers as correlated distributions", "将四个风险参数视为相关的概率分布")
+    ) and not portfolio_mode
+    if simulation_mode:
+        sim_spread = st.slider(
+            t("Uncertainty (σ, % of range)", "不确定性 (σ, 占区间 %)"),
+            5, 50, 15, step=5
+        )
+        sim_rho = st.slider(
+            t("Driver Correlation ρ", "参数相关系数 ρ"),
+            0.0, 0.9, 0.3, step=0.1
+        )
 
 # ===============================
-# 基础模型计算
+# 按依赖缓存的页面区块
 # ===============================
-equipment_revenue = volume * 50
-base_material_cost = volume * 30
-material_cost = base_material_cost * (1 + raw_material_increase/100)
-
-fixed_cost = 20000
-variable_cost = 5 * volume
-manufacturing_cost = fixed_cost + variable_cost
+# 两种机制分工: 侧栏滑块触发整页重跑, 片段不能包含侧栏控件, 所以由侧栏参数
+# 驱动的区块用 section() 按依赖缓存, 未变化的区块直接复用; 控件在主区域内的
+# 面板 (优化器、情景对比、敏感性视图、产品组合汇总、多年预测) 用 @st.fragment, 操作其控件
+# 时只重跑该面板.
+def section(name, deps, build):
+    """Return the cached value of a page section, rebuilding only when deps change.
+
+    Session-local memo first, then the process-wide cache shared by all viewers.
+    """
+    memo = st.session_state.setdefault("_sections", {})
+    cached = memo.get(name)
+    if cached is None or cached[0] != deps:
+        with laps.timer(f"compute.{name}"):
+            cached = memo[name] = (deps, cache.shared(name, deps, build))
+    return cached[1]
 
-rd_total = 10000
-rd_amort = rd_total * rd_rate / 5
-
-service_revenue = volume * 15 * (1 + service_growth/100)
-service_cost = service_revenue * 0.5
+# ===============================
+# 基础模型计算
+# ===============================
+drivers = {
+    "volume": volume,
+    "rd_rate": rd_rate,
+    "raw_material_increase": raw_material_increase,
+    "inventory_growth": inventory_growth,
+    "bad_debt_rate": bad_debt_rate,
+    "service_growth": service_growth,
+}
+driver_key = cache.quantize(drivers)
 
-finance_revenue = volume * 8
-bad_debt = finance_revenue * bad_debt_rate/100
-finance_cost = volume * 3
+# ===============================
+# 情景库 Scenario Store
+# ===============================
+@st.cache_resource
+def scenario_store():
+    return ScenarioStore()
+
+def set_drivers(values):
+    for name, value in values.items():
+        st.session_state[name] = type(DRIVERS[name].default)(value)
+
+def save_scenario(drivers):
+    name = st.session_state["_scenario_name"].strip()
+    if not name:
+        st.toast(t("Enter a scenario name first.", "请先输入情景名称."))
+        return
+    tags = st.session_state["_scenario_tags"].split(",")
+    scenario_store().save(name, drivers, tags)
+    st.toast(t(f"Saved scenario '{name}'", f"已保存情景 '{name}'"))
+
+def load_scenario(name):
+    saved = scenario_store().load(name)
+    if saved is not None:
+        set_drivers(saved["drivers"])
+
+with st.sidebar.expander(t("💾 Scenarios", "💾 情景库"), expanded=False):
+    st.text_input(t("Scenario name", "情景名称"), key="_scenario_name")
+    st.text_input(t("Tags (comma separated)", "标签 (逗号分隔)"), key="_scenario_tags")
+    st.button(t("Save current scenario", "保存当前情景"), on_click=save_scenario, args=(drivers,))
+    
+    saved_names = scenario_store().names()
+    if saved_names:
+        chosen = st.selectbox(t("Saved scenarios", "已保存情景"), saved_names)
+        load_col, delete_col = st.columns(2)
+        load_col.button(t("Load", "载入"), on_click=load_scenario, args=(chosen,))
+        delete_col.button(t("Delete", "删除"), on_click=scenario_store().delete, args=(chosen,))
 
-used_profit = volume * 5
+# ===============================
+# 演示广播: 主讲人发布渲染结果, 观众只接收快照
+# ===============================
+broadcast_room = None
+with st.sidebar.expander(t("📡 Broadcast", "📡 演示广播"), expanded="present" in st.query_params):
+    presenting = st.toggle(
+        t("Present to a room", "向房间广播"),
+        value=valid_room(st.query_params.get("present")),
+        key="_broadcast_on",
+        help=t(
+            "Viewers watch a read-only copy of this dashboard; nothing is recomputed per viewer",
+            "观众观看本仪表盘的只读副本, 不为每位观众重新计算"
+        )
+    )
+    room = st.text_input(t("Room", "房间"), value=st.query_params.get("present") or "board", key="_broadcast_room", max_chars=32)
+    if presenting:
+        hub = broadcast_hub()
+        if not valid_room(room):
+            st.warning(t("Use letters, digits, - and _ only.", "房间名只能包含字母、数字、- 和 _."))
+        elif hub.error is not None:
+            st.error(t(f"Broadcast server unavailable: {hub.error}", f"广播服务不可用: {hub.error}"))
+        elif hub.open(room) is None or st.session_state.pop("_broadcast_failed", None) == room:
+            st.error(t(
+                "All broadcast rooms are in use; try again once an idle room expires.",
+                "广播房间已满, 请在空闲房间过期后重试."
+            ))
+        else:
+            broadcast_room = room
+            url = hub.url(room, st.context.headers.get("host"))
+            st.markdown(f"[{url}]({url})")
+            if mixed_content(url, st.context.headers):
+                st.warning(t(
+                    "The dashboard is served over HTTPS, so ?view= cannot embed this http:// page. "
+                    "Set SANDBOX_BROADCAST_URL to an HTTPS reverse proxy.",
+                    "仪表盘通过 HTTPS 访问, ?view= 无法嵌入 http:// 页面. 请将 SANDBOX_BROADCAST_URL 设为 HTTPS 反向代理地址."
+                ))
+            st.caption(t(
+                f"Or open the dashboard with ?view={room} · {hub.viewers(room)} viewers connected",
+                f"或以 ?view={room} 打开仪表盘 · 当前 {hub.viewers(room)} 位观众"
+            ))
+
+def broadcast(parts):
+    if broadcast_room is not None and broadcast_hub().publish(broadcast_room, parts) is None:
+        # 侧栏已渲染 (或在片段中), 下次重跑时在侧栏显示
+        st.session_state["_broadcast_failed"] = broadcast_room
+        st.toast(t("📡 Broadcast failed: all rooms are in use", "📡 广播失败: 房间已满"))
+# 系数来源: 标定参数文件 (python -m sandbox.calibrate) 或内置默认值
+if CALIBRATION is not None:
+    st.sidebar.caption(t(
+        f"📐 Coefficients calibrated from {CALIBRATION['rows']:,} ERP rows over {CALIBRATION['periods']} periods",
+        f"📐 系数已按 {CALIBRATION['rows']:,} 行 ERP 数据 ({CALIBRATION['periods']} 个期间) 标定"
+    ))
+laps.lap("controls")
+# 会话内增量模型: 只重算受变化滑块影响的下游科目
+model = st.session_state.setdefault("_model", IncrementalModel())
+result = section("model", driver_key, lambda: model.update(**drivers))
+single_result = result
+
+# 产品组合模式: 系数表逐行向量化计算, 汇总值替换单产品的金额与比率
+portfolio_results = None
+plant_volume = volume
+variable_per_unit = DEFAULT_COEFFICIENTS.variable_per_unit
+if portfolio_mode:
+    from sandbox import portfolio
+    
+    if portfolio_file is None:
+        table_key = "demo"
+        load = portfolio.demo_portfolio
+    else:
+        table_key = (portfolio_file.name, portfolio_file.file_id)
+        load = lambda: portfolio.load_portfolio(portfolio_file)
+    try:
+        table = cache.shared("portfolio_table", table_key, load)
+    except (ValueError, KeyError) as exc:
+        st.sidebar.error(t(f"Invalid coefficient table: {exc}", f"系数表无效: {exc}"))
+    else:
+        scale = volume / DRIVERS["volume"].default
+        portfolio_results = cache.shared(
+            "portfolio", (table_key, driver_key),
+            lambda: portfolio.evaluate_portfolio(table, drivers, volume_scale=scale)
+        )
+        result = {**result, **portfolio.totals(portfolio_results)}
+        plant_volume = result["volume"]
+        variable_per_unit = result["variable_cost"] / plant_volume
+
+# 金融业务: 逐笔贷款的摊还计划 + 违约/回收曲线, 预期损失替代坏账科目 (单产品模式)
+credit = None
+if portfolio_results is None:
+    credit = section("credit_losses", (volume, bad_debt_rate), lambda: credit_losses(book_for_volume(volume), bad_debt_rate))
+    result = apply_losses(result, credit)
+
+# 优化器、情景对比、弹性、Sobol、利润曲面、预计算网格和多年预测都用闭式模型
+# (坏账 = 金融收入 x 坏账率), 与 KPI 卡片和瀑布图的贷款簿预期损失不同, 在这些面板下注明
+closed_form_note = None
+if credit is not None:
+    closed_form_note = t(
+        f"Closed-form model: bad debt ${single_result['bad_debt']:,.0f}K (finance revenue × bad-debt rate); "
+        f"the KPI cards and waterfall use the loan-book expected loss ${credit.expected_loss:,.0f}K.",
+        f"闭式模型: 坏账 ${single_result['bad_debt']:,.0f}K (金融收入 × 坏账率); "
+        f"KPI 卡片和瀑布图使用贷款簿预期损失 ${credit.expected_loss:,.0f}K."
+    )
 
-equipment_profit = equipment_revenue - material_cost - manufacturing_cost - rd_amort
-service_profit = service_revenue - service_cost
-finance_profit = finance_revenue - bad_debt - finance_cost
+def closed_form_caption():
+    if closed_form_note is not None:
+        st.caption(closed_form_note)
+
+fixed_cost = result["fixed_cost"]
+total_profit = result["total_profit"]
+
+# 蒙特卡洛模拟: 在后台线程池中分块抽样, 每块产出一次部分结果;
+# 滑块变化时提交新任务, 同一会话的旧任务自动取消
+SIM_CHUNK = 100_000
+job_slot = st.session_state.setdefault("_job_slot", uuid.uuid4().hex)
+sim = None
+sim_job = None
+if simulation_mode:
+    sim_key = (driver_key, sim_spread, sim_rho)
+    sim_job = job_pool().submit(
+        job_slot, ("simulation", sim_key),
+        lambda: simulate_progressive(drivers, spread=sim_spread / 100, rho=sim_rho, chunk_size=SIM_CHUNK)
+    )
+    sim = sim_job.result
+else:
+    job_pool().cancel(job_slot)
 
-total_profit = equipment_profit + service_profit + finance_profit + used_profit
+# 经销商渠道模拟 (1 万家经销商 x 52 周, 按周向量化); 结果只取决于库存增长率
+channel = section("channel", inventory_growth, lambda: simulate_channel(inventory_growth))
+laps.lap("model")
 
 # ===============================
 # KPI Dashboard - 玻璃拟态卡片
 # ===============================
 st.markdown(f"### 📈 {t('Executive KPIs', '核心指标')}")
 
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown(f"""
+# 卡片 HTML 先拼好, 广播时原样发给观众
+unit_cost = result["unit_cost"]
+service_ratio = result["service_ratio"]
+high_risk = channel.risk >= CHANNEL_RISK_LIMIT
+risk_class = "risk-high" if high_risk else "risk-stable"
+risk_text = t("HIGH RISK", "高风险") if high_risk else t("STABLE", "稳定")
+_, cover_p50, cover_p90 = channel.cover_quantiles()
+kpi_cards = [
+    f"""
     <div class="metric-card">
         <div class="metric-label">{t('Total Lifecycle Profit', '全生命周期利润')}</div>
         <div class="metric-value">${total_profit:,.0f}K</div>
         <div class="metric-delta">▲ {t('YoY +12%', '同比 +12%')}</div>
     </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    unit_cost = manufacturing_cost/volume
-    st.markdown(f"""
+    """,
+    f"""
     <div class="metric-card">
         <div class="metric-label">{t('Unit Manufacturing Cost', '单位制造成本')}</div>
         <div class="metric-value">${unit_cost:.1f}K</div>
         <div class="metric-delta">{t('Target: $35K', '目标: $35K')}</div>
     </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    service_ratio = service_profit/total_profit if total_profit != 0 else 0
-    st.markdown(f"""
+    """,
+    f"""
     <div class="metric-card">
         <div class="metric-label">{t('Service Profit Ratio', '售后利润占比')}</div>
         <div class="metric-value">{service_ratio:.1%}</div>
         <div class="metric-delta">{t('Healthy >30%', '健康值 >30%')}</div>
     </div>
-    """, unsafe_allow_html=True)
-
-with col4:
-    risk_class = "risk-high" if inventory_growth > 15 else "risk-stable"
-    risk_text = t("HIGH RISK", "高风险") if inventory_growth > 15 else t("STABLE", "稳定")
-    st.markdown(f"""
+    """,
+    f"""
     <div class="metric-card">
         <div class="metric-label">{t('Channel Risk Status', '渠道风险状态')}</div>
         <div class="metric-value">
             <span class="{risk_class}">{risk_text}</span>
         </div>
-        <div class="metric-delta">{t('Inventory', '库存')}: {inventory_growth}%</div>
+        <div class="metric-delta">{t('Score', '风险分')} {channel.risk:.0f} · {t('Cover P50/P90', '可销周数 P50/P90')}: {cover_p50:.1f} / {cover_p90:.1f}{t(' wks', ' 周')}</div>
     </div>
-    """, unsafe_allow_html=True)
+    """,
+]
+for col, card in zip(st.columns(4), kpi_cards):
+    with col:
+        st.markdown(card, unsafe_allow_html=True)
+
+# 预计算立方体 (python -m sandbox.cube build): 派生指标 O(1) 查表
+@st.cache_resource
+def result_cube():
+    return open_cube()
+
+cube = result_cube()
+if cube is not None and portfolio_results is None and "npv" in cube.outputs:
+    npv = cube.lookup(drivers, ("npv",))["npv"]
+    st.caption(t(
+        f"📦 10-year NPV @ 8% (precomputed lattice): ${npv:,.0f}K",
+        f"📦 10 年净现值 @ 8% (预计算网格): ${npv:,.0f}K"
+    ))
+    closed_form_caption()
+if credit is not None:
+    st.caption(t(
+        f"🏦 Loan book: {credit.contracts:,} contracts · expected loss ${credit.expected_loss:,.0f}K "
+        f"({credit.loss_rate:.2%} of principal) · stressed loss ${credit.stressed_loss:,.0f}K",
+        f"🏦 贷款簿: {credit.contracts:,} 笔 · 预期损失 ${credit.expected_loss:,.0f}K "
+        f"(占本金 {credit.loss_rate:.2%}) · 压力损失 ${credit.stressed_loss:,.0f}K"
+    ))
+laps.lap("kpi_cards")
+
+# ===============================
+# 目标求解 / 约束优化 (独立片段, 调整参数时不重跑整页)
+# ===============================
+def apply_optimum(solution):
+    set_drivers(solution)
+    st.session_state["_optimum_applied"] = True
+
+@st.fragment
+def optimizer_panel(drivers, driver_key, result):
+    if st.session_state.pop("_optimum_applied", False):
+        st.rerun()
+    
+    with st.expander(t("🎯 Goal Seek & Optimizer", "🎯 目标求解与优化"), expanded=False):
+        opt_col1, opt_col2 = st.columns(2)
+        with opt_col1:
+            objective = st.radio(
+                t("Objective", "目标"),
+                ["max", "target"],
+                format_func=lambda x: t("Maximize total profit", "总利润最大化") if x == "max" else t("Hit profit target", "达到利润目标"),
+                horizontal=True
+            )
+            target = None
+            if objective == "target":
+                target = st.number_input(t("Profit target ($K)", "利润目标 (千美元)"), value=30000, step=1000)
+            free = st.multiselect(
+                t("Free controls", "可调参数"),
+                list(DRIVERS),
+                default=["volume", "rd_rate"],
+                format_func=lambda name: t(*DRIVER_LABELS[name])
+            )
+        with opt_col2:
+            max_unit_cost = 35.0 if st.checkbox(t("Unit cost ≤ $35K", "单位成本 ≤ $35K"), value=True) else None
+            min_service_ratio = 0.30 if st.checkbox(t("Service ratio > 30%", "售后利润占比 > 30%"), value=True) else None
+            max_risk = RISK_THRESHOLD if st.checkbox(
+                t(f"All radar risks < {RISK_THRESHOLD}", f"雷达风险均 < {RISK_THRESHOLD}"), value=True
+            ) else None
+        
+        if not free:
+            st.info(t("Select at least one control to optimize.", "请至少选择一个可调参数."))
+            return
+        
+        constraints = Constraints(max_unit_cost, min_service_ratio, max_risk)
+        key = (driver_key, tuple(free), target, astuple(constraints))
+        found = cache.shared("optimizer", key, lambda: optimize(drivers, free=free, target=target, constraints=constraints))
+        if found is None:
+            st.warning(t("No slider combination satisfies the constraints.", "没有满足约束的参数组合."))
+            return
+        
+        rows = [
+            f"| {t('Control', '参数')} | {t('Current', '当前')} | {t('Optimum', '最优')} |",
+            "|---|---:|---:|",
+        ]
+        for name in DRIVERS:
+            rows.append(f"| {t(*DRIVER_LABELS[name])} | {drivers[name]:g} | {found.drivers[name]:g} |")
+        for label, name, fmt in [
+            (t("Total Profit ($K)", "总利润 (千美元)"), "total_profit", "{:,.0f}"),
+            (t("Unit Cost ($K)", "单位成本 (千美元)"), "unit_cost", "{:.1f}"),
+            (t("Service Profit Ratio", "售后利润占比"), "service_ratio", "{:.1%}"),
+        ]:
+            rows.append(f"| **{label}** | {fmt.format(result[name])} | {fmt.format(found.outputs[name])} |")
+        st.markdown("\n".join(rows))
+        closed_form_caption()
+        st.caption(t(
+            f"Searched {found.candidates:,} lattice points ({found.feasible:,} feasible after pruning) in {found.elapsed * 1000:.1f} ms",
+            f"搜索 {found.candidates:,} 个网格点 (剪枝后可行 {found.feasible:,} 个), 用时 {found.elapsed * 1000:.1f} 毫秒"
+        ))
+        st.button(t("Apply to sliders", "应用到滑块"), on_click=apply_optimum, args=(found.drivers,))
+
+if portfolio_results is None:
+    optimizer_panel(drivers, driver_key, single_result)
+
+# ===============================
+# 情景对比 (独立片段)
+# ===============================
+COMPARE_COLUMNS = ("total_profit", "unit_cost", "service_ratio")
+
+@st.fragment
+def scenario_compare_panel(result):
+    store = scenario_store()
+    with st.expander(t(f"📚 Saved Scenarios ({len(store):,})", f"📚 已保存情景 ({len(store):,})"), expanded=False):
+        tags = store.tags()
+        tag = st.selectbox(
+            t("Tag", "标签"),
+            [None, *tags],
+            format_func=lambda x: t("All", "全部") if x is None else f"{x} ({tags[x]})"
+        )
+        diff = store.compare(result, columns=COMPARE_COLUMNS, tag=tag)
+        if not diff["name"]:
+            st.info(t("No saved scenarios yet.", "暂无已保存情景."))
+            return
+        headers = {
+            "name": t("Scenario", "情景"),
+            **{name: t(*DRIVER_LABELS[name]) for name in DRIVERS},
+            "total_profit": t("Total Profit ($K)", "总利润 (千美元)"),
+            "delta_total_profit": t("Δ Profit vs Current", "Δ 利润 (对比当前)"),
+            "unit_cost": t("Unit Cost ($K)", "单位成本 (千美元)"),
+            "delta_unit_cost": t("Δ Unit Cost", "Δ 单位成本"),
+            "service_ratio": t("Service Ratio", "售后占比"),
+            "delta_service_ratio": t("Δ Service Ratio", "Δ 售后占比"),
+        }
+        st.dataframe({headers[name]: values for name, values in diff.items()}, hide_index=True)
+        closed_form_caption()
+
+if portfolio_results is None:
+    scenario_compare_panel(single_result)
+laps.lap("panels")
 
 st.markdown("<hr>", unsafe_allow_html=True)
 
-# 根据主题选择图表模板
-chart_template = "plotly_white" if st.session_state.theme == "light" else "plotly_dark"
-chart_bgcolor = "rgba(255,255,255,0)" if st.session_state.theme == "light" else "rgba(0,0,0,0)"
-grid_color = "rgba(0,0,0,0.1)" if st.session_state.theme == "light" else "rgba(255,255,255,0.1)"
-text_color = "#1a202c" if st.session_state.theme == "light" else "white"
-
-# 颜色方案
-if st.session_state.theme == "light":
-    primary_color = "#0066cc"
-    secondary_color = "#00a8e8"
-    danger_color = "#dc2626"
-    colors = ["#0066cc", "#00a8e8", "#6366f1", "#8b5cf6"]
-else:
-    primary_color = "#00f5ff"
-    secondary_color = "#0080ff"
-    danger_color = "#ef4444"
-    colors = ["#00f5ff", "#0080ff", "#6366f1", "#8b5cf6"]
+profits = tuple(result[name] for name in WATERFALL_ITEMS)
+
+# Plotly 在首个图表之前才导入, 标题、控件和 KPI 卡片先行渲染
+from sandbox.charts import (
+    channel_figure,
+    distribution_figure,
+    donut_figure,
+    projection_figure,
+    radar_figure,
+    rollup_figure,
+    sensitivity_figure,
+    sobol_convergence_figure,
+    sobol_figure,
+    surface_figure,
+    tornado_figure,
+    waterfall_figure,
+)
 
 # ===============================
 # 图表区域 - 两列布局
@@ -716,219 +595,433 @@ with col_left:
     # 生命周期利润瀑布图
     st.markdown(f"### 📊 {t('Lifecycle Profit Waterfall', '生命周期利润瀑布')}")
     
-    fig = go.Figure(go.Waterfall(
-        measure=["relative", "relative", "relative", "relative", "total"],
-        x=[
-            t("Equipment", "主机销售"),
-            t("Aftermarket", "售后服务"),
-            t("Finance", "金融业务"),
-            t("Used Equipment", "二手机"),
-            t("Total Profit", "总利润")
-        ],
-        y=[equipment_profit, service_profit, finance_profit, used_profit, total_profit],
-        text=[f"${x:,.0f}K" for x in [equipment_profit, service_profit, finance_profit, used_profit, total_profit]],
-        textposition="outside",
-        connector={"line": {"color": f"rgba(0, 102, 204, 0.3)" if st.session_state.theme == "light" else "rgba(0, 245, 255, 0.3)", "width": 2}},
-        increasing={"marker": {"color": primary_color}},
-        decreasing={"marker": {"color": danger_color}},
-        totals={"marker": {"color": secondary_color}}
-    ))
-    
-    fig.update_layout(
-        template=chart_template,
-        paper_bgcolor=chart_bgcolor,
-        plot_bgcolor=chart_bgcolor,
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        font=dict(family="Inter, sans-serif", color=text_color),
-        xaxis=dict(
-            tickfont=dict(size=11),
-            gridcolor=grid_color
-        ),
-        yaxis=dict(
-            title=t("Profit ($K)", "利润 (千美元)"),
-            gridcolor=grid_color,
-            zerolinecolor=f"rgba(0, 102, 204, 0.5)" if st.session_state.theme == "light" else "rgba(0, 245, 255, 0.5)"
-        ),
-        showlegend=False
+    band = None if sim is None else (sim.p5, sim.p50, sim.p95)
+    fig = section(
+        "waterfall", (profits, band, theme, language),
+        lambda: waterfall_figure(profits, theme, language, band=band)
     )
-    
     st.plotly_chart(fig, use_container_width=True)
+    laps.lap("waterfall")
 
 with col_right:
     # 价值链利润结构环图
     st.markdown(f"### 🥧 {t('Value Chain Structure', '价值链结构')}")
     
-    profit_df = pd.DataFrame({
-        "Chain": [
-            t("Equipment", "主机"),
-            t("Service", "售后"),
-            t("Finance", "金融"),
-            t("Used", "二手机")
-        ],
-        "Profit": [equipment_profit, service_profit, finance_profit, used_profit],
-        "Color": colors
-    })
-    
-    fig3 = go.Figure(data=[go.Pie(
-        labels=profit_df["Chain"],
-        values=profit_df["Profit"],
-        hole=0.6,
-        marker=dict(colors=profit_df["Color"], line=dict(color="rgba(255,255,255,0.8)" if st.session_state.theme == "light" else "rgba(20,25,40,0.8)", width=2)),
-        textinfo="label+percent",
-        textfont=dict(size=11, color=text_color),
-        hovertemplate="%{label}<br>$%{value:,.0f}K<br>%{percent}<extra></extra>"
-    )])
-    
-    fig3.update_layout(
-        template=chart_template,
-        paper_bgcolor=chart_bgcolor,
-        plot_bgcolor=chart_bgcolor,
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        showlegend=False,
-        annotations=[dict(
-            text=f"${total_profit:,.0f}K",
-            x=0.5, y=0.5,
-            font=dict(size=20, color=text_color, family="Inter"),
-            showarrow=False
-        )]
+    center = None if sim is None else (sim.p50, sim.prob_loss)
+    fig3 = section(
+        "donut", (profits, center, theme, language),
+        lambda: donut_figure(profits, theme, language, center=center)
     )
-    
     st.plotly_chart(fig3, use_container_width=True)
+    laps.lap("donut")
 
 # ===============================
 # 底部图表区域
 # ===============================
-col_bottom1, col_bottom2 = st.columns(2)
-
-with col_bottom1:
-    # 制造敏感性曲线
+@st.fragment
+def sensitivity_panel(drivers, fixed_cost, variable_per_unit, plant_volume, surfaces):
     st.markdown(f"### 📈 {t('Manufacturing Sensitivity', '制造敏感性分析')}")
     
-    volumes_range = np.arange(200, 2000, 50)
-    unit_cost_curve = (fixed_cost/volumes_range) + 5
-    
-    fig2 = go.Figure()
-    fig2.add_trace(go.Scatter(
-        x=volumes_range,
-        y=unit_cost_curve,
-        mode='lines',
-        name=t("Unit Cost", "单位成本"),
-        line=dict(color=primary_color, width=3),
-        fill='tozeroy',
-        fillcolor=f"rgba(0, 102, 204, 0.1)" if st.session_state.theme == "light" else "rgba(0, 245, 255, 0.1)"
-    ))
-    
-    # 添加当前产量标记
-    current_unit_cost = (fixed_cost/volume) + 5
-    fig2.add_trace(go.Scatter(
-        x=[volume],
-        y=[current_unit_cost],
-        mode='markers',
-        name=t("Current Position", "当前位置"),
-        marker=dict(color=danger_color, size=12, symbol="diamond",
-                   line=dict(color="white", width=2))
-    ))
+    view = "curve"
+    if surfaces:
+        view = st.selectbox(
+            t("View", "视图"),
+            ["curve", *SURFACES],
+            format_func=lambda name: t("Unit cost vs volume", "单位成本 - 产量曲线") if name == "curve"
+            else " × ".join(t(*DRIVER_LABELS[axis]) for axis in SURFACES[name]),
+            key="surface_view",
+            label_visibility="collapsed"
+        )
     
-    fig2.update_layout(
-        template=chart_template,
-        paper_bgcolor=chart_bgcolor,
-        plot_bgcolor=chart_bgcolor,
-        height=350,
-        margin=dict(l=20, r=20, t=40, b=20),
-        xaxis=dict(
-            title=t("Production Volume", "产量 (台)"),
-            gridcolor=grid_color
-        ),
-        yaxis=dict(
-            title=t("Unit Cost ($K)", "单位成本 (千美元)"),
-            gridcolor=grid_color
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(color=text_color)
+    if view == "curve":
+        # 制造敏感性曲线 - 只依赖固定成本与产量
+        fig2 = section(
+            "sensitivity", (fixed_cost, variable_per_unit, plant_volume, theme, language),
+            lambda: sensitivity_figure(fixed_cost, variable_per_unit, plant_volume, theme, language)
         )
-    )
+        st.plotly_chart(fig2, use_container_width=True)
+        broadcast({"sensitivity": fig2})
+        return
     
+    # 利润曲面: 1000 x 1000 网格一次广播计算; 只随两条轴以外的滑块变化
+    x_name, y_name = SURFACES[view]
+    fixed = tuple(drivers[name] for name in DRIVERS if name not in (x_name, y_name))
+    # 共享缓存只保存降采样后的视图, 全分辨率网格算完即弃
+    surface = cache.shared("surface", (view, fixed), lambda: profit_surface(drivers, x_name, y_name).view())
+    current = (drivers[x_name], drivers[y_name])
+    labels = (t(*DRIVER_LABELS[x_name]), t(*DRIVER_LABELS[y_name]))
+    fig2 = section(
+        "surface_figure", (view, fixed, current, theme, language),
+        lambda: surface_figure(surface, current, labels, theme, language)
+    )
     st.plotly_chart(fig2, use_container_width=True)
+    broadcast({"sensitivity": fig2})
+    low, high = surface.extent()
+    st.caption(t(
+        f"Total profit ${low:,.0f}K – ${high:,.0f}K over {surface.points:,} grid points; "
+        "the line marks break-even.",
+        f"总利润 ${low:,.0f}K – ${high:,.0f}K, 共 {surface.points:,} 个网格点; 细线为盈亏平衡线."
+    ))
+    closed_form_caption()
+
+# 全局方差灵敏度: 六个滑块在当前值附近均匀变化时, 各自解释的总利润方差.
+# 按需开启, 与蒙特卡洛模拟一样在后台线程池中计算 (独立的任务槽), 不阻塞重跑
+sobol = None
+sobol_job = None
+sobol_slot = f"{job_slot}:sobol"
+if portfolio_results is None and st.session_state.get("sobol_on", False):
+    sobol_width = st.session_state.setdefault("sobol_width", 30)
+    sobol_key = (driver_key, sobol_width)
+    sobol_job = job_pool().submit(
+        sobol_slot, ("sobol", sobol_key),
+        lambda: sobol_progressive(drivers, sobol_width / 100)
+    )
+    sobol = sobol_job.result
+else:
+    job_pool().cancel(sobol_slot)
+
+col_bottom1, col_bottom2 = st.columns(2)
+
+with col_bottom1:
+    sensitivity_panel(drivers, fixed_cost, variable_per_unit, plant_volume, portfolio_results is None)
+    laps.lap("sensitivity")
 
 with col_bottom2:
     # 战略风险雷达
     st.markdown(f"### 🎯 {t('Strategic Risk Radar', '战略风险雷达')}")
     
-    categories = [
-        t("Inventory", "库存风险"),
-        t("Raw Material", "原材料"),
-        t("Finance", "金融风险"),
-        t("Market", "市场风险"),
-        t("R&D", "研发风险")
-    ]
-    
-    # 计算风险值 (0-100)
-    inventory_risk = min(inventory_growth * 2, 100)
-    material_risk = raw_material_increase * 3
-    finance_risk = bad_debt_rate * 4
-    market_risk = 30 if volume < 500 else 20 if volume < 1000 else 15
-    rd_risk = (1 - rd_rate) * 50
+    # 风险值 (0-100)
+    risks = (
+        channel.risk,
+        result["material_risk"],
+        result["finance_risk"],
+        result["market_risk"],
+        result["rd_risk"],
+    )
+    # 单产品模式: 叠加各轴参数实际解释的利润方差份额 (Sobol 总效应指数)
+    variance = None
+    if sobol is not None:
+        variance = tuple(max(sobol.share(name), 0.0) for name in RADAR_DRIVERS)
+    fig4 = section(
+        "radar", (risks, variance, theme, language),
+        lambda: radar_figure(risks, theme, language, variance=variance)
+    )
+    st.plotly_chart(fig4, use_container_width=True)
+    laps.lap("radar")
+
+# ===============================
+# 利润弹性 (前向模式求导, 一次计算全部输入)
+# ===============================
+if portfolio_results is None:
+    st.markdown(f"### 🌪️ {t('Profit Elasticities', '利润弹性分析')}")
     
-    values = [inventory_risk, material_risk, finance_risk, market_risk, rd_risk]
-    values += values[:1]  # 闭合图形
+    rows = section("elasticities", driver_key, lambda: elasticities(drivers))
+    top = rows[:12]
+    labels = [t(*(DRIVER_LABELS.get(row["input"]) or COEFFICIENT_LABELS[row["input"]])) for row in top]
+    fig8 = section(
+        "tornado", (driver_key, theme, language),
+        lambda: tornado_figure(labels, [row["elasticity"] for row in top], theme, language)
+    )
+    col_tornado, col_table = st.columns([3, 2])
+    with col_tornado:
+        st.plotly_chart(fig8, use_container_width=True)
+    with col_table:
+        st.dataframe({
+            t("Input", "输入"): [t(*(DRIVER_LABELS.get(row["input"]) or COEFFICIENT_LABELS[row["input"]])) for row in rows],
+            t("Value", "当前值"): [row["value"] for row in rows],
+            t("∂ Profit / ∂ Input", "∂ 利润 / ∂ 输入"): [row["derivative"] for row in rows],
+            t("Elasticity", "弹性"): [row["elasticity"] for row in rows],
+        }, hide_index=True)
+    closed_form_caption()
+    laps.lap("elasticities")
+
+# ===============================
+# 利润方差来源 (Sobol 指数, 准随机 Saltelli 抽样)
+# ===============================
+if portfolio_results is None:
+    st.markdown(f"### 🧭 {t('Profit Variance Drivers', '利润方差来源')}")
     
-    fig4 = go.Figure()
+    st.toggle(
+        t("Compute Sobol indices", "计算 Sobol 指数"),
+        key="sobol_on",
+        help=t(
+            "Runs about 260,000 model evaluations in the background after each slider change",
+            "每次滑块变化后在后台进行约 26 万次模型评估"
+        )
+    )
+    if st.session_state.get("sobol_on", False):
+        st.slider(
+            t("Uncertainty window (% of each slider range)", "不确定性区间 (占各滑块范围 %)"),
+            5, 100, step=5, key="sobol_width",
+            help=t(
+                "Each driver varies uniformly over this window around its current value",
+                "每个参数在当前值附近的该区间内均匀变化"
+            )
+        )
+    if sobol_job is not None and sobol_job.error is not None:
+        st.error(t(f"Sobol analysis failed: {sobol_job.error}", f"Sobol 分析失败: {sobol_job.error}"))
+    elif sobol_job is not None and not sobol_job.done:
+        st.progress(sobol_job.progress, text=t(
+            f"🧭 Estimating variance shares… {sobol_job.progress:.0%}",
+            f"🧭 正在估计方差份额… {sobol_job.progress:.0%}"
+        ))
+
+if sobol is not None:
+    labels = [t(*DRIVER_LABELS[name]) for name in sobol.names]
+    fig10 = section(
+        "sobol_figure", (sobol_key, sobol.evaluations, theme, language),
+        lambda: sobol_figure(sobol, labels, theme, language)
+    )
+    fig11 = section(
+        "sobol_convergence", (sobol_key, sobol.evaluations, theme, language),
+        lambda: sobol_convergence_figure(sobol, labels, theme, language)
+    )
+    col_sobol, col_convergence = st.columns(2)
+    with col_sobol:
+        st.plotly_chart(fig10, use_container_width=True)
+    with col_convergence:
+        st.plotly_chart(fig11, use_container_width=True)
     
-    fig4.add_trace(go.Scatterpolar(
-        r=values,
-        theta=categories + [categories[0]],
-        fill='toself',
-        fillcolor=f"rgba(0, 102, 204, 0.2)" if st.session_state.theme == "light" else "rgba(0, 245, 255, 0.2)",
-        line=dict(color=primary_color, width=2),
-        name=t("Risk Level", "风险水平")
+    status = t("✅ converged", "✅ 已收敛") if sobol.converged() else t("⚠️ not converged", "⚠️ 未收敛")
+    st.caption(t(
+        f"{sobol.evaluations:,} model evaluations in {sobol.elapsed * 1000:.0f} ms · σ(profit) ${sobol.variance ** 0.5:,.0f}K · "
+        f"ΣS = {sobol.first.sum():.3f} (1 = no interactions) · 95% CI ±{max(sobol.first_ci.max(), sobol.total_ci.max()):.4f} · "
+        f"change over last doubling {sobol.drift():.4f} · {status}",
+        f"{sobol.evaluations:,} 次模型评估, 用时 {sobol.elapsed * 1000:.0f} 毫秒 · σ(利润) ${sobol.variance ** 0.5:,.0f}K · "
+        f"ΣS = {sobol.first.sum():.3f} (1 = 无交互作用) · 95% 置信区间 ±{max(sobol.first_ci.max(), sobol.total_ci.max()):.4f} · "
+        f"最近一次样本加倍的变化 {sobol.drift():.4f} · {status}"
+    ))
+    closed_form_caption()
+    laps.lap("sobol")
+
+# ===============================
+# 渠道库存分布 (经销商级模拟)
+# ===============================
+st.markdown(f"### 🏪 {t('Channel Inventory', '渠道库存分布')}")
+
+fig9 = section(
+    "channel_figure", (inventory_growth, theme, language),
+    lambda: channel_figure(channel, theme, language)
+)
+st.plotly_chart(fig9, use_container_width=True)
+st.caption(t(
+    f"{channel.n_dealers:,} dealers × 52 weeks · aged stock (≥13 wks) {channel.aged_share:.1%} · "
+    f"overstocked dealers {channel.overstock_share:.1%} · lost sales {channel.stockout_rate:.1%}",
+    f"{channel.n_dealers:,} 家经销商 × 52 周 · 库龄 ≥13 周库存 {channel.aged_share:.1%} · "
+    f"超储经销商 {channel.overstock_share:.1%} · 缺货损失 {channel.stockout_rate:.1%}"
+))
+laps.lap("channel")
+
+# ===============================
+# 利润分布 (蒙特卡洛模式)
+# ===============================
+if sim_job is not None and sim_job.error is not None:
+    st.error(t(f"Simulation failed: {sim_job.error}", f"模拟失败: {sim_job.error}"))
+elif sim_job is not None and not sim_job.done:
+    st.progress(sim_job.progress, text=t(
+        f"🎲 Simulating… {sim_job.progress:.0%} (charts refine as samples arrive)",
+        f"🎲 模拟中… {sim_job.progress:.0%} (图表随样本到达逐步细化)"
     ))
+
+if sim is not None:
+    st.markdown(f"### 🎲 {t('Profit Distribution', '利润分布')}")
+    
+    col_sim1, col_sim2, col_sim3, col_sim4 = st.columns(4)
+    for col, label, value in [
+        (col_sim1, "P5", f"${sim.p5:,.0f}K"),
+        (col_sim2, "P50", f"${sim.p50:,.0f}K"),
+        (col_sim3, "P95", f"${sim.p95:,.0f}K"),
+        (col_sim4, t("Probability of Loss", "亏损概率"), f"{sim.prob_loss:.1%}"),
+    ]:
+        with col:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-label">{label}</div>
+                <div class="metric-value">{value}</div>
+                <div class="metric-delta">{t('Samples', '样本数')}: {sim.n_samples:,}</div>
+            </div>
+            """, unsafe_allow_html=True)
     
-    # 添加风险阈值圆
-    fig4.add_trace(go.Scatterpolar(
-        r=[50]*6,
-        theta=categories + [categories[0]],
-        mode='lines',
-        line=dict(color=f"rgba(220, 38, 38, 0.5)" if st.session_state.theme == "light" else "rgba(239, 68, 68, 0.5)", width=1, dash="dash"),
-        name=t("Warning Threshold", "警戒线"),
-        showlegend=True
+    fig5 = section(
+        "distribution", (sim_key, sim.n_samples, theme, language),
+        lambda: distribution_figure(sim, theme, language)
+    )
+    st.plotly_chart(fig5, use_container_width=True)
+    laps.lap("distribution")
+
+# ===============================
+# 产品组合汇总 (独立片段, 切换分组维度时不重跑整页)
+# ===============================
+PORTFOLIO_KEYS = {
+    "model": ("Model", "机型"),
+    "plant": ("Plant", "工厂"),
+    "region": ("Region", "区域"),
+}
+
+@st.fragment
+def portfolio_panel(table_key, driver_key, results):
+    st.markdown(f"### 🏭 {t('Portfolio Rollup', '产品组合汇总')}")
+    
+    by = st.multiselect(
+        t("Group by", "分组维度"),
+        list(PORTFOLIO_KEYS),
+        default=["plant"],
+        format_func=lambda name: t(*PORTFOLIO_KEYS[name])
+    ) or ["plant"]
+    
+    def build():
+        frame = portfolio.rollup(results, by=by)
+        labels = [" / ".join(map(str, key)) if isinstance(key, tuple) else str(key) for key in frame.index]
+        return {"labels": labels, **{name: frame[name].tolist() for name in frame.columns}}
+    
+    rolled = cache.shared("portfolio_rollup", (table_key, driver_key, tuple(by)), build)
+    fig7 = section(
+        "rollup_figure", (table_key, driver_key, tuple(by), theme, language),
+        lambda: rollup_figure(rolled, theme, language)
+    )
+    st.plotly_chart(fig7, use_container_width=True)
+    st.caption(t(
+        f"{len(results):,} product lines in {len(rolled['labels']):,} groups (top 20 shown)",
+        f"{len(results):,} 条产品线, {len(rolled['labels']):,} 个分组 (显示前 20)"
     ))
+
+if portfolio_results is not None:
+    portfolio_panel(table_key, driver_key, portfolio_results)
+    laps.lap("portfolio")
+
+# ===============================
+# 多年期预测 (独立片段)
+# ===============================
+@st.fragment
+def projection_panel(drivers, driver_key):
+    st.markdown(f"### 📅 {t('Multi-Year Projection', '多年期预测')}")
     
-    fig4.update_layout(
-        template=chart_template,
-        paper_bgcolor=chart_bgcolor,
-        plot_bgcolor=chart_bgcolor,
-        height=350,
-        margin=dict(l=40, r=40, t=40, b=20),
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100],
-                gridcolor=grid_color,
-                tickfont=dict(size=9, color=text_color)
-            ),
-            angularaxis=dict(
-                gridcolor=grid_color,
-                tickfont=dict(size=10, color=text_color)
-            )
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.2,
-            xanchor="center",
-            x=0.5,
-            font=dict(color=text_color)
+    proj_col1, proj_col2, proj_col3, proj_col4 = st.columns(4)
+    with proj_col1:
+        years = st.slider(t("Horizon (years)", "预测年限 (年)"), 5, 15, 10)
+    with proj_col2:
+        discount_rate = st.slider(t("Discount Rate %", "折现率 %"), 0, 20, 8)
+    with proj_col3:
+        volume_growth = st.slider(t("Volume Growth %/yr", "产量年增长 %"), -10, 20, 0)
+    with proj_col4:
+        rd_growth = st.slider(t("R&D Spend Growth %/yr", "研发投入年增长 %"), 0, 20, 0)
+    
+    def build():
+        projection = project(
+            **drivers,
+            years=years,
+            volume_growth=volume_growth,
+            rd_growth=rd_growth,
+            discount_rate=discount_rate,
         )
+        return {name: np.asarray(value).tolist() for name, value in projection.items()}
+    
+    projection = cache.shared(
+        "projection", (driver_key, years, discount_rate, volume_growth, rd_growth), build
+    )
+    fig6 = section(
+        "projection_figure", (driver_key, years, discount_rate, volume_growth, rd_growth, theme, language),
+        lambda: projection_figure(projection, theme, language)
     )
     
-    st.plotly_chart(fig4, use_container_width=True)
+    npv_col1, npv_col2, npv_col3 = st.columns(3)
+    for col, label, value in [
+        (npv_col1, t(f"NPV @ {discount_rate}%", f"净现值 @ {discount_rate}%"), f"${projection['npv']:,.0f}K"),
+        (npv_col2, t("Cumulative Profit", "累计利润"), f"${projection['cumulative_profit'][-1]:,.0f}K"),
+        (npv_col3, t("Capitalized R&D Asset", "资本化研发净值"), f"${projection['rd_asset'][-1]:,.0f}K"),
+    ]:
+        with col:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-label">{label}</div>
+                <div class="metric-value">{value}</div>
+                <div class="metric-delta">{t('Year', '第')} {years}{t('', ' 年')}</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.plotly_chart(fig6, use_container_width=True)
+    closed_form_caption()
+
+if portfolio_results is None:
+    projection_panel(drivers, driver_key)
+    laps.lap("projection")
+
+# ===============================
+# 管理面板 (?admin=1)
+# ===============================
+if st.query_params.get("admin") == "1":
+    with st.sidebar.expander(t("🛠 Admin: Result Cache", "🛠 管理: 结果缓存"), expanded=False):
+        rows = cache.cache_stats().snapshot()
+        lines = ["| Cache | Lookups | Hits | Misses | Hit % |", "|---|---:|---:|---:|---:|"]
+        for row in rows:
+            rate = row["hits"] / row["lookups"] if row["lookups"] else 0
+            lines.append(f"| {row['name']} | {row['lookups']} | {row['hits']} | {row['misses']} | {rate:.0%} |")
+        st.markdown("\n".join(lines))
+        st.caption(t(
+            f"LRU {cache.CACHE_MAX_ENTRIES} entries, TTL {cache.CACHE_TTL}s",
+            f"LRU {cache.CACHE_MAX_ENTRIES} 条, TTL {cache.CACHE_TTL} 秒"
+        ))
+        if st.button(t("Clear caches", "清空缓存")):
+            cache.clear()
+            st.session_state.pop("_sections", None)
+    
+    with st.sidebar.expander(t("⏱ Admin: Profiling", "⏱ 管理: 性能剖析"), expanded=False):
+        prof = profiling.profiler()
+        if laps.profiler is None:
+            st.caption(t(
+                "Profiling is off. Open with ?profile=1 or set SANDBOX_PROFILE=1.",
+                "性能剖析未开启. 使用 ?profile=1 或设置 SANDBOX_PROFILE=1."
+            ))
+        lines = ["| Section | Count | Mean ms | P50 | P95 | P99 | Max |", "|---|---:|---:|---:|---:|---:|---:|"]
+        for row in prof.snapshot():
+            lines.append(
+                f"| {row['name']} | {row['count']} | {row['mean_ms']:.1f} | {row['p50_ms']:.1f} "
+                f"| {row['p95_ms']:.1f} | {row['p99_ms']:.1f} | {row['max_ms']:.1f} |"
+            )
+        st.markdown("\n".join(lines))
+        st.caption(t("Rerun latency histogram", "重跑延迟直方图"))
+        st.bar_chart(prof.histogram("rerun"), height=180)
+        json_col, prom_col = st.columns(2)
+        json_col.download_button("JSON", prof.to_json(), "sandbox_profile.json", "application/json")
+        prom_col.download_button("Prometheus", prof.to_prometheus(), "sandbox_profile.prom", "text/plain")
+        if st.button(t("Reset timings", "重置计时")):
+            prof.reset()
+
+# ===============================
+# 演示广播: 本次重跑的渲染结果发给观众 (未变化的部件不重复编码)
+# ===============================
+broadcast({
+    "css": STYLESHEETS[theme],
+    "header": header_html + '<p class="caption-text">{}</p>'.format(
+        " · ".join(f"{t(*DRIVER_LABELS[name])} {value:g}" for name, value in drivers.items())
+    ),
+    "kpis": "".join(kpi_cards),
+    "titles": {
+        "waterfall": f"📊 {t('Lifecycle Profit Waterfall', '生命周期利润瀑布')}",
+        "donut": f"🥧 {t('Value Chain Structure', '价值链结构')}",
+        "sensitivity": f"📈 {t('Manufacturing Sensitivity', '制造敏感性分析')}",
+        "radar": f"🎯 {t('Strategic Risk Radar', '战略风险雷达')}",
+        "channel": f"🏪 {t('Channel Inventory', '渠道库存分布')}",
+        "distribution": f"🎲 {t('Profit Distribution', '利润分布')}",
+    },
+    "waterfall": fig,
+    "donut": fig3,
+    "radar": fig4,
+    "channel": fig9,
+    "distribution": fig5 if sim is not None else None,
+})
+
+# ===============================
+# 后台任务进度: 有新的部分结果时整页重跑, 完成后停止轮询
+# ===============================
+@st.fragment(run_every=0.3)
+def job_watcher(jobs, versions):
+    if any(job.version != version or job.done for job, version in zip(jobs, versions)):
+        st.rerun()
+
+running_jobs = [job for job in (sim_job, sobol_job) if job is not None and job.running]
+if running_jobs:
+    job_watcher(running_jobs, [job.version for job in running_jobs])
 
 # ===============================
 # 底部状态栏
@@ -939,3 +1032,4 @@ st.markdown(f"""
 </div>
 
 """, unsafe_allow_html=True)
+laps.finish()
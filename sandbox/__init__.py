@@ -0,0 +1,23 @@
+"""Strategic Profit Sandbox - 战略利润沙盘模型包."""
+
+from sandbox.model import (
+    DEFAULT_COEFFICIENTS,
+    DRIVERS,
+    LINE_ITEMS,
+    Coefficients,
+    Driver,
+    evaluate,
+    evaluate_frame,
+    evaluate_one,
+)
+
+__all__ = [
+    "DEFAULT_COEFFICIENTS",
+    "DRIVERS",
+    "LINE_ITEMS",
+    "Coefficients",
+    "Driver",
+    "evaluate",
+    "evaluate_frame",
+    "evaluate_one",
+]
@@ -0,0 +1,170 @@
+"""批量情景计算 Headless batch evaluation.
+
+用法 Usage::
+
+    python -m sandbox.batch scenarios.csv results.csv --workers 8
+    python -m sandbox.batch scenarios.parquet results.parquet --chunk-size 500000
+
+输入按块流式读取, 在进程池中并行计算, 结果按输入顺序增量写出; 内存占用
+只与块大小和进程数有关, 与文件行数无关. 缺失的驱动参数列取滑块默认值.
+Parquet 读写需要安装 pyarrow.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+from sandbox.model import DRIVERS, LINE_ITEMS, evaluate_frame
+
+
+def _is_parquet(path):
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as exc:
+        raise SystemExit("Parquet input/output requires pyarrow: pip install pyarrow") from exc
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most ``chunk_size`` rows from a CSV or Parquet file."""
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def evaluate_chunk(frame, columns=LINE_ITEMS):
+    """Evaluate one chunk; missing driver columns take their slider default."""
+    for name, driver in DRIVERS.items():
+        if name not in frame:
+            frame[name] = driver.default
+    result = evaluate_frame(frame)[list(columns)]
+    return pd.concat([frame[list(DRIVERS)], result], axis=1)
+
+
+def _evaluate_csv(frame, columns):
+    # CSV 格式化也在工作进程中完成, 主进程只负责顺序写出
+    return evaluate_chunk(frame, columns).to_csv(header=False, index=False, lineterminator="\n")
+
+
+class ChunkWriter:
+    """Append result chunks to a CSV or Parquet file.
+
+    CSV chunks arrive as pre-formatted text without header.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.rows = 0
+        self.parquet = _is_parquet(path)
+        if self.parquet:
+            self._writer = None
+        else:
+            self._writer = open(path, "w", newline="", encoding="utf-8")
+            self._writer.write(",".join([*DRIVERS, *columns]) + "\n")
+
+    def write(self, chunk):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+            self.rows += len(chunk)
+        else:
+            self._writer.write(chunk)
+            self.rows += chunk.count("\n")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run(input_path, output_path, workers=None, chunk_size=200_000, columns=LINE_ITEMS, progress=None):
+    """Stream ``input_path`` through the model into ``output_path``.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded
+    regardless of the input size. Returns the number of rows written.
+    """
+    if _is_parquet(input_path) or _is_parquet(output_path):
+        _require_pyarrow()
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path, columns)
+    task = evaluate_chunk if writer.parquet else _evaluate_csv
+    try:
+        if workers == 1:
+            for chunk in read_chunks(input_path, chunk_size):
+                writer.write(task(chunk, columns))
+                if progress:
+                    progress(writer.rows)
+            return writer.rows
+
+        with get_context("spawn").Pool(workers) as pool:
+            limit = 2 * workers
+            pending = deque()
+            for chunk in read_chunks(input_path, chunk_size):
+                pending.append(pool.apply_async(task, (chunk, columns)))
+                if len(pending) >= limit:
+                    writer.write(pending.popleft().get())
+                    if progress:
+                        progress(writer.rows)
+            while pending:
+                writer.write(pending.popleft().get())
+                if progress:
+                    progress(writer.rows)
+        return writer.rows
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sandbox.batch",
+        description="Evaluate the Strategic Profit Sandbox model over a CSV/Parquet scenario file.",
+    )
+    parser.add_argument("input", help="scenario file (.csv or .parquet) with driver columns: " + ", ".join(DRIVERS))
+    parser.add_argument("output", help="result file (.csv or .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count, 1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="rows per chunk (default: 200000)")
+    parser.add_argument(
+        "--columns",
+        default=",".join(LINE_ITEMS),
+        help="comma-separated line items to write (default: all)",
+    )
+    args = parser.parse_args(argv)
+
+    columns = [name.strip() for name in args.columns.split(",") if name.strip()]
+    unknown = sorted(set(columns) - set(LINE_ITEMS))
+    if unknown:
+        parser.error(f"unknown line items: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+
+    def progress(rows):
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows  {rows / elapsed:,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    rows = run(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size, columns=columns, progress=progress)
+    print(f"\nwrote {rows:,} rows to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""基准测试 Benchmark suite.
+
+用法 Usage::
+
+    python -m sandbox.bench --output bench.json
+    python -m sandbox.bench --baseline bench_baseline.json
+    python -m sandbox.bench --baseline bench_baseline.json --update-baseline
+
+测量三类指标:
+
+- 模型吞吐: 单点 ``evaluate_one`` 与批量 ``evaluate`` 每秒情景数, 以及
+  经销商渠道模拟 (1 万家 x 52 周) 和 10 万笔贷款信用损失的单次耗时;
+- 页面重跑: 用 Streamlit AppTest 执行 app.py, 记录首次运行以及滑块、主题、
+  语言切换后重跑的耗时 (中位数);
+- 冷启动: app.py 启动路径的导入耗时 (见 ``sandbox.startup``);
+- 图表体积: 每个图表 (fig 瀑布, fig2 敏感性及其 2D 曲面, fig3 环图, fig4 雷达) 序列化
+  后的字节数.
+
+结果写为 JSON; 给定基线文件时逐项对比, 超出容差的退化会列出并以非零
+状态退出.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import numpy as np
+
+from sandbox.model import DRIVERS, evaluate, evaluate_one
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+DEFAULTS = {name: driver.default for name, driver in DRIVERS.items()}
+
+
+def _metric(value, unit, better):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def _timeit(fn, repeat):
+    """Median wall time of ``repeat`` calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_model(quick=False):
+    """Scalar and batched evaluation throughput."""
+    metrics = {}
+    calls = 2_000 if quick else 20_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        evaluate_one(**DEFAULTS)
+    metrics["model.scalar"] = _metric(calls / (time.perf_counter() - start), "scenarios/s", "higher")
+
+    rng = np.random.default_rng(0)
+    for size in (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000):
+        columns = [rng.uniform(d.min, d.max, size) for d in DRIVERS.values()]
+        columns[0] = np.maximum(columns[0], 1.0)
+        elapsed = _timeit(lambda: evaluate(*columns), 3 if size >= 1_000_000 else 10)
+        metrics[f"model.batch_{size}"] = _metric(size / elapsed, "scenarios/s", "higher")
+
+    from sandbox.channel import simulate_channel
+
+    elapsed = _timeit(lambda: simulate_channel(DEFAULTS["inventory_growth"]), 3 if quick else 10)
+    metrics["model.channel"] = _metric(elapsed * 1000, "ms", "lower")
+
+    from sandbox.loanbook import credit_losses, synthetic_book
+
+    book = synthetic_book(100_000)
+    elapsed = _timeit(lambda: credit_losses(book, DEFAULTS["bad_debt_rate"]), 3 if quick else 10)
+    metrics["model.loanbook_100000"] = _metric(elapsed * 1000, "ms", "lower")
+
+    from sandbox.sobol import sobol_indices
+
+    elapsed = _timeit(lambda: sobol_indices(DEFAULTS), 3 if quick else 10)
+    metrics["model.sobol_262144"] = _metric(elapsed * 1000, "ms", "lower")
+    return metrics
+
+
+def bench_figures():
+    """Serialized size of each dashboard figure at the default drivers."""
+    import plotly.io as pio
+
+    from sandbox.charts import donut_figure, radar_figure, sensitivity_figure, surface_figure, waterfall_figure
+    from sandbox.model import DEFAULT_COEFFICIENTS
+    from sandbox.surface import profit_surface
+
+    r = evaluate_one(**DEFAULTS)
+    profits = tuple(r[name] for name in ("equipment_profit", "service_profit", "finance_profit", "used_profit", "total_profit"))
+    risks = tuple(r[name] for name in ("inventory_risk", "material_risk", "finance_risk", "market_risk", "rd_risk"))
+    builders = {
+        "fig": lambda theme, lang: waterfall_figure(profits, theme, lang),
+        "fig2": lambda theme, lang: sensitivity_figure(
+            r["fixed_cost"], DEFAULT_COEFFICIENTS.variable_per_unit, DEFAULTS["volume"], theme, lang
+        ),
+        "fig3": lambda theme, lang: donut_figure(profits, theme, lang),
+        "fig4": lambda theme, lang: radar_figure(risks, theme, lang),
+        "fig2_surface": lambda theme, lang: surface_figure(
+            profit_surface(DEFAULTS, "volume", "raw_material_increase").view(),
+            (DEFAULTS["volume"], DEFAULTS["raw_material_increase"]), ("volume", "raw_material_increase"), theme, lang
+        ),
+    }
+    metrics = {}
+    for name, build in builders.items():
+        size = len(pio.to_json(build("dark", "English"), validate=False).encode())
+        metrics[f"figure.{name}"] = _metric(size, "bytes", "lower")
+    return metrics
+
+
+def bench_startup():
+    """Import time of the app.py startup path in a fresh interpreter."""
+    from sandbox.startup import measure, startup_imports
+
+    rows = measure(startup_imports())
+    return {"startup.imports": _metric(sum(row[1] for row in rows) / 1000, "ms", "lower")}
+
+
+def bench_app(repeat=5):
+    """End-to-end script time of app.py under AppTest for typical interactions."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    metrics = {"app.first_run": _metric(time.perf_counter() - start, "s", "lower")}
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+
+    volume = DRIVERS["volume"]
+    language = next(box for box in at.selectbox if "English" in box.options)
+    actions = {
+        "app.slider": lambda i: at.slider(key="volume").set_value(volume.default - volume.step * (1 + i % 2)),
+        "app.theme": lambda i: at.selectbox(key="theme").set_value(("light", "dark")[i % 2]),
+        "app.language": lambda i: language.set_value(("English", "中文")[i % 2]),
+    }
+    for name, act in actions.items():
+        times = []
+        for i in range(repeat):
+            act(i)
+            start = time.perf_counter()
+            at.run()
+            times.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(f"app.py raised during {name}: {at.exception[0].message}")
+        metrics[name] = _metric(statistics.median(times), "s", "lower")
+    return metrics
+
+
+def compare(results, baseline, tolerance):
+    """Per-metric ratio to the baseline; regressions exceed ``tolerance``."""
+    rows = []
+    for name, metric in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or not base["value"]:
+            rows.append({"metric": name, "value": metric["value"], "baseline": None, "ratio": None, "regression": False})
+            continue
+        ratio = metric["value"] / base["value"]
+        worse = ratio < 1 - tolerance if metric["better"] == "higher" else ratio > 1 + tolerance
+        rows.append({"metric": name, "value": metric["value"], "baseline": base["value"], "ratio": ratio, "regression": worse})
+    return rows
+
+
+def _environment():
+    packages = {}
+    for package in ("streamlit", "plotly", "numpy", "pandas"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def run(quick=False, app=True, repeat=5):
+    metrics = {}
+    metrics.update(bench_model(quick))
+    metrics.update(bench_startup())
+    metrics.update(bench_figures())
+    if app:
+        metrics.update(bench_app(repeat))
+    return {"created": time.time(), "environment": _environment(), "metrics": metrics}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.bench", description="Benchmark the Strategic Profit Sandbox.")
+    parser.add_argument("--output", default="bench.json", help="result JSON (default: bench.json)")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=5, help="reruns per app interaction (default: 5)")
+    parser.add_argument("--quick", action="store_true", help="smaller model batches")
+    parser.add_argument("--no-app", action="store_true", help="skip the AppTest rerun benchmarks")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, app=not args.no_app, repeat=args.repeat)
+
+    regressions = []
+    if args.baseline and not args.update_baseline and Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        results["comparison"] = compare(results, baseline, args.tolerance)
+        regressions = [row for row in results["comparison"] if row["regression"]]
+
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.baseline and args.update_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    for name, metric in results["metrics"].items():
+        line = f"{name:<24} {metric['value']:>14,.4g} {metric['unit']}"
+        row = next((r for r in results.get("comparison", []) if r["metric"] == name), None)
+        if row and row["ratio"] is not None:
+            line += f"  x{row['ratio']:.2f} vs baseline" + ("  REGRESSION" if row["regression"] else "")
+        print(line)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""演示广播 Read-only broadcast of a presenter's dashboard.
+
+董事会演示时一位主讲人操作滑块, 几十位观众看同一个仪表盘. 观众不再各自
+运行 app.py: 主讲人会话 (侧栏 "演示广播" 或 ``?present=<房间>``) 每次重跑后把
+已经渲染好的 KPI 卡片 HTML 和图表 dict 发布到进程内的广播室; 每个部件只在
+对象变化时用 Plotly 的 JSON 编码器序列化一次, 之后按字节原样分发.
+
+观众打开轻量的静态页面 ``http://<主机>:8766/rooms/<房间>``, 由本模块在后台线程
+的 asyncio 服务器提供. 页面长轮询 ``/rooms/<房间>/snapshot?since=<版本>``, 只取回
+比自己版本新的部件, 用 ``Plotly.react`` 原地刷新. 每个观众请求只是拼接预先编码
+的字节; 没有变化时请求挂起到超时, 不会空转, 服务器 CPU 不随观众人数增长.
+房间只由主讲人创建; 观众先到时收到 404 并每隔几秒重试. 房间数已满时, 超过
+``ROOM_TTL`` 没有主讲人发布且没有观众等待的房间被回收.
+仪表盘以 ``?view=<房间>`` 打开时只嵌入该页面, 不做任何模型计算.
+
+接口 Endpoints:
+
+- ``GET /rooms/<房间>`` - 观众页面.
+- ``GET /rooms/<房间>/snapshot?since=<版本>`` - 新于 ``since`` 的部件; 超时返回 204,
+  房间不存在时返回 404.
+- ``GET /plotly.min.js``
+- ``GET /stats`` - 各房间的版本、部件数和正在等待的观众数.
+- ``GET /health``
+
+环境变量 ``SANDBOX_BROADCAST_HOST`` / ``SANDBOX_BROADCAST_PORT`` 指定监听地址,
+``SANDBOX_BROADCAST_URL`` 指定观众可访问的外部地址 (反向代理时). 本服务只提供
+HTTP; 仪表盘经 HTTPS 访问时, 浏览器会拦截嵌入的 ``http://`` 页面 (混合内容),
+须用 HTTPS 反向代理转发到本端口并把代理地址设为 ``SANDBOX_BROADCAST_URL``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+
+import streamlit as st
+
+HOST = os.environ.get("SANDBOX_BROADCAST_HOST", "0.0.0.0")
+PORT = int(os.environ.get("SANDBOX_BROADCAST_PORT", "8766"))
+PUBLIC_URL = os.environ.get("SANDBOX_BROADCAST_URL")
+
+POLL_TIMEOUT = 25.0  # 秒, 长轮询无变化时返回 204
+MAX_ROOMS = 64
+ROOM_TTL = 3600.0  # 秒, 房间满时回收此时长内无主讲人活动且无观众的房间
+ROOM_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+# 图表部件 (其余部件为 HTML 字符串或小 dict)
+FIGURES = ("waterfall", "donut", "sensitivity", "radar", "channel", "distribution")
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}
+
+LAYOUT_CSS = (
+    "body{padding:2rem}.kpis{display:grid;grid-template-columns:repeat(4,1fr);gap:1rem}"
+    ".charts{display:grid;grid-template-columns:1fr 1fr;gap:1rem}.charts>div[hidden]{display:none}"
+)
+
+
+def valid_room(room):
+    return isinstance(room, str) and ROOM_PATTERN.fullmatch(room) is not None
+
+
+def mixed_content(url, headers):
+    """Whether ``url`` is plain HTTP while the dashboard request (``headers``) came over HTTPS."""
+    secure = headers.get("x-forwarded-proto", "").lower() == "https" or headers.get("origin", "").startswith("https://")
+    return secure and url.startswith("http://")
+
+
+def _encode(name, value):
+    if name in FIGURES and value is not None:
+        from plotly.io.json import to_json_plotly
+
+        return to_json_plotly(value).encode()
+    return json.dumps(value).encode()
+
+
+class Room:
+    """Latest published parts of one room, each encoded once."""
+
+    def __init__(self, name):
+        self.name = name
+        self.version = 0
+        self.updated = 0.0
+        self.touched = time.monotonic()  # 主讲人最近一次打开或发布
+        self.parts = {}  # 部件 -> (版本, 原对象, 编码后的 JSON 字节)
+        self.waiters = set()  # 长轮询中的 future, 只在服务器事件循环中访问
+
+    def snapshot(self, since):
+        """JSON bytes with every part newer than ``since``."""
+        body = b",".join(
+            json.dumps(name).encode() + b":" + data
+            for name, (version, _, data) in self.parts.items()
+            if version > since
+        )
+        return b'{"version":%d,"parts":{%s}}' % (self.version, body)
+
+    def _wake(self):
+        for future in self.waiters:
+            if not future.done():
+                future.set_result(None)
+        self.waiters.clear()
+
+
+class Hub:
+    """Process-wide broadcast rooms plus the viewer HTTP server."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+        self._loop = None
+        self.error = None
+        self.port = None
+        self.requests = 0
+
+    def room(self, name):
+        with self._lock:
+            return self._rooms.get(name)
+
+    def open(self, name):
+        """Room ``name`` for a presenter, created if needed; ``None`` when all rooms are in use."""
+        with self._lock:
+            room = self._rooms.get(name)
+            if room is None:
+                if len(self._rooms) >= MAX_ROOMS:
+                    self._evict()
+                if len(self._rooms) >= MAX_ROOMS:
+                    return None
+                room = self._rooms[name] = Room(name)
+            room.touched = time.monotonic()
+            return room
+
+    def _evict(self):
+        idle = time.monotonic() - ROOM_TTL
+        for name, room in list(self._rooms.items()):
+            if room.touched < idle and not room.waiters:
+                del self._rooms[name]
+
+    def publish(self, name, parts):
+        """Publish ``parts`` (part name -> HTML string, dict or figure dict) to room ``name``.
+
+        Parts identical to the last published value are skipped, so an
+        unchanged rerun encodes nothing and wakes no viewer. ``None``
+        removes a part on the viewers' side. Returns the room version, or
+        ``None`` if the room could not be opened.
+        """
+        room = self.open(name)
+        if room is None:
+            return None
+        with self._lock:
+            changed = {}
+            for part, value in parts.items():
+                old = room.parts.get(part)
+                if old is not None and (old[1] is value or (part not in FIGURES and old[1] == value)):
+                    continue
+                changed[part] = value
+            if not changed:
+                return room.version
+            room.version += 1
+            room.updated = time.time()
+            for part, value in changed.items():
+                room.parts[part] = (room.version, value, _encode(part, value))
+            version = room.version
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(room._wake)
+        return version
+
+    def viewers(self, name):
+        """Viewers currently waiting on room ``name``."""
+        room = self.room(name)
+        return 0 if room is None else len(room.waiters)
+
+    def stats(self):
+        with self._lock:
+            rooms = {
+                name: {"version": room.version, "parts": len(room.parts), "viewers": len(room.waiters), "updated": room.updated}
+                for name, room in self._rooms.items()
+            }
+        return {"requests": self.requests, "rooms": rooms}
+
+    def url(self, room, host=None):
+        """Viewer page URL; ``host`` is the dashboard's Host header."""
+        if PUBLIC_URL:
+            return f"{PUBLIC_URL.rstrip('/')}/rooms/{room}"
+        hostname = re.sub(r":\d+$", "", host or "localhost")
+        return f"http://{hostname}:{self.port or PORT}/rooms/{room}"
+
+    # ---- 观众端 HTTP 服务 (后台线程中的事件循环) ----
+
+    def start(self, host=HOST, port=PORT):
+        """Serve viewers from a daemon thread; returns once listening (or failed)."""
+        ready = threading.Event()
+        threading.Thread(target=self._thread, args=(host, port, ready), name="sandbox-broadcast", daemon=True).start()
+        ready.wait(5)
+        return self
+
+    def _thread(self, host, port, ready):
+        loop = asyncio.new_event_loop()
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self._serve_connection, host, port, backlog=1024))
+        except OSError as exc:
+            self.error = exc
+            ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = loop
+        ready.set()
+        loop.run_forever()
+
+    async def _handle(self, method, target):
+        """Route one request; returns (status, content type, body, cacheable)."""
+        path, _, query = target.partition("?")
+        if method != "GET":
+            return 405, "application/json", b'{"error":"use GET"}', False
+        if path == "/health":
+            return 200, "application/json", b'{"status":"ok"}', False
+        if path == "/stats":
+            return 200, "application/json", json.dumps(self.stats()).encode(), False
+        if path == "/plotly.min.js":
+            return 200, "application/javascript", _plotly_js(), True
+        match = re.fullmatch(r"/rooms/([^/]+)(/snapshot)?", path)
+        if match is None or not valid_room(match[1]):
+            return 404, "application/json", json.dumps({"error": f"no route for {path}"}).encode(), False
+        if not match[2]:
+            return 200, "text/html; charset=utf-8", viewer_page(match[1]).encode(), False
+
+        try:
+            since = int(parse_qs(query).get("since", ["0"])[0])
+        except ValueError:
+            return 400, "application/json", b'{"error":"since must be an integer"}', False
+        # 观众可以先于主讲人进入房间: 页面收到 404 后稍后重试, 房间只由主讲人创建
+        room = self.room(match[1])
+        if room is None:
+            return 404, "application/json", b'{"error":"room not open yet"}', False
+        if since > room.version:
+            since = 0  # 服务重启后版本从头开始
+        if room.version == since:
+            future = asyncio.get_running_loop().create_future()
+            room.waiters.add(future)
+            try:
+                await asyncio.wait_for(future, POLL_TIMEOUT)
+            except asyncio.TimeoutError:
+                return 204, "application/json", b"", False
+            finally:
+                room.waiters.discard(future)
+        with self._lock:
+            body = room.snapshot(since)
+        return 200, "application/json", body, False
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                self.requests += 1
+                status, content_type, data, cacheable = await self._handle(method, target)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Cache-Control: {'public, max-age=86400' if cacheable else 'no-store'}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+_PLOTLY_JS = None
+
+
+def _plotly_js():
+    global _PLOTLY_JS
+    if _PLOTLY_JS is None:
+        from plotly.offline import get_plotlyjs
+
+        _PLOTLY_JS = get_plotlyjs().encode()
+    return _PLOTLY_JS
+
+
+def viewer_page(room):
+    """Static viewer page for ``room``; all content arrives through the snapshot poll."""
+    charts = "".join(f'<div id="box-{name}" hidden><h3 id="title-{name}"></h3><div id="{name}"></div></div>' for name in FIGURES)
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{room}</title>
+<script src="/plotly.min.js"></script><style>{LAYOUT_CSS}</style></head>
+<body class="stApp"><div id="css"></div><div id="header"></div><div class="kpis" id="kpis"></div>
+<div class="charts">{charts}</div><p class="caption-text" id="status"></p>
+<script>
+const ROOM = {json.dumps(room)}, FIGURES = {json.dumps(FIGURES)};
+let version = 0;
+function apply(parts) {{
+  for (const name of ["css", "header", "kpis"]) {{
+    if (name in parts) document.getElementById(name).innerHTML = parts[name] || "";
+  }}
+  if (parts.titles) for (const [name, title] of Object.entries(parts.titles)) {{
+    document.getElementById("title-" + name).textContent = title;
+  }}
+  for (const name of FIGURES) {{
+    if (!(name in parts)) continue;
+    const fig = parts[name], box = document.getElementById("box-" + name);
+    box.hidden = !fig;
+    if (fig) Plotly.react(name, fig.data, fig.layout, {{displayModeBar: false, responsive: true}});
+  }}
+}}
+async function poll() {{
+  const status = document.getElementById("status");
+  for (;;) {{
+    try {{
+      const response = await fetch(`/rooms/${{ROOM}}/snapshot?since=${{version}}`, {{cache: "no-store"}});
+      if (response.status === 200) {{
+        const snapshot = await response.json();
+        apply(snapshot.parts);
+        version = snapshot.version;
+        status.textContent = `📡 ${{ROOM}} · v${{version}}`;
+      }} else if (response.status === 404) {{
+        status.textContent = `📡 ${{ROOM}} · waiting for the presenter…`;
+        await new Promise(resolve => setTimeout(resolve, 2000));
+      }} else if (response.status !== 204) {{
+        throw new Error(response.statusText);
+      }}
+    }} catch (error) {{
+      status.textContent = `📡 ${{ROOM}} · reconnecting…`;
+      await new Promise(resolve => setTimeout(resolve, 2000));
+    }}
+  }}
+}}
+poll();
+</script></body></html>"""
+
+
+@st.cache_resource
+def broadcast_hub() -> Hub:
+    return Hub().start()
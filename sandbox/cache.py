@@ -0,0 +1,95 @@
+"""跨会话结果缓存 Process-wide result cache.
+
+所有滑块都是离散步长, 输入空间有限且在用户之间高度重复. 模型结果、模拟
+结果和序列化后的图表按 (量化后的滑块元组, 主题, 语言) 缓存在进程内,
+所有会话共享, 带 LRU 淘汰和 TTL.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import Counter
+
+import streamlit as st
+
+from sandbox.model import DRIVERS
+
+CACHE_MAX_ENTRIES = 4096
+CACHE_TTL = 3600  # 秒
+
+
+def quantize(drivers: dict) -> tuple:
+    """Snap driver values onto their slider lattice and return a hashable key."""
+    key = []
+    for name, driver in DRIVERS.items():
+        steps = round((drivers[name] - driver.min) / driver.step)
+        key.append(round(driver.min + steps * driver.step, 10))
+    return tuple(key)
+
+
+class CacheStats:
+    """Thread-safe lookup/miss counters per cache name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = Counter()
+        self.misses = Counter()
+
+    def lookup(self, name):
+        with self._lock:
+            self.lookups[name] += 1
+
+    def miss(self, name):
+        with self._lock:
+            self.misses[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "lookups": self.lookups[name],
+                    "hits": self.lookups[name] - self.misses[name],
+                    "misses": self.misses[name],
+                }
+                for name in sorted(self.lookups)
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.lookups.clear()
+            self.misses.clear()
+
+
+@st.cache_resource
+def cache_stats() -> CacheStats:
+    return CacheStats()
+
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def _shared(name, key, _build):
+    # 参数 _build 以下划线开头, 不参与缓存键的哈希
+    cache_stats().miss(name)
+    value = _build()
+    # 未导入 plotly 时不可能是图表, 避免为类型检查导入 plotly
+    go = sys.modules.get("plotly.graph_objects")
+    if go is not None and isinstance(value, go.Figure):
+        # Plotly 图表只缓存序列化后的 dict
+        value = value.to_dict()
+    return value
+
+
+def shared(name, key, build):
+    """Return the process-wide cached value for ``(name, key)``.
+
+    ``key`` must fully determine the result of ``build``; cached values are
+    shared between sessions and must be treated as read-only.
+    """
+    cache_stats().lookup(name)
+    return _shared(name, key, build)
+
+
+def clear():
+    _shared.clear()
+    cache_stats().reset()
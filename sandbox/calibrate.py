@@ -0,0 +1,258 @@
+"""系数标定 Streaming calibration from ERP/GL extracts.
+
+用法 Usage::
+
+    python -m sandbox.calibrate gl_2024.csv gl_2025.parquet -o calibration.json
+    python -m sandbox.calibrate gl_monthly.csv --periods-per-year 12 --portfolio portfolio.csv
+
+输入是总账明细的长表 (``period, product, account, amount``), 也可以是每个
+产品-期间一行的宽表 (列名即 ``MEASURES``). 文件按块读取 (CSV 按行数分块,
+Parquet 按 record batch), 每块立即按 (产品, 期间, 科目) 求和后并入累加表;
+累加表大小只取决于产品数 x 期间数, 与明细行数无关, 内存恒定.
+
+标定用向量化最小二乘: 各产品的充分统计量 (Σu, Σy, Σu², Σuy) 一次分组求和,
+再用闭式解同时求出全部产品的系数:
+
+- 单位收入/成本 (主机、材料、售后、金融、二手) 为过原点回归 y = b·units;
+- 制造成本为带截距回归 y = a + b·units, 截距按年化得到固定成本;
+- 研发总额 = 年均研发支出 x 摊销年限; 售后成本率为售后成本对售后收入的回归.
+
+输出的 JSON 参数文件含全部产品合计 (``pooled``, 沙盘启动时加载) 和逐产品
+系数; ``--portfolio`` 另存为产品组合模式可直接上传的系数表.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import fields
+from pathlib import Path
+
+import numpy as np
+
+from sandbox.model import CALIBRATION_PATH, Coefficients
+
+MEASURES = (
+    "units",
+    "equipment_revenue",
+    "material_cost",
+    "manufacturing_cost",
+    "rd_spend",
+    "service_revenue",
+    "service_cost",
+    "finance_revenue",
+    "finance_cost",
+    "used_profit",
+)
+
+# 总账科目 -> 标定口径; 未列出的科目忽略. 口径名本身也可直接作为科目
+ACCOUNTS = {
+    "6001": "equipment_revenue",
+    "6051": "service_revenue",
+    "6061": "finance_revenue",
+    "6071": "used_profit",
+    "6401": "material_cost",
+    "6402": "manufacturing_cost",
+    "6403": "service_cost",
+    "6411": "finance_cost",
+    "6602": "rd_spend",
+    "UNITS": "units",
+    **{name: name for name in MEASURES},
+}
+
+# 过原点回归: 系数 -> (因变量, 自变量)
+RATIOS = {
+    "revenue_per_unit": ("equipment_revenue", "units"),
+    "material_per_unit": ("material_cost", "units"),
+    "service_per_unit": ("service_revenue", "units"),
+    "service_cost_ratio": ("service_cost", "service_revenue"),
+    "finance_per_unit": ("finance_revenue", "units"),
+    "finance_cost_per_unit": ("finance_cost", "units"),
+    "used_per_unit": ("used_profit", "units"),
+}
+
+CHUNK_ROWS = 1_000_000
+KEYS = ("product", "period")
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrame chunks of a CSV or Parquet extract."""
+    import pandas as pd
+
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={"product": str, "period": str, "account": str})
+
+
+def chunk_totals(chunk):
+    """Sum one chunk into a (product, period) x measure frame.
+
+    Only measures that occur in the chunk become columns, so a measure
+    the extracts never mention stays missing rather than turning into
+    zeros.
+    """
+    missing = {*KEYS} - set(chunk.columns)
+    if missing:
+        raise ValueError(f"extract needs columns: {', '.join(sorted(missing))}")
+    if "account" in chunk:
+        measure = chunk["account"].astype(str).map(ACCOUNTS)
+        keep = measure.notna()
+        totals = (
+            chunk.loc[keep, "amount"].astype(np.float64)
+            .groupby([chunk.loc[keep, "product"].astype(str), chunk.loc[keep, "period"].astype(str), measure[keep]])
+            .sum()
+            .unstack()
+        )
+    else:
+        present = [name for name in MEASURES if name in chunk]
+        totals = chunk[[*KEYS, *present]].astype({"product": str, "period": str}).groupby(list(KEYS)).sum()
+    return totals.reindex(columns=[name for name in MEASURES if name in totals]).fillna(0.0)
+
+
+def accumulate(paths, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream every extract into per-(product, period) totals.
+
+    Returns ``(totals, rows)``; memory is bounded by one chunk plus the
+    totals table.
+    """
+    totals = None
+    rows = 0
+    for path in paths:
+        for chunk in read_chunks(path, chunk_rows):
+            rows += len(chunk)
+            part = chunk_totals(chunk)
+            totals = part if totals is None else totals.add(part, fill_value=0.0)
+            if progress:
+                progress(path, rows)
+    if totals is None:
+        raise ValueError("no rows in the extracts")
+    totals.index = totals.index.set_names(list(KEYS))
+    return totals.reindex(columns=MEASURES), rows
+
+
+def fit(totals, periods_per_year=1, coef=Coefficients()):
+    """Least-squares coefficients per product from (product, period) totals.
+
+    Returns a DataFrame indexed by product with one column per
+    ``Coefficients`` field plus ``volume`` (annual units), ``periods`` and
+    ``r2_manufacturing``. Coefficients whose measures never occur in
+    ``totals`` (all-NaN or absent columns) fall back to ``coef``; groups
+    whose units do not vary across periods keep its variable cost and put
+    the rest into fixed cost.
+    """
+    import pandas as pd
+
+    seen = {name for name in MEASURES if name in totals and totals[name].notna().any()}
+    if "units" not in seen:
+        raise ValueError("extract has no units")
+    totals = totals.reindex(columns=MEASURES).fillna(0.0)
+    u = totals["units"]
+    stats = pd.DataFrame({"n": 1.0, "u": u, "uu": u * u}, index=totals.index)
+    for name, (y, x) in RATIOS.items():
+        stats[f"xy_{name}"] = totals[x] * totals[y]
+        stats[f"xx_{name}"] = totals[x] * totals[x]
+    m = totals["manufacturing_cost"]
+    stats["m"] = m
+    stats["um"] = u * m
+    stats["mm"] = m * m
+    stats["rd"] = totals["rd_spend"]
+    g = stats.groupby(level="product", observed=True).sum()
+
+    out = pd.DataFrame(index=g.index)
+    for name, (y, x) in RATIOS.items():
+        default = np.full(len(g), float(getattr(coef, name)))
+        out[name] = np.divide(g[f"xy_{name}"], g[f"xx_{name}"], out=default, where=g[f"xx_{name}"] > 0) if {x, y} <= seen else default
+
+    # 制造成本 y = a + b·u 的闭式解; 产量无变化时 b 取默认值
+    det = g["n"] * g["uu"] - g["u"] ** 2
+    varies = (det > 1e-9 * np.maximum(g["uu"], 1.0) * g["n"]) & ("manufacturing_cost" in seen)
+    slope = np.divide(g["n"] * g["um"] - g["u"] * g["m"], det, out=np.full(len(g), float(coef.variable_per_unit)), where=varies)
+    intercept = (g["m"] - slope * g["u"]) / g["n"]
+    out["variable_per_unit"] = slope
+    out["fixed_cost"] = intercept * periods_per_year if "manufacturing_cost" in seen else float(coef.fixed_cost)
+    sse = g["mm"] - intercept * g["m"] - slope * g["um"]
+    sst = g["mm"] - g["m"] ** 2 / g["n"]
+    out["r2_manufacturing"] = np.where(varies & (sst > 0), 1 - sse / np.where(sst > 0, sst, 1.0), np.nan)
+
+    out["rd_total"] = g["rd"] / g["n"] * periods_per_year * coef.rd_years if "rd_spend" in seen else float(coef.rd_total)
+    out["rd_years"] = coef.rd_years
+    out["volume"] = g["u"] / g["n"] * periods_per_year
+    out["periods"] = g["n"].astype(int)
+    return out[[f.name for f in fields(Coefficients)] + ["volume", "periods", "r2_manufacturing"]]
+
+
+def calibrate(paths, periods_per_year=1, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream ``paths`` and fit pooled and per-product coefficients.
+
+    Returns ``(params, products)``: the JSON-ready parameter dict and the
+    per-product coefficient frame.
+    """
+    totals, rows = accumulate(paths, chunk_rows, progress)
+    products = fit(totals, periods_per_year)
+    # 合计口径: 各期间所有产品求和后按同一方法回归
+    pooled_totals = totals.groupby(level="period").sum(min_count=1)
+    pooled_totals.index = pooled_totals.index.map(lambda period: ("ALL", period)).set_names(list(KEYS))
+    pooled = fit(pooled_totals, periods_per_year).iloc[0]
+
+    def coefficients(row):
+        return {f.name: round(float(row[f.name]), 6) for f in fields(Coefficients)}
+
+    params = {
+        "created": time.time(),
+        "sources": [str(path) for path in paths],
+        "rows": rows,
+        "periods_per_year": periods_per_year,
+        "periods": int(pooled["periods"]),
+        "volume": round(float(pooled["volume"]), 3),
+        "r2_manufacturing": None if np.isnan(pooled["r2_manufacturing"]) else round(float(pooled["r2_manufacturing"]), 4),
+        "pooled": coefficients(pooled),
+        "products": {str(product): coefficients(row) for product, row in products.iterrows()},
+    }
+    return params, products
+
+
+def write_portfolio(products, path):
+    """Write per-product coefficients as a portfolio-mode coefficient table."""
+    table = products.drop(columns=["periods", "r2_manufacturing"]).rename_axis("model").reset_index()
+    table = table[table["volume"] > 0]
+    if str(path).lower().endswith((".parquet", ".pq")):
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+    return len(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.calibrate", description="Calibrate model coefficients from ERP/GL extracts.")
+    parser.add_argument("extracts", nargs="+", help="CSV or Parquet extracts (long GL or wide per product-period)")
+    parser.add_argument("-o", "--output", default=CALIBRATION_PATH, help=f"parameter file (default: {CALIBRATION_PATH})")
+    parser.add_argument("--periods-per-year", type=float, default=1, help="periods per year in the extracts, e.g. 12 for monthly")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--portfolio", default=None, help="also write per-product coefficients as a portfolio table")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    def progress(path, rows):
+        print(f"\r{path}: {rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    params, products = calibrate(args.extracts, args.periods_per_year, args.chunk_rows, progress)
+    Path(args.output).write_text(json.dumps(params, indent=1), encoding="utf-8")
+    print(f"\n{params['rows']:,} rows, {len(products)} products, {params['periods']} periods "
+          f"in {time.perf_counter() - start:.1f}s -> {args.output}", file=sys.stderr)
+    if args.portfolio:
+        print(f"{write_portfolio(products, args.portfolio)} product lines -> {args.portfolio}", file=sys.stderr)
+    defaults = Coefficients()
+    for name, value in params["pooled"].items():
+        print(f"{name:<24}{value:>14,.4f}  (default {getattr(defaults, name):g})")
+
+
+if __name__ == "__main__":
+    main()
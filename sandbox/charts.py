@@ -0,0 +1,660 @@
+"""图表构建 Plotly figure builders.
+
+每个函数只接收自身依赖的输入 (数值、主题名、语言), 方便按依赖缓存,
+也可脱离 Streamlit 使用.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import plotly.graph_objects as go
+
+from sandbox.model import MODEL, RISK_THRESHOLD, WATERFALL_ITEMS
+from sandbox.theme import THEMES
+
+
+def _t(language, en, cn):
+    return en if language == "English" else cn
+
+
+def waterfall_figure(profits, theme, language, band=None):
+    """Lifecycle profit waterfall.
+
+    ``profits`` holds the values of ``WATERFALL_ITEMS`` (segment profits,
+    then the total); categories and labels come from the model graph.
+    ``band`` is an optional (p5, p50, p95) from the Monte Carlo simulation.
+    """
+    p = THEMES[theme]
+    nodes = [MODEL.nodes[name] for name in WATERFALL_ITEMS]
+    fig = go.Figure(go.Waterfall(
+        measure=["total" if "total" in node.tags else "relative" for node in nodes],
+        x=[_t(language, *node.label) for node in nodes],
+        y=list(profits),
+        text=[f"${x:,.0f}K" for x in profits],
+        textposition="outside",
+        connector={"line": {"color": p["connector_color"], "width": 2}},
+        increasing={"marker": {"color": p["primary_color"]}},
+        decreasing={"marker": {"color": p["danger_color"]}},
+        totals={"marker": {"color": p["secondary_color"]}}
+    ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=400,
+        margin=dict(l=20, r=20, t=40, b=20),
+        font=dict(family="Inter, sans-serif", color=p["text_color"]),
+        xaxis=dict(
+            tickfont=dict(size=11),
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Profit ($K)", "利润 (千美元)"),
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        showlegend=False
+    )
+
+    if band is not None:
+        # P5-P95 区间与中位数
+        p5, p50, p95 = band
+        fig.add_hrect(
+            y0=p5, y1=p95,
+            fillcolor=p["danger_color"], opacity=0.12, line_width=0,
+            annotation_text=f"P5–P95: ${p5:,.0f}K – ${p95:,.0f}K",
+            annotation_position="top left",
+            annotation_font=dict(color=p["text_color"], size=10)
+        )
+        fig.add_hline(y=p50, line=dict(color=p["danger_color"], width=1, dash="dash"))
+    return fig
+
+
+def donut_figure(profits, theme, language, center=None):
+    """Value chain structure donut.
+
+    ``profits`` is (equipment, service, finance, used, total); ``center`` an
+    optional (p50, prob_loss) from the Monte Carlo simulation.
+    """
+    p = THEMES[theme]
+    equipment_profit, service_profit, finance_profit, used_profit, total_profit = profits
+    fig = go.Figure(data=[go.Pie(
+        labels=[
+            _t(language, "Equipment", "主机"),
+            _t(language, "Service", "售后"),
+            _t(language, "Finance", "金融"),
+            _t(language, "Used", "二手机")
+        ],
+        values=[equipment_profit, service_profit, finance_profit, used_profit],
+        hole=0.6,
+        marker=dict(colors=p["colors"], line=dict(color=p["pie_line_color"], width=2)),
+        textinfo="label+percent",
+        textfont=dict(size=11, color=p["text_color"]),
+        hovertemplate="%{label}<br>$%{value:,.0f}K<br>%{percent}<extra></extra>"
+    )])
+
+    if center is None:
+        text = f"${total_profit:,.0f}K"
+    else:
+        p50, prob_loss = center
+        text = (
+            f"P50 ${p50:,.0f}K<br><span style='font-size:12px'>"
+            f"{_t(language, 'P(loss)', '亏损概率')} {prob_loss:.1%}</span>"
+        )
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=400,
+        margin=dict(l=20, r=20, t=40, b=20),
+        showlegend=False,
+        annotations=[dict(
+            text=text,
+            x=0.5, y=0.5,
+            font=dict(size=20, color=p["text_color"], family="Inter"),
+            showarrow=False
+        )]
+    )
+    return fig
+
+
+def sensitivity_figure(fixed_cost, variable_per_unit, volume, theme, language):
+    """Unit manufacturing cost versus volume, with the current position."""
+    p = THEMES[theme]
+    volumes_range = np.arange(200, 2000, 50)
+    unit_cost_curve = (fixed_cost / volumes_range) + variable_per_unit
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=volumes_range,
+        y=unit_cost_curve,
+        mode='lines',
+        name=_t(language, "Unit Cost", "单位成本"),
+        line=dict(color=p["primary_color"], width=3),
+        fill='tozeroy',
+        fillcolor=p["fill_color"]
+    ))
+
+    # 添加当前产量标记
+    current_unit_cost = (fixed_cost / volume) + variable_per_unit
+    fig.add_trace(go.Scatter(
+        x=[volume],
+        y=[current_unit_cost],
+        mode='markers',
+        name=_t(language, "Current Position", "当前位置"),
+        marker=dict(color=p["danger_color"], size=12, symbol="diamond",
+                    line=dict(color="white", width=2))
+    ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=350,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(
+            title=_t(language, "Production Volume", "产量 (台)"),
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Unit Cost ($K)", "单位成本 (千美元)"),
+            gridcolor=p["grid_color"]
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def surface_figure(view, current, labels, theme, language):
+    """Profit heatmap over two drivers with the break-even line and current point.
+
+    ``view`` is a ``SurfaceView``: the heatmap is block-averaged server
+    side; the break-even crossings come from the full-resolution grid and
+    are drawn as a WebGL scatter.
+    """
+    p = THEMES[theme]
+    x, y, z = view.x, view.y, view.z
+    low, high = view.extent()
+    diverging = low < 0 < high
+    fig = go.Figure(go.Heatmap(
+        x=x,
+        y=y,
+        z=z,
+        zmid=0 if diverging else None,
+        colorscale=[[0, p["danger_color"]], [0.5, p["css"]["bg-end"]], [1, p["primary_color"]]]
+        if diverging else [[0, p["css"]["bg-end"]], [1, p["primary_color"]]],
+        colorbar=dict(title=dict(text="$K", font=dict(color=p["text_color"])), tickfont=dict(color=p["text_color"])),
+        hovertemplate=f"{labels[0]}: %{{x:.3g}}<br>{labels[1]}: %{{y:.3g}}<br>$%{{z:,.0f}}K<extra></extra>"
+    ))
+
+    xs, ys = view.contour_x, view.contour_y
+    if len(xs):
+        fig.add_trace(go.Scattergl(
+            x=xs,
+            y=ys,
+            mode="markers",
+            name=_t(language, "Break-even", "盈亏平衡线"),
+            marker=dict(color=p["text_color"], size=2),
+            hoverinfo="skip"
+        ))
+    fig.add_trace(go.Scattergl(
+        x=[current[0]],
+        y=[current[1]],
+        mode="markers",
+        name=_t(language, "Current Position", "当前位置"),
+        marker=dict(color=p["danger_color"], size=12, symbol="diamond",
+                    line=dict(color="white", width=2))
+    ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=350,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(title=labels[0], gridcolor=p["grid_color"]),
+        yaxis=dict(title=labels[1], gridcolor=p["grid_color"]),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def radar_figure(risks, theme, language, variance=None):
+    """Strategic risk radar; ``risks`` is (inventory, material, finance, market, R&D).
+
+    ``variance`` optionally gives, per axis, the percent of profit variance
+    the matching driver explains (total-order Sobol index x 100).
+    """
+    p = THEMES[theme]
+    categories = [
+        _t(language, "Inventory", "库存风险"),
+        _t(language, "Raw Material", "原材料"),
+        _t(language, "Finance", "金融风险"),
+        _t(language, "Market", "市场风险"),
+        _t(language, "R&D", "研发风险")
+    ]
+    values = list(risks)
+    values += values[:1]  # 闭合图形
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories + [categories[0]],
+        fill='toself',
+        fillcolor=p["radar_fill_color"],
+        line=dict(color=p["primary_color"], width=2),
+        name=_t(language, "Risk Level", "风险水平")
+    ))
+
+    # 添加风险阈值圆
+    fig.add_trace(go.Scatterpolar(
+        r=[RISK_THRESHOLD] * 6,
+        theta=categories + [categories[0]],
+        mode='lines',
+        line=dict(color=p["threshold_color"], width=1, dash="dash"),
+        name=_t(language, "Warning Threshold", "警戒线"),
+        showlegend=True
+    ))
+
+    if variance is not None:
+        shares = list(variance)
+        fig.add_trace(go.Scatterpolar(
+            r=shares + shares[:1],
+            theta=categories + [categories[0]],
+            mode="lines+markers",
+            line=dict(color=p["colors"][2], width=2),
+            marker=dict(size=5),
+            name=_t(language, "Share of Profit Variance %", "利润方差占比 %"),
+            hovertemplate="%{theta}: %{r:.1f}%<extra></extra>"
+        ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=350,
+        margin=dict(l=40, r=40, t=40, b=20),
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100],
+                gridcolor=p["grid_color"],
+                tickfont=dict(size=9, color=p["text_color"])
+            ),
+            angularaxis=dict(
+                gridcolor=p["grid_color"],
+                tickfont=dict(size=10, color=p["text_color"])
+            )
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def distribution_figure(sim, theme, language):
+    """Histogram of simulated total_profit with P5/P50/P95 markers."""
+    p = THEMES[theme]
+    counts, edges = sim.coarse_histogram()
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts / sim.n_samples,
+        width=np.diff(edges),
+        marker=dict(color=np.where(edges[:-1] < 0, p["danger_color"], p["primary_color"])),
+        hovertemplate="$%{x:,.0f}K<br>%{y:.2%}<extra></extra>"
+    ))
+    for q, value in [("P5", sim.p5), ("P50", sim.p50), ("P95", sim.p95)]:
+        fig.add_vline(
+            x=value,
+            line=dict(color=p["secondary_color"], width=1, dash="dash"),
+            annotation_text=q,
+            annotation_font=dict(color=p["text_color"], size=10)
+        )
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=300,
+        margin=dict(l=20, r=20, t=40, b=20),
+        bargap=0,
+        xaxis=dict(
+            title=_t(language, "Total Profit ($K)", "总利润 (千美元)"),
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Probability", "概率"),
+            tickformat=".1%",
+            gridcolor=p["grid_color"]
+        ),
+        showlegend=False
+    )
+    return fig
+
+
+def channel_figure(channel, theme, language, bins=40):
+    """Histogram of dealer stock cover (weeks) at year end."""
+    from sandbox.channel import COVER_WEEKS, OVERSTOCK_COVER
+
+    p = THEMES[theme]
+    upper = max(2 * OVERSTOCK_COVER, float(np.quantile(channel.cover, 0.99)))
+    counts, edges = np.histogram(np.minimum(channel.cover, upper), bins=bins, range=(0.0, upper))
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts / channel.n_dealers,
+        width=np.diff(edges),
+        marker=dict(color=np.where(edges[:-1] >= OVERSTOCK_COVER, p["danger_color"], p["primary_color"])),
+        hovertemplate=_t(language, "%{x:.1f} wks", "%{x:.1f} 周") + "<br>%{y:.2%}<extra></extra>"
+    ))
+    for label, value in [(_t(language, "Target", "目标"), COVER_WEEKS), (_t(language, "Overstock", "超储"), OVERSTOCK_COVER)]:
+        fig.add_vline(
+            x=value,
+            line=dict(color=p["secondary_color"], width=1, dash="dash"),
+            annotation_text=label,
+            annotation_font=dict(color=p["text_color"], size=10)
+        )
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=300,
+        margin=dict(l=20, r=20, t=40, b=20),
+        bargap=0,
+        xaxis=dict(
+            title=_t(language, "Dealer Stock Cover (weeks)", "经销商库存可销周数"),
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Share of Dealers", "经销商占比"),
+            tickformat=".1%",
+            gridcolor=p["grid_color"]
+        ),
+        showlegend=False
+    )
+    return fig
+
+
+def projection_figure(projection, theme, language):
+    """Stacked yearly segment profits with cumulative NPV on a second axis.
+
+    ``projection`` is the dict returned by ``sandbox.projection.project``
+    for a single scenario.
+    """
+    p = THEMES[theme]
+    years = projection["year"]
+    names = [
+        ("equipment_profit", _t(language, "Equipment", "主机")),
+        ("service_profit", _t(language, "Service", "售后")),
+        ("finance_profit", _t(language, "Finance", "金融")),
+        ("used_profit", _t(language, "Used", "二手机")),
+    ]
+    fig = go.Figure()
+    for (key, label), color in zip(names, p["colors"]):
+        fig.add_trace(go.Bar(
+            x=years,
+            y=projection[key],
+            name=label,
+            marker=dict(color=color),
+            hovertemplate="%{x}: $%{y:,.0f}K<extra>" + label + "</extra>"
+        ))
+    fig.add_trace(go.Scatter(
+        x=years,
+        y=projection["cumulative_npv"],
+        mode="lines+markers",
+        name=_t(language, "Cumulative NPV", "累计净现值"),
+        line=dict(color=p["danger_color"], width=3),
+        yaxis="y2"
+    ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=380,
+        barmode="relative",
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(
+            title=_t(language, "Year", "年份"),
+            dtick=1,
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Profit ($K)", "利润 (千美元)"),
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        yaxis2=dict(
+            title=_t(language, "Cumulative NPV ($K)", "累计净现值 (千美元)"),
+            overlaying="y",
+            side="right",
+            showgrid=False
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def rollup_figure(rollup, theme, language, top=20):
+    """Horizontal stacked segment profits per portfolio group.
+
+    ``rollup`` maps ``labels`` and the four segment profit columns to lists,
+    sorted by total profit; only the first ``top`` groups are drawn.
+    """
+    p = THEMES[theme]
+    labels = list(rollup["labels"][:top])[::-1]
+    names = [
+        ("equipment_profit", _t(language, "Equipment", "主机")),
+        ("service_profit", _t(language, "Service", "售后")),
+        ("finance_profit", _t(language, "Finance", "金融")),
+        ("used_profit", _t(language, "Used", "二手机")),
+    ]
+    fig = go.Figure()
+    for (key, label), color in zip(names, p["colors"]):
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=list(rollup[key][:top])[::-1],
+            name=label,
+            orientation="h",
+            marker=dict(color=color),
+            hovertemplate="%{y}: $%{x:,.0f}K<extra>" + label + "</extra>"
+        ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=max(300, 28 * len(labels) + 120),
+        barmode="relative",
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(
+            title=_t(language, "Profit ($K)", "利润 (千美元)"),
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        yaxis=dict(gridcolor=p["grid_color"]),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def tornado_figure(labels, elasticities, theme, language):
+    """Elasticity tornado: % change of total profit per 1 % change of each input.
+
+    ``labels`` and ``elasticities`` are aligned and sorted largest first.
+    """
+    p = THEMES[theme]
+    labels = list(labels)[::-1]
+    values = list(elasticities)[::-1]
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=values,
+        orientation="h",
+        marker=dict(color=[p["primary_color"] if v >= 0 else p["danger_color"] for v in values]),
+        text=[f"{v:+.2f}" for v in values],
+        textposition="outside",
+        hovertemplate="%{y}: %{x:+.3f}<extra></extra>"
+    ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=max(300, 26 * len(labels) + 100),
+        margin=dict(l=20, r=40, t=40, b=20),
+        font=dict(family="Inter, sans-serif", color=p["text_color"]),
+        xaxis=dict(
+            title=_t(language, "Elasticity of total profit", "总利润弹性"),
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        yaxis=dict(gridcolor=p["grid_color"]),
+        showlegend=False
+    )
+    return fig
+
+
+def sobol_figure(sobol, labels, theme, language):
+    """First- and total-order Sobol indices per driver with 95% intervals.
+
+    ``labels`` are aligned with ``sobol.names``; drivers are sorted by
+    total-order index, largest on top.
+    """
+    p = THEMES[theme]
+    order = np.argsort(sobol.total)
+    labels = [labels[i] for i in order]
+    fig = go.Figure()
+    for values, ci, name, color in [
+        (sobol.first, sobol.first_ci, _t(language, "First order S", "一阶 S"), p["secondary_color"]),
+        (sobol.total, sobol.total_ci, _t(language, "Total order S_T", "总效应 S_T"), p["primary_color"]),
+    ]:
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=values[order],
+            error_x=dict(type="data", array=ci[order], color=p["text_color"], thickness=1),
+            orientation="h",
+            name=name,
+            marker=dict(color=color),
+            hovertemplate="%{y}: %{x:.4f}<extra>" + name + "</extra>"
+        ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=max(300, 40 * len(labels) + 100),
+        barmode="group",
+        margin=dict(l=20, r=20, t=40, b=20),
+        font=dict(family="Inter, sans-serif", color=p["text_color"]),
+        xaxis=dict(
+            title=_t(language, "Share of total profit variance", "占总利润方差的比例"),
+            tickformat=".0%",
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        yaxis=dict(gridcolor=p["grid_color"]),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
+
+
+def sobol_convergence_figure(sobol, labels, theme, language):
+    """Sobol index estimates against model evaluations (log scale).
+
+    Solid lines are total-order, dotted lines first-order indices.
+    """
+    p = THEMES[theme]
+    colors = [*p["colors"], p["danger_color"], p["text_color"]]
+    fig = go.Figure()
+    for i, label in enumerate(labels):
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Scatter(
+            x=sobol.checkpoints,
+            y=sobol.total_path[:, i],
+            mode="lines+markers",
+            name=label,
+            legendgroup=label,
+            line=dict(color=color, width=2),
+            marker=dict(size=4),
+            hovertemplate="%{x:,} · S_T %{y:.4f}<extra>" + label + "</extra>"
+        ))
+        fig.add_trace(go.Scatter(
+            x=sobol.checkpoints,
+            y=sobol.first_path[:, i],
+            mode="lines",
+            name=label,
+            legendgroup=label,
+            showlegend=False,
+            line=dict(color=color, width=1, dash="dot"),
+            hovertemplate="%{x:,} · S %{y:.4f}<extra>" + label + "</extra>"
+        ))
+
+    fig.update_layout(
+        template=p["chart_template"],
+        paper_bgcolor=p["chart_bgcolor"],
+        plot_bgcolor=p["chart_bgcolor"],
+        height=340,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(
+            title=_t(language, "Model evaluations", "模型评估次数"),
+            type="log",
+            gridcolor=p["grid_color"]
+        ),
+        yaxis=dict(
+            title=_t(language, "Sobol index", "Sobol 指数"),
+            gridcolor=p["grid_color"],
+            zerolinecolor=p["zeroline_color"]
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=p["text_color"])
+        )
+    )
+    return fig
@@ -0,0 +1,203 @@
+"""预计算结果立方体 Precomputed result cube.
+
+用法 Usage::
+
+    python -m sandbox.cube build            # 默认写到项目目录下的 cube/
+    python -m sandbox.cube lookup --volume 1200 --rd_rate 0.4
+
+所有滑块都是离散步长, 完整输入空间是约 6100 万个点的网格. 离线构建时,
+每个输出只在它真正依赖的滑块轴上存储 (依赖关系取自模型计算图), 例如
+``unit_cost`` 只随产量变化, 利润类指标不随经销商库存变化; 这样 8 个核心
+指标加 10 年 NPV 只需约 130 MB, 而不是按完整网格存储的数 GB.
+
+每个输出存为一个 ``.npy`` 文件, 运行时以 ``mmap_mode="r"`` 映射, 多个工作
+进程共享同一份页缓存; 任意滑块状态的查询是 O(1) 的下标运算.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+
+from sandbox.model import DEFAULT_COEFFICIENTS, DRIVERS, MODEL, PROJECT_DIR, evaluate
+from sandbox.optimizer import RISKS, lattice
+
+OUTPUTS = ("total_profit", "unit_cost", "service_ratio", *RISKS)
+
+# 派生指标: 名称 -> (依赖的模型输出, 说明)
+DERIVED = {
+    "npv": ("total_profit", "10-year NPV at 8 % with default growth settings"),
+}
+
+# 默认放在项目目录下, 与启动时的工作目录无关
+DEFAULT_PATH = os.environ.get("SANDBOX_CUBE", str(PROJECT_DIR / "cube"))
+
+CHUNK_POINTS = 1 << 16
+
+
+def axes_of(output):
+    """Driver axes an output depends on, in ``DRIVERS`` order."""
+    upstream = MODEL.upstream(output)
+    return tuple(name for name in DRIVERS if name in upstream)
+
+
+def _npv(**drivers):
+    from sandbox.projection import project
+
+    return project(**drivers)["npv"]
+
+
+def _compute(names, axes, block):
+    """Evaluate ``names`` on an open grid over ``axes`` given per-axis values."""
+    point = {name: DRIVERS[name].default for name in DRIVERS}
+    ndim = len(axes)
+    for i, name in enumerate(axes):
+        point[name] = np.asarray(block[name], dtype=np.float64).reshape([-1 if j == i else 1 for j in range(ndim)])
+    shape = tuple(len(block[name]) for name in axes)
+    out = {}
+    model = [name for name in names if name not in DERIVED]
+    if model:
+        result = evaluate(**point)
+        out.update({name: np.broadcast_to(result[name], shape) for name in model})
+    for name in names:
+        if name in DERIVED:
+            out[name] = np.broadcast_to(_npv(**{k: np.broadcast_to(v, shape) for k, v in point.items()}), shape)
+    return out
+
+
+def build(path=DEFAULT_PATH, outputs=OUTPUTS, derived=tuple(DERIVED), progress=None):
+    """Precompute ``outputs`` and ``derived`` metrics into ``path``.
+
+    Outputs sharing the same axes are computed together, in chunks along
+    the leading axes so memory stays bounded. Returns the manifest.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    groups = {}
+    for name in (*outputs, *derived):
+        axes = axes_of(DERIVED[name][0] if name in DERIVED else name)
+        groups.setdefault(axes, []).append(name)
+
+    manifest = {
+        "created": time.time(),
+        "axes": {name: lattice(name).tolist() for name in DRIVERS},
+        "coefficients": asdict(DEFAULT_COEFFICIENTS),
+        "outputs": {},
+    }
+    for axes, names in groups.items():
+        values = {name: lattice(name) for name in axes}
+        shape = tuple(len(values[name]) for name in axes)
+        arrays = {}
+        for name in names:
+            arrays[name] = np.lib.format.open_memmap(path / f"{name}.npy", mode="w+", dtype=np.float64, shape=shape)
+            manifest["outputs"][name] = {"axes": list(axes), "file": f"{name}.npy"}
+
+        # 沿前导轴分块: 前 k 个轴逐点展开, 其余轴整块广播
+        lead = 0
+        while lead < len(axes) and int(np.prod(shape[lead:])) > CHUNK_POINTS:
+            lead += 1
+        for index in np.ndindex(*shape[:lead]):
+            block = {name: values[name][index[i]:index[i] + 1] if i < lead else values[name] for i, name in enumerate(axes)}
+            out = _compute(names, axes, block)
+            for name in names:
+                arrays[name][index] = out[name][(0,) * lead]
+            if progress:
+                progress(names, index, shape[:lead])
+        for array in arrays.values():
+            array.flush()
+        del arrays
+
+    (path / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+class Cube:
+    """Read-only, memory-mapped view of a built cube."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        self.outputs = tuple(self.manifest["outputs"])
+        self._arrays = {
+            name: np.load(self.path / spec["file"], mmap_mode="r")
+            for name, spec in self.manifest["outputs"].items()
+        }
+        self._axes = {name: tuple(spec["axes"]) for name, spec in self.manifest["outputs"].items()}
+
+    @staticmethod
+    def index(name, value):
+        """Lattice index of a slider value (snapped to the nearest step)."""
+        driver = DRIVERS[name]
+        steps = int(round((driver.max - driver.min) / driver.step))
+        return min(max(int(round((value - driver.min) / driver.step)), 0), steps)
+
+    def lookup(self, drivers, outputs=None):
+        """Outputs at one slider state as plain floats."""
+        index = {name: self.index(name, drivers[name]) for name in DRIVERS}
+        return {
+            name: float(self._arrays[name][tuple(index[axis] for axis in self._axes[name])])
+            for name in (outputs or self.outputs)
+        }
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
+
+
+def open_cube(path=DEFAULT_PATH):
+    """The cube at ``path``, or None when it has not been built.
+
+    A cube built with other coefficients (e.g. before a recalibration) is
+    stale and also yields None.
+    """
+    if not (Path(path) / "manifest.json").exists():
+        return None
+    cube = Cube(path)
+    if cube.manifest.get("coefficients", asdict(DEFAULT_COEFFICIENTS)) != asdict(DEFAULT_COEFFICIENTS):
+        return None
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.cube", description="Build or query the precomputed result cube.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="precompute the cube")
+    build_parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    build_parser.add_argument("--no-derived", action="store_true", help="skip derived metrics such as NPV")
+    lookup_parser = sub.add_parser("lookup", help="look up one slider state")
+    lookup_parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    for name, driver in DRIVERS.items():
+        lookup_parser.add_argument(f"--{name}", type=float, default=driver.default)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+
+        def progress(names, index, shape):
+            done = int(np.ravel_multi_index(index, shape)) + 1 if shape else 1
+            total = int(np.prod(shape)) if shape else 1
+            print(f"\r{', '.join(names)}: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+        manifest = build(args.path, derived=() if args.no_derived else tuple(DERIVED), progress=progress)
+        cube = Cube(args.path)
+        print(
+            f"\nbuilt {len(manifest['outputs'])} outputs, {cube.nbytes() / 1e6:,.1f} MB "
+            f"in {time.perf_counter() - start:.1f}s -> {args.path}",
+            file=sys.stderr,
+        )
+    else:
+        cube = open_cube(args.path)
+        if cube is None:
+            parser.error(f"no cube at {args.path}; run 'python -m sandbox.cube build' first")
+        drivers = {name: getattr(args, name) for name in DRIVERS}
+        print(json.dumps(cube.lookup(drivers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""后台计算任务 Background jobs with progress and cancellation.
+
+耗时计算 (大规模模拟、扫描、优化) 放到进程内共享的线程池中执行, 不阻塞
+会话的脚本线程. 任务函数是一个生成器, 每完成一块就产出 ``(进度, 部分结果)``;
+页面重跑时读取最新的部分结果, 图表随之逐步细化.
+
+每个会话有一个任务槽: 同一个槽提交新的任务键 (例如滑块变了) 时, 旧任务
+被取消. 排队中的旧任务直接撤销, 运行中的旧任务在下一块开始前停止. 已完成
+的结果按任务键保留一小段 LRU, 其他会话提交相同的键时直接复用.
+
+会话关闭时不会通知任务池, 所以槽按最近访问时间排序: 超过 ``SLOT_TTL`` 秒
+未访问或超过 ``MAX_SLOTS`` 个的最旧槽在下一次提交时被释放 (未被共享的运行中
+任务同时取消), 长时间运行的服务不会无限累积已关闭会话的结果.
+
+NumPy 的大块运算会释放 GIL, 所以用线程而不是进程: 部分结果无需序列化,
+取消也只是设置一个 Event.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+MAX_WORKERS = int(os.environ.get("SANDBOX_JOB_WORKERS", "2"))
+FINISHED_ENTRIES = 64
+SLOT_TTL = 1800.0  # 秒, 超过此时长未访问的槽视为会话已关闭
+MAX_SLOTS = 1024
+
+
+class Job:
+    """One background computation; ``result`` holds the latest partial result."""
+
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.result = None
+        self.version = 0  # 每产出一次部分结果加一
+        self.error = None
+        self.done = False
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def running(self):
+        return not self.done and not self.cancelled
+
+    def cancel(self):
+        self._cancel.set()
+        if self._future is not None:
+            self._future.cancel()
+
+    def _run(self, steps):
+        try:
+            for progress, partial in steps():
+                if self._cancel.is_set():
+                    return
+                self.result = partial
+                self.progress = progress
+                self.version += 1
+        except Exception as exc:  # 错误在页面上显示, 不在线程里丢失
+            self.error = exc
+        self.done = True
+
+
+class JobPool:
+    """Bounded thread pool with one job slot per session."""
+
+    def __init__(self, max_workers=MAX_WORKERS, slot_ttl=SLOT_TTL, max_slots=MAX_SLOTS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sandbox-job")
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # 槽 -> 任务, 按最近访问排序
+        self._touched = {}  # 槽 -> 最近访问时间
+        self._finished = OrderedDict()
+        self.slot_ttl = slot_ttl
+        self.max_slots = max_slots
+
+    def submit(self, slot, key, steps):
+        """Job for ``key`` in ``slot``, starting ``steps()`` if it is not current.
+
+        A different job already in the slot is cancelled unless another
+        slot shares it. A key that is running in another session, or that
+        finished recently, attaches to that job instead of starting anew.
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            current = self._slots.pop(slot, None)
+            self._touched[slot] = time.monotonic()
+            if current is not None and current.key == key and not current.cancelled:
+                self._slots[slot] = current
+                return current
+            if current is not None and not current.done and all(job is not current for job in self._slots.values()):
+                current.cancel()
+            job = self._finished.get(key)
+            if job is not None:
+                self._finished.move_to_end(key)
+            else:
+                # 已完成但尚未写入缓存的任务同样复用
+                job = next((job for job in self._slots.values()
+                            if job.key == key and not job.cancelled and job.error is None), None)
+            if job is None:
+                job = Job(key)
+                job._future = self._executor.submit(self._run, job, steps)
+            self._slots[slot] = job
+            return job
+
+    def _run(self, job, steps):
+        job._run(steps)
+        if job.done and job.error is None:
+            with self._lock:
+                self._finished[job.key] = job
+                while len(self._finished) > FINISHED_ENTRIES:
+                    self._finished.popitem(last=False)
+
+    def get(self, slot):
+        with self._lock:
+            job = self._slots.get(slot)
+            if job is not None:
+                self._slots.move_to_end(slot)
+                self._touched[slot] = time.monotonic()
+            return job
+
+    def cancel(self, slot):
+        """Forget the job in ``slot``, cancelling it if no other slot shares it."""
+        with self._lock:
+            self._drop(slot)
+
+    def slots(self):
+        """Number of occupied slots."""
+        with self._lock:
+            return len(self._slots)
+
+    def _drop(self, slot):
+        job = self._slots.pop(slot, None)
+        self._touched.pop(slot, None)
+        if job is not None and not job.done and all(other is not job for other in self._slots.values()):
+            job.cancel()
+
+    def _prune(self, now):
+        # 最旧的槽在前: 过期或超出上限的依次释放
+        while self._slots:
+            slot = next(iter(self._slots))
+            if now - self._touched[slot] < self.slot_ttl and len(self._slots) < self.max_slots:
+                break
+            self._drop(slot)
+
+    def active(self):
+        """Number of queued or running jobs."""
+        with self._lock:
+            return sum(job.running for job in self._slots.values())
+
+
+@st.cache_resource
+def job_pool() -> JobPool:
+    return JobPool()
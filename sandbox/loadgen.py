@@ -0,0 +1,99 @@
+"""本地压测工具 Load generator for ``sandbox.service``.
+
+用法 Usage::
+
+    python -m sandbox.loadgen --port 8765 --connections 64 --duration 10
+
+每个连接保持 HTTP/1.1 keep-alive, 循环发送随机情景, 最后报告吞吐量和
+客户端延迟分位数.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from sandbox.model import DRIVERS
+
+
+def random_scenarios(rng, n):
+    """Random scenarios on the slider lattice."""
+    out = []
+    for _ in range(n):
+        scenario = {}
+        for name, driver in DRIVERS.items():
+            steps = int(round((driver.max - driver.min) / driver.step))
+            scenario[name] = driver.min + int(rng.integers(0, steps + 1)) * driver.step
+        out.append(scenario)
+    return out
+
+
+async def _worker(host, port, bodies, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            body = bodies[i % len(bodies)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(
+                f"POST /evaluate HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            if b" 200 " not in status:
+                errors.append(status)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+
+async def run(host="127.0.0.1", port=8765, connections=64, duration=10.0, seed=0):
+    rng = np.random.default_rng(seed)
+    bodies = [json.dumps(s).encode() for s in random_scenarios(rng, 1000)]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        _worker(host, port, bodies, deadline, latencies, errors) for _ in range(connections)
+    ])
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(lat, 50)),
+            "p95": float(np.percentile(lat, 95)),
+            "p99": float(np.percentile(lat, 99)),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.loadgen", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args.host, args.port, args.connections, args.duration))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""利润模型引擎 Profit model engine.
+
+所有驱动参数既可以是标量, 也可以是任意形状的 NumPy 数组; 一次广播计算
+即可得到每个情景的全部中间科目.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import warnings
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from sandbox.graph import Graph, Incremental
+
+
+# ===============================
+# 驱动参数 Drivers (侧边栏滑块)
+# ===============================
+class Driver(NamedTuple):
+    min: float
+    max: float
+    default: float
+    step: float
+
+
+DRIVERS = {
+    "volume": Driver(200, 2000, 1800, 50),
+    "rd_rate": Driver(0.0, 1.0, 0.6, 0.05),
+    "raw_material_increase": Driver(0, 30, 10, 1),
+    "inventory_growth": Driver(0, 50, 20, 5),
+    "bad_debt_rate": Driver(0, 20, 5, 1),
+    "service_growth": Driver(0, 50, 15, 5),
+}
+
+
+# ===============================
+# 模型系数 Coefficients (千美元)
+# ===============================
+@dataclass(frozen=True)
+class Coefficients:
+    revenue_per_unit: float = 50
+    material_per_unit: float = 30
+    fixed_cost: float = 20000
+    variable_per_unit: float = 5
+    rd_total: float = 10000
+    rd_years: float = 5
+    service_per_unit: float = 15
+    service_cost_ratio: float = 0.5
+    finance_per_unit: float = 8
+    finance_cost_per_unit: float = 3
+    used_per_unit: float = 5
+
+
+# 标定参数文件 (python -m sandbox.calibrate); 存在时启动即加载全部产品合计系数.
+# 默认放在项目目录下, 与启动时的工作目录无关
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CALIBRATION_PATH = os.environ.get("SANDBOX_CALIBRATION", str(PROJECT_DIR / "calibration.json"))
+
+
+def load_calibration(path=CALIBRATION_PATH):
+    """Pooled coefficients and metadata from a calibration file.
+
+    Returns the built-in ``Coefficients()`` and ``None`` when the file
+    does not exist, or with a warning when it cannot be read.
+    """
+    path = Path(path)
+    if not path.exists():
+        return Coefficients(), None
+    try:
+        params = json.loads(path.read_text(encoding="utf-8"))
+        names = {f.name for f in fields(Coefficients)}
+        coef = Coefficients(**{name: float(value) for name, value in params["pooled"].items() if name in names})
+        meta = {key: value for key, value in params.items() if key not in ("pooled", "products")}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+        warnings.warn(f"ignoring calibration file {path}: {exc!r}; using built-in coefficients", stacklevel=2)
+        return Coefficients(), None
+    return coef, meta
+
+
+DEFAULT_COEFFICIENTS, CALIBRATION = load_calibration()
+
+# 渠道库存高风险阈值 (%) 与雷达警戒线
+INVENTORY_RISK_LIMIT = 15
+RISK_THRESHOLD = 50
+
+LINE_ITEMS = (
+    "equipment_revenue",
+    "base_material_cost",
+    "material_cost",
+    "fixed_cost",
+    "variable_cost",
+    "manufacturing_cost",
+    "rd_total",
+    "rd_amort",
+    "service_revenue",
+    "service_cost",
+    "finance_revenue",
+    "bad_debt",
+    "finance_cost",
+    "used_profit",
+    "equipment_profit",
+    "service_profit",
+    "finance_profit",
+    "total_profit",
+    "unit_cost",
+    "service_ratio",
+    "inventory_risk",
+    "material_risk",
+    "finance_risk",
+    "market_risk",
+    "rd_risk",
+)
+
+
+# ===============================
+# 计算图 Model graph (参数名即依赖)
+# ===============================
+MODEL = Graph(inputs=(*DRIVERS, "coef"))
+
+
+# 主机 Equipment
+@MODEL.node()
+def equipment_revenue(volume, coef):
+    return volume * coef.revenue_per_unit
+
+
+@MODEL.node()
+def base_material_cost(volume, coef):
+    return volume * coef.material_per_unit
+
+
+@MODEL.node()
+def material_cost(base_material_cost, raw_material_increase):
+    return base_material_cost * (1 + raw_material_increase / 100)
+
+
+@MODEL.node()
+def fixed_cost(coef):
+    return coef.fixed_cost * 1.0
+
+
+@MODEL.node()
+def variable_cost(volume, coef):
+    return coef.variable_per_unit * volume
+
+
+@MODEL.node()
+def manufacturing_cost(fixed_cost, variable_cost):
+    return fixed_cost + variable_cost
+
+
+@MODEL.node()
+def rd_total(coef):
+    return coef.rd_total * 1.0
+
+
+@MODEL.node()
+def rd_amort(rd_total, rd_rate, coef):
+    return rd_total * rd_rate / coef.rd_years
+
+
+# 售后 Service
+@MODEL.node()
+def service_revenue(volume, service_growth, coef):
+    return volume * coef.service_per_unit * (1 + service_growth / 100)
+
+
+@MODEL.node()
+def service_cost(service_revenue, coef):
+    return service_revenue * coef.service_cost_ratio
+
+
+# 金融 Finance
+@MODEL.node()
+def finance_revenue(volume, coef):
+    return volume * coef.finance_per_unit
+
+
+@MODEL.node()
+def bad_debt(finance_revenue, bad_debt_rate):
+    return finance_revenue * bad_debt_rate / 100
+
+
+@MODEL.node()
+def finance_cost(volume, coef):
+    return volume * coef.finance_cost_per_unit
+
+
+# 分部利润 Segment profits (瀑布图分类按注册顺序)
+@MODEL.node(label=("Equipment", "主机销售"), tags=("segment",))
+def equipment_profit(equipment_revenue, material_cost, manufacturing_cost, rd_amort):
+    return equipment_revenue - material_cost - manufacturing_cost - rd_amort
+
+
+@MODEL.node(label=("Aftermarket", "售后服务"), tags=("segment",))
+def service_profit(service_revenue, service_cost):
+    return service_revenue - service_cost
+
+
+@MODEL.node(label=("Finance", "金融业务"), tags=("segment",))
+def finance_profit(finance_revenue, bad_debt, finance_cost):
+    return finance_revenue - bad_debt - finance_cost
+
+
+# 二手机 Used
+@MODEL.node(label=("Used Equipment", "二手机"), tags=("segment",))
+def used_profit(volume, coef):
+    return volume * coef.used_per_unit
+
+
+@MODEL.node(label=("Total Profit", "总利润"), tags=("total",))
+def total_profit(equipment_profit, service_profit, finance_profit, used_profit):
+    return equipment_profit + service_profit + finance_profit + used_profit
+
+
+# KPI
+@MODEL.node()
+def unit_cost(manufacturing_cost, volume):
+    return manufacturing_cost / volume
+
+
+@MODEL.node()
+def service_ratio(service_profit, total_profit):
+    return np.divide(
+        service_profit,
+        total_profit,
+        out=np.zeros(np.shape(total_profit)),
+        where=total_profit != 0,
+    )
+
+
+# 风险值 (0-100)
+@MODEL.node()
+def inventory_risk(inventory_growth):
+    return np.minimum(inventory_growth * 2, 100)
+
+
+@MODEL.node()
+def material_risk(raw_material_increase):
+    return raw_material_increase * 3
+
+
+@MODEL.node()
+def finance_risk(bad_debt_rate):
+    return bad_debt_rate * 4
+
+
+@MODEL.node()
+def market_risk(volume):
+    return np.where(volume < 500, 30.0, np.where(volume < 1000, 20.0, 15.0))
+
+
+@MODEL.node()
+def rd_risk(rd_rate):
+    return (1 - rd_rate) * 50
+
+
+# 瀑布图分类: 各分部利润与总利润
+WATERFALL_ITEMS = tuple(node.name for node in (*MODEL.tagged("segment"), *MODEL.tagged("total")))
+
+
+def _as_drivers(volume, rd_rate, raw_material_increase, inventory_growth, bad_debt_rate, service_growth):
+    return {
+        "volume": np.asarray(volume, dtype=np.float64),
+        "rd_rate": np.asarray(rd_rate, dtype=np.float64),
+        "raw_material_increase": np.asarray(raw_material_increase, dtype=np.float64),
+        "inventory_growth": np.asarray(inventory_growth, dtype=np.float64),
+        "bad_debt_rate": np.asarray(bad_debt_rate, dtype=np.float64),
+        "service_growth": np.asarray(service_growth, dtype=np.float64),
+    }
+
+
+def _broadcast(values, drivers, coef):
+    shape = np.broadcast_shapes(
+        *(value.shape for value in drivers.values()),
+        np.shape(coef.fixed_cost),
+        np.shape(coef.rd_total),
+    )
+    return {name: np.broadcast_to(values[name], shape) for name in LINE_ITEMS}
+
+
+def evaluate(
+    volume,
+    rd_rate,
+    raw_material_increase,
+    inventory_growth,
+    bad_debt_rate,
+    service_growth,
+    coef: Coefficients = DEFAULT_COEFFICIENTS,
+) -> dict[str, np.ndarray]:
+    """Evaluate the profit model for broadcastable arrays of drivers.
+
+    Returns a dict keyed by ``LINE_ITEMS``; every value has the broadcast
+    shape of the inputs.
+    """
+    drivers = _as_drivers(volume, rd_rate, raw_material_increase, inventory_growth, bad_debt_rate, service_growth)
+    return _broadcast(MODEL.evaluate({**drivers, "coef": coef}), drivers, coef)
+
+
+class IncrementalModel:
+    """Per-session model that recomputes only line items downstream of changed drivers."""
+
+    def __init__(self, coef: Coefficients = DEFAULT_COEFFICIENTS):
+        self.coef = coef
+        self._state = Incremental(MODEL)
+
+    @property
+    def recomputed(self):
+        return self._state.recomputed
+
+    def update(self, **drivers) -> dict[str, float]:
+        values = self._state.update(**_as_drivers(**drivers), coef=self.coef)
+        return {name: float(values[name]) for name in LINE_ITEMS}
+
+
+def evaluate_one(coef: Coefficients = DEFAULT_COEFFICIENTS, **drivers) -> dict[str, float]:
+    """Evaluate a single slider combination and return plain floats."""
+    return {name: float(value) for name, value in evaluate(coef=coef, **drivers).items()}
+
+
+def evaluate_frame(frame, coef: Coefficients = DEFAULT_COEFFICIENTS):
+    """Evaluate every row of a DataFrame holding the ``DRIVERS`` columns."""
+    import pandas as pd
+
+    result = evaluate(coef=coef, **{name: frame[name].to_numpy() for name in DRIVERS})
+    return pd.DataFrame(result, index=frame.index)
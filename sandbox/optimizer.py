@@ -0,0 +1,163 @@
+"""目标求解与约束优化 Goal-seek and constrained optimizer.
+
+在离散滑块网格上搜索使总利润最大 (或最接近目标) 的参数组合. 利用模型
+结构缩小搜索空间:
+
+- 只依赖单个驱动参数的约束 (单位成本、五项雷达风险) 先在各自的轴上过滤;
+- 不影响利润的参数 (经销商库存) 折叠为离当前值最近的可行值;
+- 剩余网格按开放网格广播, 分块向量化计算.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from sandbox.model import DRIVERS, RISK_THRESHOLD, evaluate
+
+# 只依赖单个驱动参数的输出
+SEPARABLE = {
+    "unit_cost": "volume",
+    "market_risk": "volume",
+    "rd_risk": "rd_rate",
+    "material_risk": "raw_material_increase",
+    "inventory_risk": "inventory_growth",
+    "finance_risk": "bad_debt_rate",
+}
+
+RISKS = ("inventory_risk", "material_risk", "finance_risk", "market_risk", "rd_risk")
+
+# 不进入利润计算的驱动参数
+PROFIT_NEUTRAL = ("inventory_growth",)
+
+CHUNK_POINTS = 1 << 18
+
+
+@dataclass(frozen=True)
+class Constraints:
+    max_unit_cost: float | None = 35.0
+    min_service_ratio: float | None = 0.30
+    max_risk: float | None = RISK_THRESHOLD
+
+
+@dataclass(frozen=True)
+class OptimizationResult:
+    drivers: dict
+    outputs: dict
+    candidates: int
+    feasible: int
+    elapsed: float
+    searched: dict = field(default_factory=dict)
+
+
+def lattice(name):
+    """All slider values of a driver."""
+    driver = DRIVERS[name]
+    steps = int(round((driver.max - driver.min) / driver.step))
+    return np.round(driver.min + np.arange(steps + 1) * driver.step, 10)
+
+
+def _axis_mask(name, values, drivers, constraints):
+    """Feasibility of one driver axis under the separable constraints."""
+    point = {**drivers, name: values}
+    out = evaluate(**point)
+    mask = np.ones(len(values), dtype=bool)
+    for output, driver in SEPARABLE.items():
+        if driver != name:
+            continue
+        if output == "unit_cost" and constraints.max_unit_cost is not None:
+            mask &= out["unit_cost"] <= constraints.max_unit_cost
+        if output in RISKS and constraints.max_risk is not None:
+            mask &= out[output] < constraints.max_risk
+    return mask
+
+
+def optimize(drivers, free=("volume", "rd_rate"), target=None, constraints=Constraints()):
+    """Search the slider lattice of the ``free`` drivers.
+
+    With ``target=None`` total_profit is maximized, otherwise the feasible
+    point closest to ``target`` is returned. Other drivers stay at their
+    values in ``drivers``. Ties go to the point nearest the current
+    settings. Returns None when no lattice point is feasible.
+    """
+    start = time.perf_counter()
+    free = [name for name in DRIVERS if name in free]
+    if not free:
+        raise ValueError("at least one free driver is required")
+    fixed = {name: value for name, value in drivers.items() if name not in free}
+
+    # 固定参数若违反单轴约束, 整体不可行
+    for name, value in fixed.items():
+        if not _axis_mask(name, np.array([value], dtype=np.float64), drivers, constraints)[0]:
+            return None
+
+    axes = {}
+    candidates = 1
+    for name in free:
+        values = lattice(name)
+        candidates *= len(values)
+        values = values[_axis_mask(name, values, drivers, constraints)]
+        if len(values) == 0:
+            return None
+        if name in PROFIT_NEUTRAL:
+            values = values[[np.argmin(np.abs(values - drivers[name]))]]
+        axes[name] = values
+
+    names = list(axes)
+    shape = [len(axes[name]) for name in names]
+    searched = {name: len(axes[name]) for name in names}
+    scale = np.array([DRIVERS[name].max - DRIVERS[name].min for name in names], dtype=np.float64)
+
+    best = None  # (score, distance, index)
+    feasible = 0
+    # 沿第一个轴分块, 控制内存
+    lead = shape[0]
+    rest = int(np.prod(shape[1:]))
+    block = max(CHUNK_POINTS // rest, 1)
+    for lo in range(0, lead, block):
+        hi = min(lo + block, lead)
+        grid = {}
+        for i, name in enumerate(names):
+            values = axes[name][lo:hi] if i == 0 else axes[name]
+            grid[name] = values.reshape([-1 if j == i else 1 for j in range(len(names))])
+        out = evaluate(**fixed, **grid)
+        total = out["total_profit"]
+
+        ok = np.ones(total.shape, dtype=bool)
+        if constraints.min_service_ratio is not None:
+            ok &= out["service_ratio"] > constraints.min_service_ratio
+        count = int(ok.sum())
+        if count == 0:
+            continue
+        feasible += count
+
+        score = -total if target is None else np.abs(total - target)
+        distance = np.broadcast_to(
+            sum(np.abs(grid[name] - drivers[name]) / scale[i] for i, name in enumerate(names)),
+            total.shape,
+        )
+        score = np.where(ok, score, np.inf)
+        # 先按目标值, 再按与当前设置的距离
+        top = score.min()
+        index = np.unravel_index(np.argmin(np.where(score == top, distance, np.inf)), total.shape)
+        candidate = (float(score[index]), float(distance[index]), index, lo)
+        if best is None or candidate[:2] < best[:2]:
+            best = candidate
+
+    if best is None:
+        return None
+    _, _, index, lo = best
+    solution = dict(drivers)
+    for i, name in enumerate(names):
+        solution[name] = float(axes[name][index[i] + (lo if i == 0 else 0)])
+    outputs = {name: float(value) for name, value in evaluate(**solution).items()}
+    return OptimizationResult(
+        drivers=solution,
+        outputs=outputs,
+        candidates=candidates,
+        feasible=feasible,
+        elapsed=time.perf_counter() - start,
+        searched=searched,
+    )
@@ -0,0 +1,194 @@
+"""性能剖析 Opt-in profiling of page sections.
+
+用 ``?profile=1`` 或环境变量 ``SANDBOX_PROFILE=1`` 开启. 开启后 app.py 的
+每个区块 (样式、KPI 卡片、各图表的计算与渲染) 以及整次重跑的耗时计入
+进程级直方图, 所有会话共享. 管理面板 (``?admin=1``) 展示分位数, 并可导出
+JSON 或 Prometheus 文本格式; 设置 ``SANDBOX_PROFILE_FILE`` 时定期写出文件
+(后缀 ``.json`` 为 JSON, 其余为 Prometheus 文本).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import streamlit as st
+
+# 直方图桶上界 (秒), 与 Prometheus 默认桶类似但更细
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"),
+)
+
+EXPORT_INTERVAL = 10.0  # 秒
+
+
+class Profiler:
+    """Thread-safe cumulative latency histograms per section name."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = np.asarray(buckets, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._sums = {}
+        self._max = {}
+        self._exported = 0.0
+
+    def observe(self, name, seconds):
+        index = int(np.searchsorted(self.buckets, seconds))
+        with self._lock:
+            counts = self._counts.get(name)
+            if counts is None:
+                counts = self._counts[name] = np.zeros(len(self.buckets), dtype=np.int64)
+                self._sums[name] = 0.0
+                self._max[name] = 0.0
+            counts[index] += 1
+            self._sums[name] += seconds
+            self._max[name] = max(self._max[name], seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def quantile(self, counts, q):
+        """Quantile estimate by linear interpolation inside the bucket."""
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        cumulative = np.cumsum(counts)
+        index = int(np.searchsorted(cumulative, q * total))
+        lower = self.buckets[index - 1] if index > 0 else 0.0
+        upper = self.buckets[index]
+        if not np.isfinite(upper):
+            return float(lower)
+        before = cumulative[index - 1] if index > 0 else 0
+        fraction = (q * total - before) / counts[index] if counts[index] else 0.0
+        return float(lower + (upper - lower) * fraction)
+
+    def snapshot(self):
+        """Per-section count, mean, p50/p95/p99 and max in milliseconds."""
+        with self._lock:
+            items = [(name, counts.copy(), self._sums[name], self._max[name]) for name, counts in self._counts.items()]
+        rows = []
+        for name, counts, total, peak in sorted(items):
+            n = int(counts.sum())
+            rows.append({
+                "name": name,
+                "count": n,
+                "mean_ms": total / n * 1000 if n else 0.0,
+                "p50_ms": min(self.quantile(counts, 0.50), peak) * 1000,
+                "p95_ms": min(self.quantile(counts, 0.95), peak) * 1000,
+                "p99_ms": min(self.quantile(counts, 0.99), peak) * 1000,
+                "max_ms": peak * 1000,
+                "buckets": counts.tolist(),
+            })
+        return rows
+
+    def histogram(self, name):
+        """Non-cumulative bucket counts of one section, keyed by upper bound label."""
+        with self._lock:
+            counts = self._counts.get(name)
+            counts = np.zeros(len(self.buckets), dtype=np.int64) if counts is None else counts.copy()
+        labels = [f"≤{b * 1000:g}ms" if np.isfinite(b) else f">{self.buckets[-2] * 1000:g}ms" for b in self.buckets]
+        return dict(zip(labels, counts.tolist()))
+
+    def to_json(self):
+        bounds = [b if np.isfinite(b) else "+Inf" for b in self.buckets]
+        return json.dumps({"created": time.time(), "buckets": bounds, "sections": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP sandbox_section_seconds Time spent per app.py section.",
+            "# TYPE sandbox_section_seconds histogram",
+        ]
+        with self._lock:
+            items = [(name, counts.copy(), self._sums[name]) for name, counts in self._counts.items()]
+        for name, counts, total in sorted(items):
+            cumulative = np.cumsum(counts)
+            for bound, count in zip(self.buckets, cumulative):
+                le = "+Inf" if not np.isfinite(bound) else f"{bound:g}"
+                lines.append(f'sandbox_section_seconds_bucket{{section="{name}",le="{le}"}} {count}')
+            lines.append(f'sandbox_section_seconds_sum{{section="{name}"}} {total:.6f}')
+            lines.append(f'sandbox_section_seconds_count{{section="{name}"}} {cumulative[-1]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        text = self.to_json() if str(path).endswith(".json") else self.to_prometheus()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def maybe_export(self, path, interval=EXPORT_INTERVAL):
+        """Write ``path`` at most once per ``interval`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._exported < interval:
+                return
+            self._exported = now
+        self.export(path)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+            self._max.clear()
+
+
+@st.cache_resource
+def profiler() -> Profiler:
+    return Profiler()
+
+
+class Stopwatch:
+    """Sequential section laps of one script run.
+
+    ``lap(name)`` records the time since the previous lap, so sections are
+    timed by placing one call after each of them. Without a profiler the
+    laps only read the clock.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.observe(name, now - self._last)
+        self._last = now
+
+    @contextmanager
+    def timer(self, name):
+        if self.profiler is None:
+            yield
+        else:
+            with self.profiler.timer(name):
+                yield
+
+    def finish(self, name="rerun"):
+        """Record the whole run and write the export file if configured."""
+        self.lap("footer")
+        if self.profiler is None:
+            return
+        self.profiler.observe(name, time.perf_counter() - self.start)
+        path = os.environ.get("SANDBOX_PROFILE_FILE")
+        if path:
+            self.profiler.maybe_export(path)
+
+
+def enabled():
+    return os.environ.get("SANDBOX_PROFILE") == "1" or st.query_params.get("profile") == "1"
+
+
+def stopwatch():
+    """Stopwatch for this run; records into the shared profiler only when enabled."""
+    return Stopwatch(profiler() if enabled() else None)
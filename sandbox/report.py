@@ -0,0 +1,348 @@
+"""批量报告导出 Bulk scenario report export.
+
+用法 Usage::
+
+    python -m sandbox.report scenarios.csv -o reports/ --workers 8
+    python -m sandbox.report --store scenarios.sqlite --tag BU -o reports/ --theme light --language 中文
+    python -m sandbox.report scenarios.csv -o reports/ --format html png pdf
+
+为每个情景导出与仪表盘相同的 KPI 卡片和四张图 (瀑布、环图、制造敏感性、
+风险雷达), 以及一个汇总索引页. 情景来自 CSV/Parquet 文件 (``name`` 列加驱动
+参数列, 缺失的取滑块默认值) 或情景库.
+
+每个 (主题, 语言) 只构建一次图表模板: 布局、配色和 Plotly 主题序列化成一个
+共享的 ``template-*.js``, 各情景页面只携带数据; PNG/PDF 也是在模板的 dict 上
+替换数据后直接交给导出引擎, 不再逐个构建和校验图表对象. 情景分批在进程池
+中并行渲染. PNG/PDF 需要安装 kaleido.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import html
+import json
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from sandbox.model import DRIVERS, WATERFALL_ITEMS, evaluate_one
+
+FIGURES = ("waterfall", "donut", "sensitivity", "radar")
+FORMATS = ("html", "png", "pdf")
+BATCH_SIZE = 10
+
+TITLES = {
+    "waterfall": ("📊 Lifecycle Profit Waterfall", "📊 生命周期利润瀑布"),
+    "donut": ("🥧 Value Chain Structure", "🥧 价值链结构"),
+    "sensitivity": ("📈 Manufacturing Sensitivity", "📈 制造敏感性分析"),
+    "radar": ("🎯 Strategic Risk Radar", "🎯 战略风险雷达"),
+}
+
+
+def _t(language, en, cn):
+    return en if language == "English" else cn
+
+
+def _require_kaleido():
+    try:
+        import kaleido  # noqa: F401
+    except ImportError as exc:
+        raise SystemExit("PNG/PDF export requires kaleido: pip install kaleido") from exc
+
+
+def scenario_data(drivers):
+    """Everything the dashboard shows for one scenario, as plain floats.
+
+    Mirrors app.py in single-product mode: loan-book losses replace the
+    closed-form bad debt and the channel simulation drives inventory risk.
+    """
+    from sandbox.channel import CHANNEL_RISK_LIMIT, simulate_channel
+    from sandbox.loanbook import apply_losses, book_for_volume, credit_losses
+    from sandbox.model import DEFAULT_COEFFICIENTS
+
+    result = evaluate_one(**drivers)
+    result = apply_losses(result, credit_losses(book_for_volume(drivers["volume"]), drivers["bad_debt_rate"]))
+    channel = simulate_channel(drivers["inventory_growth"])
+    _, cover_p50, cover_p90 = channel.cover_quantiles()
+    return {
+        "drivers": dict(drivers),
+        "profits": [result[name] for name in WATERFALL_ITEMS],
+        "risks": [channel.risk, result["material_risk"], result["finance_risk"], result["market_risk"], result["rd_risk"]],
+        "total_profit": result["total_profit"],
+        "unit_cost": result["unit_cost"],
+        "service_ratio": result["service_ratio"],
+        "fixed_cost": result["fixed_cost"],
+        "variable_per_unit": DEFAULT_COEFFICIENTS.variable_per_unit,
+        "channel_risk": channel.risk,
+        "channel_high": channel.risk >= CHANNEL_RISK_LIMIT,
+        "cover": (cover_p50, cover_p90),
+    }
+
+
+@lru_cache(maxsize=None)
+def templates(theme, language):
+    """Figure dicts per ``FIGURES`` built once from the default scenario."""
+    from sandbox.charts import donut_figure, radar_figure, sensitivity_figure, waterfall_figure
+
+    d = scenario_data({name: driver.default for name, driver in DRIVERS.items()})
+    figures = {
+        "waterfall": waterfall_figure(d["profits"], theme, language),
+        "donut": donut_figure(d["profits"], theme, language),
+        "sensitivity": sensitivity_figure(d["fixed_cost"], d["variable_per_unit"], d["drivers"]["volume"], theme, language),
+        "radar": radar_figure(d["risks"], theme, language),
+    }
+    return {name: _plain(fig.to_plotly_json()) for name, fig in figures.items()}
+
+
+def _plain(value):
+    # 数组 (numpy 或 Plotly 的 base64 类型数组) 转为列表, 便于替换数据和 JSON 序列化
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+            return array.reshape(value["shape"]).tolist() if "shape" in value else array.tolist()
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return value
+
+
+def figure_data(name, template, d):
+    """``(data, layout overrides)`` of figure ``name`` for scenario ``d``.
+
+    Trace dicts are shallow copies of the template's with only the
+    scenario-dependent fields replaced.
+    """
+    data = [dict(trace) for trace in template["data"]]
+    layout = {}
+    if name == "waterfall":
+        data[0]["y"] = d["profits"]
+        data[0]["text"] = [f"${x:,.0f}K" for x in d["profits"]]
+    elif name == "donut":
+        data[0]["values"] = d["profits"][:4]
+        annotation = dict(template["layout"]["annotations"][0], text=f"${d['total_profit']:,.0f}K")
+        layout["annotations"] = [annotation]
+    elif name == "sensitivity":
+        volumes = data[0]["x"]
+        data[0]["y"] = [d["fixed_cost"] / v + d["variable_per_unit"] for v in volumes]
+        volume = d["drivers"]["volume"]
+        data[1]["x"] = [volume]
+        data[1]["y"] = [d["fixed_cost"] / volume + d["variable_per_unit"]]
+    elif name == "radar":
+        data[0]["r"] = d["risks"] + d["risks"][:1]
+    return data, layout
+
+
+def kpi_cards(d, language):
+    """The four KPI cards as HTML, matching the dashboard markup."""
+    t = lambda en, cn: _t(language, en, cn)  # noqa: E731
+    risk_class = "risk-high" if d["channel_high"] else "risk-stable"
+    risk_text = t("HIGH RISK", "高风险") if d["channel_high"] else t("STABLE", "稳定")
+    cards = [
+        (t("Total Lifecycle Profit", "全生命周期利润"), f"${d['total_profit']:,.0f}K", f"▲ {t('YoY +12%', '同比 +12%')}"),
+        (t("Unit Manufacturing Cost", "单位制造成本"), f"${d['unit_cost']:.1f}K", t("Target: $35K", "目标: $35K")),
+        (t("Service Profit Ratio", "售后利润占比"), f"{d['service_ratio']:.1%}", t("Healthy >30%", "健康值 >30%")),
+        (
+            t("Channel Risk Status", "渠道风险状态"),
+            f'<span class="{risk_class}">{risk_text}</span>',
+            f"{t('Score', '风险分')} {d['channel_risk']:.0f} · {t('Cover P50/P90', '可销周数 P50/P90')}: "
+            f"{d['cover'][0]:.1f} / {d['cover'][1]:.1f}{t(' wks', ' 周')}",
+        ),
+    ]
+    return "".join(
+        f'<div class="metric-card"><div class="metric-label">{label}</div>'
+        f'<div class="metric-value">{value}</div><div class="metric-delta">{delta}</div></div>'
+        for label, value, delta in cards
+    )
+
+
+def _asset_names(theme, language):
+    return f"style-{theme}.css", f"template-{theme}-{'en' if language == 'English' else 'cn'}.js"
+
+
+def write_assets(out, theme, language):
+    """Write plotly.js, the theme stylesheet and the shared layout template."""
+    from plotly.offline import get_plotlyjs
+
+    from sandbox.theme import STYLESHEETS
+
+    css_name, template_name = _asset_names(theme, language)
+    (out / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+    css = STYLESHEETS[theme].removeprefix("<style>").removesuffix("</style>")
+    css += ".kpis{display:grid;grid-template-columns:repeat(4,1fr);gap:1rem}.charts{display:grid;grid-template-columns:1fr 1fr;gap:1rem}body{padding:2rem}"
+    (out / css_name).write_text(css, encoding="utf-8")
+    layouts = {name: figure["layout"] for name, figure in templates(theme, language).items()}
+    (out / template_name).write_text(f"window.SANDBOX_LAYOUTS={json.dumps(layouts)};", encoding="utf-8")
+
+
+def scenario_page(name, d, theme, language):
+    """Standalone HTML page for one scenario; layouts come from the shared template."""
+    css_name, template_name = _asset_names(theme, language)
+    figures = templates(theme, language)
+    charts, scripts = [], []
+    for fig in FIGURES:
+        data, layout = figure_data(fig, figures[fig], d)
+        charts.append(f'<div><h3>{_t(language, *TITLES[fig])}</h3><div id="{fig}"></div></div>')
+        scripts.append(
+            f'Plotly.newPlot("{fig}",{json.dumps(data)},'
+            f'Object.assign({{}},window.SANDBOX_LAYOUTS.{fig},{json.dumps(layout)}),{{displayModeBar:false,responsive:true}});'
+        )
+    drivers = " · ".join(f"{key} {value:g}" for key, value in d["drivers"].items())
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(name)}</title>'
+        f'<link rel="stylesheet" href="{css_name}"><script src="plotly.min.js"></script>'
+        f'<script src="{template_name}"></script></head><body class="stApp">'
+        f'<h1>{html.escape(name)}</h1><p class="caption-text">{html.escape(drivers)}</p>'
+        f'<div class="kpis">{kpi_cards(d, language)}</div><div class="charts">{"".join(charts)}</div>'
+        f'<script>{"".join(scripts)}</script></body></html>'
+    )
+
+
+def render_batch(batch, out, theme, language, formats):
+    """Render a batch of ``(slug, name, drivers)`` in a worker; return index rows."""
+    out = Path(out)
+    figures = templates(theme, language)
+    rows = []
+    for slug, name, drivers in batch:
+        d = scenario_data(drivers)
+        if "html" in formats:
+            (out / f"{slug}.html").write_text(scenario_page(name, d, theme, language), encoding="utf-8")
+        for fmt in ("png", "pdf"):
+            if fmt not in formats:
+                continue
+            import plotly.io as pio
+
+            for fig in FIGURES:
+                data, layout = figure_data(fig, figures[fig], d)
+                pio.write_image(
+                    {"data": data, "layout": {**figures[fig]["layout"], **layout}},
+                    out / fmt / f"{slug}-{fig}.{fmt}", format=fmt, validate=False,
+                )
+        rows.append({
+            "slug": slug,
+            "name": name,
+            "total_profit": d["total_profit"],
+            "unit_cost": d["unit_cost"],
+            "service_ratio": d["service_ratio"],
+            "channel_risk": d["channel_risk"],
+        })
+    return rows
+
+
+def index_page(rows, theme, language):
+    css_name, _ = _asset_names(theme, language)
+    t = lambda en, cn: _t(language, en, cn)  # noqa: E731
+    head = "".join(f"<th>{h}</th>" for h in (
+        t("Scenario", "情景"), t("Total Profit", "总利润"), t("Unit Cost", "单位成本"),
+        t("Service Ratio", "售后占比"), t("Channel Risk", "渠道风险"),
+    ))
+    body = "".join(
+        f'<tr><td><a href="{row["slug"]}.html">{html.escape(row["name"])}</a></td>'
+        f'<td>${row["total_profit"]:,.0f}K</td><td>${row["unit_cost"]:.1f}K</td>'
+        f'<td>{row["service_ratio"]:.1%}</td><td>{row["channel_risk"]:.0f}</td></tr>'
+        for row in rows
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{t("Scenario Reports", "情景报告")}</title>'
+        f'<link rel="stylesheet" href="{css_name}"></head><body class="stApp">'
+        f'<h1>{t("Scenario Reports", "情景报告")}</h1><table><thead><tr>{head}</tr></thead>'
+        f'<tbody>{body}</tbody></table></body></html>'
+    )
+
+
+def load_scenarios(source=None, store=None, tag=None):
+    """``(name, drivers)`` pairs from a CSV/Parquet file or a scenario store."""
+    if store is not None:
+        from sandbox.store import ScenarioStore
+
+        db = ScenarioStore(store)
+        try:
+            return [(name, db.load(name)["drivers"]) for name in db.names(tag)]
+        finally:
+            db.close()
+    from sandbox.batch import read_chunks
+
+    scenarios = []
+    for chunk in read_chunks(source, 100_000):
+        for name, driver in DRIVERS.items():
+            if name not in chunk:
+                chunk[name] = driver.default
+        names = chunk["name"].astype(str) if "name" in chunk else None
+        for i, values in enumerate(chunk[list(DRIVERS)].itertuples(index=False)):
+            scenarios.append((names.iloc[i] if names is not None else f"scenario-{len(scenarios) + 1}", dict(zip(DRIVERS, map(float, values)))))
+    return scenarios
+
+
+def _slug(i, name):
+    return f"{i:04d}-{re.sub(r'[^0-9A-Za-z_.-]+', '_', name).strip('_')[:60]}"
+
+
+def export(scenarios, out, theme="dark", language="English", formats=("html",), workers=None, progress=None):
+    """Render every scenario into ``out``; returns the index rows in input order."""
+    if {"png", "pdf"} & set(formats):
+        _require_kaleido()
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    for fmt in ("png", "pdf"):
+        if fmt in formats:
+            (out / fmt).mkdir(exist_ok=True)
+    write_assets(out, theme, language)
+
+    items = [(_slug(i, name), name, drivers) for i, (name, drivers) in enumerate(scenarios, 1)]
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    args = [(batch, str(out), theme, language, tuple(formats)) for batch in batches]
+    pool = get_context("spawn").Pool(workers) if workers > 1 else None
+    try:
+        # imap 按输入顺序返回, 每完成一批报告一次进度
+        for batch_rows in (pool.imap(_render_star, args) if pool else map(_render_star, args)):
+            rows.extend(batch_rows)
+            if progress:
+                progress(len(rows), len(items))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    (out / "index.html").write_text(index_page(rows, theme, language), encoding="utf-8")
+    return rows
+
+
+def _render_star(args):
+    return render_batch(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.report", description="Export dashboard reports for many scenarios.")
+    parser.add_argument("scenarios", nargs="?", help="scenario file (.csv or .parquet) with a name column and driver columns")
+    parser.add_argument("--store", default=None, help="read scenarios from a scenario store instead")
+    parser.add_argument("--tag", default=None, help="only scenarios with this tag (with --store)")
+    parser.add_argument("-o", "--output", default="reports", help="output directory (default: reports)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["html"], help="output formats (default: html)")
+    parser.add_argument("--theme", choices=("dark", "light"), default="dark")
+    parser.add_argument("--language", choices=("English", "中文"), default="English")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count, 1 = in-process)")
+    args = parser.parse_args(argv)
+    if (args.scenarios is None) == (args.store is None):
+        parser.error("give either a scenario file or --store")
+
+    start = time.perf_counter()
+    scenarios = load_scenarios(args.scenarios, args.store, args.tag)
+
+    def progress(done, total):
+        print(f"\r{done:,}/{total:,} scenarios  {done / (time.perf_counter() - start):,.1f}/s", end="", file=sys.stderr, flush=True)
+
+    rows = export(scenarios, args.output, args.theme, args.language, args.format, args.workers, progress)
+    print(f"\nwrote {len(rows):,} reports to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""解析灵敏度 Forward-mode sensitivities.
+
+用对偶数 (值 + 切向量) 把模型计算图跑一遍, 即可得到每个科目对全部滑块和
+系数的导数: 切向量多出的最后一维对应每个输入方向, 所有方向在一次向量化
+计算中同时传播, 无需逐个扰动重算. 弹性 = 导数 x 输入值 / 输出值.
+"""
+
+from __future__ import annotations
+
+from dataclasses import fields, replace
+
+import numpy as np
+
+from sandbox.model import DEFAULT_COEFFICIENTS, DRIVERS, LINE_ITEMS, MODEL, Coefficients
+
+COEFFICIENTS = tuple(f.name for f in fields(Coefficients))
+INPUTS = (*DRIVERS, *COEFFICIENTS)
+
+
+class Dual:
+    """Array value with a tangent per input direction on a trailing axis."""
+
+    __slots__ = ("value", "tangent")
+    __array_priority__ = 100
+
+    def __init__(self, value, tangent):
+        self.value = np.asarray(value, dtype=np.float64)
+        self.tangent = np.asarray(tangent, dtype=np.float64)
+
+    # 运算符都转给 ufunc
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.true_divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.true_divide(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __le__(self, other):
+        return np.less_equal(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __ge__(self, other):
+        return np.greater_equal(self, other)
+
+    def __eq__(self, other):
+        return np.equal(self, other)
+
+    def __ne__(self, other):
+        return np.not_equal(self, other)
+
+    __hash__ = None
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__":
+            return NotImplemented
+        values = [x.value if isinstance(x, Dual) else np.asarray(x, dtype=np.float64) for x in inputs]
+        if ufunc in _COMPARISONS:
+            return ufunc(*values, **kwargs)
+        k = next(x.tangent.shape[-1] for x in inputs if isinstance(x, Dual))
+        tangents = [x.tangent if isinstance(x, Dual) else np.zeros((*np.shape(x), k)) for x in inputs]
+
+        if ufunc is np.negative:
+            return Dual(-values[0], -tangents[0])
+        a, b = values
+        da, db = tangents
+        if ufunc is np.add:
+            return Dual(a + b, da + db)
+        if ufunc is np.subtract:
+            return Dual(a - b, da - db)
+        if ufunc is np.multiply:
+            return Dual(a * b, da * b[..., None] + a[..., None] * db)
+        if ufunc in (np.minimum, np.maximum):
+            pick = (a <= b) if ufunc is np.minimum else (a >= b)
+            return Dual(ufunc(a, b), np.where(pick[..., None], da, db))
+        if ufunc is np.true_divide:
+            out = kwargs.get("out")
+            where = kwargs.get("where", True)
+            base = out[0] if isinstance(out, tuple) else out
+            shape = np.broadcast_shapes(a.shape, b.shape)
+            value = np.divide(a, b, out=np.array(base if base is not None else np.zeros(shape), dtype=np.float64), where=where)
+            safe = np.where(where, b, 1.0)
+            tangent = (da - (a / safe)[..., None] * db) / safe[..., None]
+            tangent = np.where(np.asarray(where)[..., None], tangent, 0.0)
+            return Dual(value, tangent)
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func is np.asarray:
+            return args[0]
+        if func is np.shape:
+            return args[0].value.shape
+        if func is np.where:
+            cond, x, y = args
+            cond = np.asarray(cond)
+            k = next(v.tangent.shape[-1] for v in (x, y) if isinstance(v, Dual))
+            vx, tx = (x.value, x.tangent) if isinstance(x, Dual) else (np.asarray(x, dtype=np.float64), np.zeros((*np.shape(x), k)))
+            vy, ty = (y.value, y.tangent) if isinstance(y, Dual) else (np.asarray(y, dtype=np.float64), np.zeros((*np.shape(y), k)))
+            return Dual(np.where(cond, vx, vy), np.where(cond[..., None], tx, ty))
+        return NotImplemented
+
+
+_COMPARISONS = (np.less, np.less_equal, np.greater, np.greater_equal, np.equal, np.not_equal)
+
+
+def jacobian(drivers, coef: Coefficients = DEFAULT_COEFFICIENTS, outputs=LINE_ITEMS):
+    """Derivatives of ``outputs`` with respect to every driver and coefficient.
+
+    Drivers may be arrays (broadcast like ``evaluate``). Returns
+    ``(values, derivatives)``: ``values[name]`` has the scenario shape,
+    ``derivatives[name]`` an extra trailing axis ordered like ``INPUTS``.
+    """
+    k = len(INPUTS)
+    seeds = np.eye(k)
+    inputs = {
+        name: Dual(drivers[name], np.broadcast_to(seeds[i], (*np.shape(drivers[name]), k)))
+        for i, name in enumerate(DRIVERS)
+    }
+    offset = len(DRIVERS)
+    inputs["coef"] = replace(coef, **{
+        name: Dual(getattr(coef, name), np.broadcast_to(seeds[offset + i], (*np.shape(getattr(coef, name)), k)))
+        for i, name in enumerate(COEFFICIENTS)
+    })
+    values = MODEL.evaluate(inputs)
+    result, derivatives = {}, {}
+    for name in outputs:
+        value = values[name]
+        if isinstance(value, Dual):
+            result[name], derivatives[name] = value.value, value.tangent
+        else:
+            result[name] = np.asarray(value, dtype=np.float64)
+            derivatives[name] = np.zeros((*np.shape(value), k))
+    return result, derivatives
+
+
+def elasticities(drivers, coef: Coefficients = DEFAULT_COEFFICIENTS, output="total_profit"):
+    """Rows of (input, kind, value, derivative, elasticity) for one scenario.
+
+    Elasticity is the % change of ``output`` per 1 % change of the input;
+    it is 0 when the input or the output is 0. Rows are sorted by
+    absolute elasticity, largest first.
+    """
+    values, derivatives = jacobian(drivers, coef, outputs=(output,))
+    y = float(values[output])
+    gradient = derivatives[output]
+    rows = []
+    for i, name in enumerate(INPUTS):
+        x = float(drivers[name]) if name in DRIVERS else float(getattr(coef, name))
+        d = float(gradient[i])
+        rows.append({
+            "input": name,
+            "kind": "driver" if name in DRIVERS else "coefficient",
+            "value": x,
+            "derivative": d,
+            "elasticity": d * x / y if y else 0.0,
+        })
+    rows.sort(key=lambda row: -abs(row["elasticity"]))
+    return rows
@@ -0,0 +1,285 @@
+"""情景计算服务 Local JSON/HTTP evaluation service.
+
+用法 Usage::
+
+    python -m sandbox.service --port 8765
+
+接口 Endpoints:
+
+- ``POST /evaluate`` - 请求体为一个情景对象或情景对象列表, 字段为驱动参数
+  (缺省取滑块默认值); 返回 ``OUTPUTS`` 中的指标和 ``latency_ms``.
+- ``GET /stats`` - 请求数、批次数、平均批大小、延迟分位数.
+- ``GET /health``
+
+并发请求在事件循环中被合并为微批次 (最多 ``max_batch`` 个或等待
+``max_wait`` 秒), 每个批次只做一次向量化计算. 只依赖标准库.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from sandbox.model import DRIVERS, evaluate
+
+OUTPUTS = (
+    "total_profit",
+    "unit_cost",
+    "service_ratio",
+    "inventory_risk",
+    "material_risk",
+    "finance_risk",
+    "market_risk",
+    "rd_risk",
+)
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+MAX_BODY = 1 << 20
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_scenario(obj):
+    """Validate one JSON scenario and return its driver tuple."""
+    if not isinstance(obj, dict):
+        raise BadRequest("scenario must be a JSON object")
+    unknown = set(obj) - set(DRIVERS)
+    if unknown:
+        raise BadRequest(f"unknown drivers: {', '.join(sorted(unknown))}")
+    values = []
+    for name, driver in DRIVERS.items():
+        value = obj.get(name, driver.default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise BadRequest(f"{name} must be a number")
+        try:
+            value = float(value)  # 超出 float 范围的 JSON 整数抛 OverflowError
+        except OverflowError:
+            value = math.inf
+        if not math.isfinite(value):
+            raise BadRequest(f"{name} must be finite")
+        values.append(value)
+    if values[0] <= 0:
+        raise BadRequest("volume must be positive")
+    return tuple(values)
+
+
+class MicroBatcher:
+    """Coalesce concurrent scenario evaluations into vectorized batches."""
+
+    def __init__(self, max_batch=1024, max_wait=0.002):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.evaluated = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, scenarios):
+        """Evaluate a list of driver tuples; resolves to a list of output dicts."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((scenarios, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                items.append(item)
+                size += len(item[0])
+            try:
+                self._evaluate(items)
+            except Exception as exc:
+                # 计算失败只影响本批次的请求, 批处理循环继续运行
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _evaluate(self, items):
+        rows = np.array([row for scenarios, _ in items for row in scenarios], dtype=np.float64)
+        result = evaluate(*rows.T)
+        columns = {name: result[name].tolist() for name in OUTPUTS}
+        self.batches += 1
+        self.evaluated += len(rows)
+
+        offset = 0
+        for scenarios, future in items:
+            n = len(scenarios)
+            if not future.done():
+                future.set_result([
+                    {name: columns[name][i] for name in OUTPUTS}
+                    for i in range(offset, offset + n)
+                ])
+            offset += n
+
+
+class Service:
+    def __init__(self, max_batch=1024, max_wait=0.002, latency_window=100_000):
+        self.batcher = MicroBatcher(max_batch, max_wait)
+        self.requests = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def stats(self):
+        lat = np.array(self.latencies) if self.latencies else np.zeros(1)
+        batches = self.batcher.batches
+        return {
+            "requests": self.requests,
+            "scenarios": self.batcher.evaluated,
+            "batches": batches,
+            "mean_batch_size": self.batcher.evaluated / batches if batches else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(lat, 50)),
+                "p95": float(np.percentile(lat, 95)),
+                "p99": float(np.percentile(lat, 99)),
+                "max": float(lat.max()),
+            },
+        }
+
+    async def handle(self, method, path, body):
+        """Route one request; returns (status, payload)."""
+        start = time.perf_counter()
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, self.stats()
+        if path != "/evaluate":
+            return 404, {"error": f"no route for {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            data = json.loads(body)
+            batch = isinstance(data, list)
+            scenarios = [parse_scenario(obj) for obj in (data if batch else [data])]
+        except ValueError as exc:
+            return 400, {"error": str(exc)}
+        if not scenarios:
+            return 200, {"results": [], "latency_ms": 0.0}
+
+        try:
+            results = await self.batcher.submit(scenarios)
+        except Exception as exc:
+            return 500, {"error": f"evaluation failed: {exc}"}
+        latency = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.latencies.append(latency)
+        payload = {"results": results} if batch else dict(results[0])
+        payload["latency_ms"] = latency
+        return 200, payload
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # 无法确定请求体边界, 回复后关闭连接
+                    status, payload = 400, {"error": "invalid Content-Length"}
+                    keep_alive = False
+                elif length > MAX_BODY:
+                    status, payload = 413, {"error": "body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.handle(method, path.split("?", 1)[0], body)
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, max_batch=1024, max_wait=0.002):
+    service = Service(max_batch, max_wait)
+    service.batcher.start()
+    server = await asyncio.start_server(service.serve_connection, host, port, backlog=1024)
+    print(f"sandbox service listening on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.service", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=1024, help="max scenarios per vectorized batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="max time to wait while filling a batch")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
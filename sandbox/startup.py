@@ -0,0 +1,104 @@
+"""启动耗时 Import-time report and startup budget.
+
+用法 Usage::
+
+    python -m sandbox.startup
+    python -m sandbox.startup --budget-ms 1200 --json startup.json
+
+在全新的子进程中用 ``python -X importtime`` 执行 app.py 开头的导入语句
+(首屏渲染之前的启动路径), 汇总总耗时和最慢的模块. 超出预算, 或启动路径
+中出现应延迟导入的重型依赖 (``DEFERRED``) 时以非零状态退出.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+# 只应在用到时才导入的模块. streamlit 自身会导入 plotly.graph_objects 的
+# 惰性外壳 (几毫秒), 真正的开销在图表构建模块和 plotly.express/pandas
+DEFERRED = ("sandbox.charts", "plotly.express", "pandas", "pyarrow", "scipy")
+
+DEFAULT_BUDGET_MS = 1500.0
+
+
+def startup_imports(path=APP_PATH):
+    """Source of the leading import block of a script."""
+    source = Path(path).read_text(encoding="utf-8")
+    lines = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        lines.append(ast.get_source_segment(source, node))
+    return "\n".join(lines)
+
+
+def measure(code, cwd=APP_PATH.parent):
+    """Run ``code`` under ``-X importtime`` in a fresh interpreter.
+
+    Returns a list of ``(module, self_us, cumulative_us, depth)`` in import
+    order.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # 表头
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report(rows, budget_ms=DEFAULT_BUDGET_MS, top=15):
+    """Summary dict: total, slowest top-level imports, deferred modules seen."""
+    total_ms = sum(row[1] for row in rows) / 1000
+    roots = sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])
+    modules = {row[0] for row in rows}
+    deferred = sorted(name for name in DEFERRED if name in modules)
+    return {
+        "total_ms": total_ms,
+        "budget_ms": budget_ms,
+        "modules": len(rows),
+        "slowest": [{"module": name, "cumulative_ms": cum / 1000} for name, _, cum, _ in roots[:top]],
+        "deferred_imported": deferred,
+        "ok": total_ms <= budget_ms and not deferred,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox.startup", description="Measure the app.py startup import path.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help=f"import budget (default: {DEFAULT_BUDGET_MS:g})")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest top-level imports to list")
+    parser.add_argument("--json", default=None, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    result = report(measure(startup_imports()), args.budget_ms, args.top)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    for row in result["slowest"]:
+        print(f"{row['cumulative_ms']:>9.1f} ms  {row['module']}")
+    print(f"total {result['total_ms']:.1f} ms in {result['modules']} modules (budget {result['budget_ms']:g} ms)")
+    if result["deferred_imported"]:
+        print("deferred modules imported at startup: " + ", ".join(result["deferred_imported"]), file=sys.stderr)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
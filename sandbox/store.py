@@ -0,0 +1,173 @@
+"""情景库 Persistent scenario store.
+
+命名情景连同全部科目结果保存在本地 SQLite 文件中 (默认项目目录下的
+``scenarios.sqlite``, 可用环境变量 ``SANDBOX_STORE`` 指定). 驱动参数和科目各占一列, 驱动参数和
+标签建有索引; 对比时一次查询取出所有候选情景, 用 numpy 按列计算差值.
+只依赖标准库 sqlite3.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from sandbox.model import DRIVERS, LINE_ITEMS, PROJECT_DIR, evaluate
+
+DEFAULT_PATH = os.environ.get("SANDBOX_STORE", str(PROJECT_DIR / "scenarios.sqlite"))
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    {", ".join(f"{name} REAL NOT NULL" for name in (*DRIVERS, *LINE_ITEMS))}
+);
+CREATE INDEX IF NOT EXISTS scenarios_drivers ON scenarios ({", ".join(DRIVERS)});
+CREATE TABLE IF NOT EXISTS tags (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, scenario_id)
+);
+CREATE INDEX IF NOT EXISTS tags_scenario ON tags (scenario_id);
+"""
+
+
+class ScenarioStore:
+    """Named scenarios with their line items in a SQLite file.
+
+    One connection is shared across threads behind a lock, so a single
+    store can be cached process-wide by the app.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def save_many(self, names, drivers, tags=()):
+        """Evaluate and save scenarios in one transaction.
+
+        ``drivers`` is a list of driver dicts (missing drivers take their
+        slider default) aligned with ``names``; existing names are replaced
+        together with their tags. ``tags`` apply to every saved scenario.
+        """
+        rows = np.array(
+            [[float(d.get(name, driver.default)) for name, driver in DRIVERS.items()] for d in drivers],
+            dtype=np.float64,
+        ).reshape(len(names), len(DRIVERS))
+        out = evaluate(*rows.T)
+        values = np.column_stack([rows, *(out[name] for name in LINE_ITEMS)]).tolist()
+        now = time.time()
+        columns = ("name", "created", *DRIVERS, *LINE_ITEMS)
+        sql = (
+            f"INSERT INTO scenarios ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(name) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+        )
+        tags = sorted({tag.strip() for tag in tags if tag.strip()})
+        with self._lock, self._db:
+            self._db.executemany(sql, ([name, now, *row] for name, row in zip(names, values)))
+            # 覆盖时 UPSERT 保留原 id, 旧标签须先删除
+            self._db.executemany(
+                "DELETE FROM tags WHERE scenario_id = (SELECT id FROM scenarios WHERE name = ?)",
+                ((name,) for name in names),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO tags (scenario_id, tag) SELECT id, ? FROM scenarios WHERE name = ?",
+                ((tag, name) for name in names for tag in tags),
+            )
+        return len(names)
+
+    def save(self, name, drivers, tags=()):
+        """Evaluate and save one named scenario."""
+        self.save_many([name], [drivers], tags)
+
+    def delete(self, name):
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM scenarios WHERE name = ?", (name,)).rowcount > 0
+
+    def tags(self):
+        """All tags with their scenario counts."""
+        with self._lock:
+            return dict(self._db.execute("SELECT tag, COUNT(*) FROM tags GROUP BY tag ORDER BY tag"))
+
+    def names(self, tag=None):
+        """Saved scenario names, newest first, optionally filtered by tag."""
+        where, params = self._filter(tag)
+        with self._lock:
+            return [r[0] for r in self._db.execute(f"SELECT name FROM scenarios{where} ORDER BY created DESC, name", params)]
+
+    def load(self, name):
+        """Return ``{"drivers", "outputs", "tags"}`` of a saved scenario, or None."""
+        columns = (*DRIVERS, *LINE_ITEMS)
+        with self._lock:
+            row = self._db.execute(f"SELECT id, {', '.join(columns)} FROM scenarios WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            tags = [r[0] for r in self._db.execute("SELECT tag FROM tags WHERE scenario_id = ? ORDER BY tag", (row[0],))]
+        values = dict(zip(columns, row[1:]))
+        return {
+            "drivers": {name: values[name] for name in DRIVERS},
+            "outputs": {name: values[name] for name in LINE_ITEMS},
+            "tags": tags,
+        }
+
+    def find(self, tol=0.0, **drivers):
+        """Names of scenarios whose given drivers are within ``tol`` of the values."""
+        unknown = set(drivers) - set(DRIVERS)
+        if unknown:
+            raise ValueError(f"unknown drivers: {', '.join(sorted(unknown))}")
+        clauses = " AND ".join(f"{name} BETWEEN ? AND ?" for name in drivers) or "1"
+        params = [bound for value in drivers.values() for bound in (value - tol, value + tol)]
+        with self._lock:
+            return [r[0] for r in self._db.execute(f"SELECT name FROM scenarios WHERE {clauses} ORDER BY name", params)]
+
+    def compare(self, current, columns=("total_profit",), tag=None):
+        """Diff saved scenarios against the ``current`` outputs.
+
+        Returns a dict of equal-length lists: ``name``, the drivers, each of
+        ``columns`` and ``delta_<column>`` (saved minus current), sorted by
+        the first column's delta, largest first.
+        """
+        where, params = self._filter(tag)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT name, {', '.join((*DRIVERS, *columns))} FROM scenarios{where}", params
+            ).fetchall()
+        if not rows:
+            return {"name": [], **{name: [] for name in DRIVERS}, **{c: [] for c in columns},
+                    **{f"delta_{c}": [] for c in columns}}
+        names = [r[0] for r in rows]
+        data = np.array([r[1:] for r in rows], dtype=np.float64)
+        values = data[:, len(DRIVERS):]
+        deltas = values - np.array([current[c] for c in columns], dtype=np.float64)
+        order = np.argsort(-deltas[:, 0], kind="stable")
+
+        out = {"name": [names[i] for i in order]}
+        for j, name in enumerate(DRIVERS):
+            out[name] = data[order, j].tolist()
+        for j, column in enumerate(columns):
+            out[column] = values[order, j].tolist()
+            out[f"delta_{column}"] = deltas[order, j].tolist()
+        return out
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    @staticmethod
+    def _filter(tag):
+        if tag is None:
+            return "", []
+        return " WHERE id IN (SELECT scenario_id FROM tags WHERE tag = ?)", [tag]
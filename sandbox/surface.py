@@ -0,0 +1,122 @@
+"""利润曲面 2D profit surfaces.
+
+两个滑块张成一个 1000 x 1000 的稠密网格, 其余滑块固定在当前值; 网格以
+开放网格 (x 为行向量, y 为列向量) 传入模型计算图, 一次广播计算即可得到
+全部百万个点. 只计算目标科目的上游节点, 输入用 float32, 峰值内存约几十 MB.
+
+浏览器端只接收服务端按块平均降采样后的热力图 (默认 200 x 200) 和在全分辨率
+网格上提取的盈亏平衡线 (WebGL 散点), 图表体积与网格分辨率无关. 全分辨率网格
+(约 4 MB) 算完即弃, 缓存只保存这两部分 (``SurfaceView``, 约 0.2 MB).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from sandbox.model import DEFAULT_COEFFICIENTS, DRIVERS, MODEL
+
+RESOLUTION = 1000
+DISPLAY = 200
+
+# 预设的滑块组合: 名称 -> (x 轴, y 轴)
+SURFACES = {
+    "volume_material": ("volume", "raw_material_increase"),
+    "rd_finance": ("rd_rate", "bad_debt_rate"),
+    "volume_service": ("volume", "service_growth"),
+}
+
+
+@dataclass(frozen=True)
+class Surface:
+    x_name: str
+    y_name: str
+    output: str
+    x: np.ndarray  # (nx,)
+    y: np.ndarray  # (ny,)
+    z: np.ndarray  # (ny, nx) float32
+
+    def downsample(self, size=DISPLAY):
+        """Block-averaged ``(x, y, z)`` with at most about ``size`` cells per axis."""
+        fy = max(1, len(self.y) // size)
+        fx = max(1, len(self.x) // size)
+        ny, nx = len(self.y) // fy * fy, len(self.x) // fx * fx
+        z = self.z[:ny, :nx].reshape(ny // fy, fy, nx // fx, fx).mean(axis=(1, 3), dtype=np.float64)
+        x = self.x[:nx].reshape(-1, fx).mean(axis=1)
+        y = self.y[:ny].reshape(-1, fy).mean(axis=1)
+        return x, y, z.astype(np.float32)
+
+    def contour(self, level=0.0):
+        """Points where ``z`` crosses ``level`` on the full-resolution grid.
+
+        Crossings are found between vertically and horizontally adjacent
+        cells and placed by linear interpolation. Returns ``(xs, ys)``.
+        """
+        above = self.z >= level
+        xs, ys = [], []
+        # 沿 y 方向的相邻格点
+        iy, ix = np.nonzero(above[1:] != above[:-1])
+        z0, z1 = self.z[iy, ix], self.z[iy + 1, ix]
+        w = (level - z0) / (z1 - z0)
+        xs.append(self.x[ix])
+        ys.append(self.y[iy] + w * (self.y[iy + 1] - self.y[iy]))
+        # 沿 x 方向的相邻格点
+        iy, ix = np.nonzero(above[:, 1:] != above[:, :-1])
+        z0, z1 = self.z[iy, ix], self.z[iy, ix + 1]
+        w = (level - z0) / (z1 - z0)
+        xs.append(self.x[ix] + w * (self.x[ix + 1] - self.x[ix]))
+        ys.append(self.y[iy])
+        return np.concatenate(xs), np.concatenate(ys)
+
+    def extent(self):
+        """``(min, max)`` of the full-resolution surface."""
+        return float(self.z.min()), float(self.z.max())
+
+    def view(self, size=DISPLAY, level=0.0):
+        """The display-size ``SurfaceView`` of this surface."""
+        x, y, z = self.downsample(size)
+        contour_x, contour_y = self.contour(level)
+        low, high = self.extent()
+        return SurfaceView(self.x_name, self.y_name, self.output, x, y, z, contour_x, contour_y, low, high, self.z.size)
+
+
+@dataclass(frozen=True)
+class SurfaceView:
+    """Downsampled heatmap, full-resolution contour and range of a ``Surface``."""
+
+    x_name: str
+    y_name: str
+    output: str
+    x: np.ndarray  # (DISPLAY,) 降采样后
+    y: np.ndarray
+    z: np.ndarray  # (DISPLAY, DISPLAY) float32
+    contour_x: np.ndarray  # 全分辨率网格上的盈亏平衡点
+    contour_y: np.ndarray
+    low: float  # 全分辨率网格的最小、最大值
+    high: float
+    points: int  # 全分辨率网格点数
+
+    def extent(self):
+        return self.low, self.high
+
+
+def profit_surface(drivers, x_name, y_name, output="total_profit", resolution=RESOLUTION,
+                   coef=DEFAULT_COEFFICIENTS):
+    """Evaluate ``output`` over a ``resolution`` x ``resolution`` grid of two drivers.
+
+    The other drivers stay at their values in ``drivers``. Only nodes
+    upstream of ``output`` are evaluated, in float32.
+    """
+    if x_name == y_name:
+        raise ValueError("surface axes must be two different drivers")
+    x = np.linspace(DRIVERS[x_name].min, DRIVERS[x_name].max, resolution, dtype=np.float32)
+    y = np.linspace(DRIVERS[y_name].min, DRIVERS[y_name].max, resolution, dtype=np.float32)
+    inputs = {name: np.float32(drivers[name]) for name in DRIVERS}
+    inputs[x_name] = x[None, :]
+    inputs[y_name] = y[:, None]
+    upstream = MODEL.upstream(output)
+    names = [name for name in MODEL.nodes if name in upstream] + [output]
+    values = MODEL.evaluate({**inputs, "coef": coef}, names)
+    z = np.broadcast_to(values[output], (resolution, resolution)).astype(np.float32)
+    return Surface(x_name, y_name, output, x, y, z)
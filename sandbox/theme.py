@@ -0,0 +1,112 @@
+"""主题表 Theme table.
+
+CSS 变量与图表配色在导入时一次性预计算; 每次重跑只需按主题名查表,
+不再重新拼接样式字符串.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+THEME_LABELS = {
+    "dark": "Dark (深色)",
+    "light": "Light (亮色)",
+}
+
+THEMES = {
+    "dark": {
+        "css": {
+            "bg-start": "#0a0e1a",
+            "bg-end": "#1a1f2e",
+            "sidebar-bg": "rgba(15, 20, 35, 0.95)",
+            "sidebar-border": "rgba(0, 245, 255, 0.1)",
+            "select-bg": "rgba(30, 35, 50, 0.8)",
+            "select-border": "rgba(0, 245, 255, 0.3)",
+            "text": "#ffffff",
+            "subtitle": "#a0a8b8",
+            "muted": "#6b7280",
+            "accent": "#00f5ff",
+            "accent-rgb": "0, 245, 255",
+            "accent-2": "#0080ff",
+            "accent-2-rgb": "0, 128, 255",
+            "card-bg": "rgba(20, 25, 40, 0.6)",
+            "card-shadow": "none",
+            "panel-bg": "rgba(20, 25, 40, 0.4)",
+            "stable": "#10b981",
+            "stable-rgb": "16, 185, 129",
+            "danger": "#ef4444",
+            "danger-rgb": "239, 68, 68",
+        },
+        "chart_template": "plotly_dark",
+        "chart_bgcolor": "rgba(0,0,0,0)",
+        "grid_color": "rgba(255,255,255,0.1)",
+        "text_color": "white",
+        "primary_color": "#00f5ff",
+        "secondary_color": "#0080ff",
+        "danger_color": "#ef4444",
+        "colors": ["#00f5ff", "#0080ff", "#6366f1", "#8b5cf6"],
+        "connector_color": "rgba(0, 245, 255, 0.3)",
+        "zeroline_color": "rgba(0, 245, 255, 0.5)",
+        "fill_color": "rgba(0, 245, 255, 0.1)",
+        "radar_fill_color": "rgba(0, 245, 255, 0.2)",
+        "threshold_color": "rgba(239, 68, 68, 0.5)",
+        "pie_line_color": "rgba(20,25,40,0.8)",
+    },
+    "light": {
+        "css": {
+            "bg-start": "#f0f4f8",
+            "bg-end": "#e6eef7",
+            "sidebar-bg": "rgba(255, 255, 255, 0.95)",
+            "sidebar-border": "rgba(0, 100, 200, 0.1)",
+            "select-bg": "rgba(255, 255, 255, 0.9)",
+            "select-border": "rgba(0, 100, 200, 0.3)",
+            "text": "#1a202c",
+            "subtitle": "#4a5568",
+            "muted": "#4a5568",
+            "accent": "#0066cc",
+            "accent-rgb": "0, 102, 204",
+            "accent-2": "#00a8e8",
+            "accent-2-rgb": "0, 168, 232",
+            "card-bg": "rgba(255, 255, 255, 0.8)",
+            "card-shadow": "0 4px 6px rgba(0, 0, 0, 0.05)",
+            "panel-bg": "rgba(255, 255, 255, 0.6)",
+            "stable": "#059669",
+            "stable-rgb": "5, 150, 105",
+            "danger": "#dc2626",
+            "danger-rgb": "220, 38, 38",
+        },
+        "chart_template": "plotly_white",
+        "chart_bgcolor": "rgba(255,255,255,0)",
+        "grid_color": "rgba(0,0,0,0.1)",
+        "text_color": "#1a202c",
+        "primary_color": "#0066cc",
+        "secondary_color": "#00a8e8",
+        "danger_color": "#dc2626",
+        "colors": ["#0066cc", "#00a8e8", "#6366f1", "#8b5cf6"],
+        "connector_color": "rgba(0, 102, 204, 0.3)",
+        "zeroline_color": "rgba(0, 102, 204, 0.5)",
+        "fill_color": "rgba(0, 102, 204, 0.1)",
+        "radar_fill_color": "rgba(0, 102, 204, 0.2)",
+        "threshold_color": "rgba(220, 38, 38, 0.5)",
+        "pie_line_color": "rgba(255,255,255,0.8)",
+    },
+}
+
+
+def _minify(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,>])\s*", r"\1", css).strip()
+
+
+_BASE_CSS = _minify((Path(__file__).parent / "static" / "style.css").read_text(encoding="utf-8"))
+
+# 每个主题一份完整的 <style> 块, 进程内只构建一次
+STYLESHEETS = {
+    name: "<style>:root{%s}%s</style>" % (
+        "".join(f"--{var}:{value};" for var, value in theme["css"].items()),
+        _BASE_CSS,
+    )
+    for name, theme in THEMES.items()
+}
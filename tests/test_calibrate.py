@@ -0,0 +1,130 @@
+"""系数标定 Calibration on synthetic GL extracts with known coefficients."""
+
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sandbox.calibrate import calibrate, main
+from sandbox.model import Coefficients, load_calibration
+
+PERIODS = 24
+PERIODS_PER_YEAR = 12
+
+# 每个产品的真实系数 (单位收入/成本、月度固定成本、研发月支出)
+TRUTH = {
+    "X1": dict(revenue_per_unit=48.0, material_per_unit=27.0, variable_per_unit=4.5, monthly_fixed=1500.0,
+               service_per_unit=14.0, service_cost_ratio=0.45, finance_per_unit=7.5, finance_cost_per_unit=2.5,
+               used_per_unit=4.0, monthly_rd=800.0),
+    "X2": dict(revenue_per_unit=60.0, material_per_unit=35.0, variable_per_unit=6.0, monthly_fixed=900.0,
+               service_per_unit=18.0, service_cost_ratio=0.55, finance_per_unit=9.0, finance_cost_per_unit=3.5,
+               used_per_unit=6.0, monthly_rd=400.0),
+}
+
+ACCOUNTS = {
+    "6001": lambda c, u: c["revenue_per_unit"] * u,
+    "6401": lambda c, u: c["material_per_unit"] * u,
+    "6402": lambda c, u: c["monthly_fixed"] + c["variable_per_unit"] * u,
+    "6051": lambda c, u: c["service_per_unit"] * u,
+    "6403": lambda c, u: c["service_cost_ratio"] * c["service_per_unit"] * u,
+    "6061": lambda c, u: c["finance_per_unit"] * u,
+    "6411": lambda c, u: c["finance_cost_per_unit"] * u,
+    "6071": lambda c, u: c["used_per_unit"] * u,
+    "6602": lambda c, u: c["monthly_rd"] + 0 * u,
+}
+
+
+def gl_extract(accounts=ACCOUNTS, seed=0):
+    """Long GL table; each amount is split over several journal lines."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for product, coef in TRUTH.items():
+        for period in range(PERIODS):
+            units = float(rng.integers(60, 140))
+            rows.append((f"2024-{period:02d}", product, "UNITS", units))
+            for account, amount in accounts.items():
+                total = amount(coef, units)
+                parts = rng.dirichlet(np.ones(3)) * total
+                rows.extend((f"2024-{period:02d}", product, account, part) for part in parts)
+            rows.append((f"2024-{period:02d}", product, "9999", 1e6))  # 未映射的科目被忽略
+    frame = pd.DataFrame(rows, columns=["period", "product", "account", "amount"])
+    return frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+@pytest.fixture
+def extract(tmp_path):
+    path = tmp_path / "gl.csv"
+    gl_extract().to_csv(path, index=False)
+    return path
+
+
+def test_recovers_per_product_coefficients(extract):
+    params, products = calibrate([extract], PERIODS_PER_YEAR, chunk_rows=500)
+    assert params["rows"] == len(gl_extract())
+    assert params["periods"] == PERIODS
+    for product, coef in TRUTH.items():
+        row = products.loc[product]
+        for name in ("revenue_per_unit", "material_per_unit", "variable_per_unit", "service_per_unit",
+                     "service_cost_ratio", "finance_per_unit", "finance_cost_per_unit", "used_per_unit"):
+            assert row[name] == pytest.approx(coef[name], rel=1e-9), (product, name)
+        assert row["fixed_cost"] == pytest.approx(coef["monthly_fixed"] * PERIODS_PER_YEAR, rel=1e-9)
+        assert row["rd_total"] == pytest.approx(coef["monthly_rd"] * PERIODS_PER_YEAR * Coefficients().rd_years, rel=1e-9)
+        assert row["r2_manufacturing"] == pytest.approx(1.0)
+
+
+def test_chunk_size_does_not_change_the_result(extract):
+    _, small = calibrate([extract], PERIODS_PER_YEAR, chunk_rows=97)
+    _, whole = calibrate([extract], PERIODS_PER_YEAR, chunk_rows=1_000_000)
+    pd.testing.assert_frame_equal(small, whole)
+
+
+def test_missing_measures_keep_defaults(tmp_path):
+    # 没有金融、二手和研发科目的总账
+    accounts = {key: value for key, value in ACCOUNTS.items() if key not in ("6061", "6411", "6071", "6602")}
+    path = tmp_path / "gl.csv"
+    gl_extract(accounts).to_csv(path, index=False)
+    params, products = calibrate([path], PERIODS_PER_YEAR, chunk_rows=200)
+    defaults = Coefficients()
+    for coefficients in (params["pooled"], *params["products"].values()):
+        for name in ("finance_per_unit", "finance_cost_per_unit", "used_per_unit", "rd_total"):
+            assert coefficients[name] == getattr(defaults, name), name
+    assert products.loc["X1", "revenue_per_unit"] == pytest.approx(TRUTH["X1"]["revenue_per_unit"])
+
+
+def test_wide_extract_matches_long_extract(tmp_path, extract):
+    long = gl_extract()
+    measures = {"UNITS": "units", "6001": "equipment_revenue", "6401": "material_cost", "6402": "manufacturing_cost",
+                "6051": "service_revenue", "6403": "service_cost", "6061": "finance_revenue", "6411": "finance_cost",
+                "6071": "used_profit", "6602": "rd_spend"}
+    wide = (
+        long[long["account"].isin(measures)]
+        .assign(measure=lambda frame: frame["account"].map(measures))
+        .pivot_table(index=["product", "period"], columns="measure", values="amount", aggfunc="sum")
+        .reset_index()
+    )
+    path = tmp_path / "wide.parquet"
+    wide.to_parquet(path, index=False)
+    _, from_wide = calibrate([path], PERIODS_PER_YEAR)
+    _, from_long = calibrate([extract], PERIODS_PER_YEAR)
+    pd.testing.assert_frame_equal(from_wide, from_long, rtol=1e-9)
+
+
+def test_cli_output_round_trips_through_load_calibration(tmp_path, extract, capsys):
+    output = tmp_path / "calibration.json"
+    main([str(extract), "-o", str(output), "--periods-per-year", str(PERIODS_PER_YEAR)])
+    coef, meta = load_calibration(output)
+    params = json.loads(output.read_text(encoding="utf-8"))
+    assert coef == Coefficients(**params["pooled"])
+    assert meta["periods"] == PERIODS and "products" not in meta
+
+
+def test_malformed_calibration_file_warns(tmp_path):
+    path = tmp_path / "calibration.json"
+    path.write_text("{not json", encoding="utf-8")
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert load_calibration(path) == (Coefficients(), None)
+    assert "ignoring calibration file" in str(caught[0].message)
+    assert load_calibration(tmp_path / "missing.json") == (Coefficients(), None)
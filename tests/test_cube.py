@@ -0,0 +1,65 @@
+"""预计算网格 Cube lookups vs direct model evaluation."""
+
+import json
+
+import numpy as np
+import pytest
+
+from sandbox.cube import Cube, _compute, axes_of, build, open_cube
+from sandbox.model import DRIVERS, evaluate_one
+from sandbox.optimizer import RISKS, lattice
+
+OUTPUTS = ("total_profit", "unit_cost", *RISKS)
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cube")
+    build(path, outputs=OUTPUTS, derived=())
+    return Cube(path)
+
+
+def test_lookup_matches_evaluate_on_lattice_points(built):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        drivers = {name: float(rng.choice(lattice(name))) for name in DRIVERS}
+        expected = evaluate_one(**drivers)
+        for name, value in built.lookup(drivers).items():
+            assert value == pytest.approx(expected[name], rel=1e-12, abs=1e-9), name
+
+
+def test_lookup_snaps_to_nearest_step_and_clamps(built):
+    drivers = {name: driver.default for name, driver in DRIVERS.items()}
+    nudged = {**drivers, "volume": drivers["volume"] + DRIVERS["volume"].step * 0.4}
+    assert built.lookup(nudged) == built.lookup(drivers)
+    beyond = {**drivers, "volume": DRIVERS["volume"].max * 10}
+    at_max = {**drivers, "volume": DRIVERS["volume"].max}
+    assert built.lookup(beyond) == built.lookup(at_max)
+
+
+def test_derived_npv_matches_projection():
+    from sandbox.projection import project
+
+    # 只取各轴的少量格点, 走与 build 相同的开放网格计算路径
+    axes = axes_of("total_profit")
+    block = {name: lattice(name)[::7] for name in axes}
+    npv = _compute(("npv",), axes, block)["npv"]
+    assert npv.shape == tuple(len(block[name]) for name in axes)
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        index = tuple(int(rng.integers(0, n)) for n in npv.shape)
+        drivers = {name: driver.default for name, driver in DRIVERS.items()}
+        drivers.update({name: float(block[name][i]) for name, i in zip(axes, index)})
+        assert npv[index] == pytest.approx(float(project(**drivers)["npv"]))
+
+
+def test_open_cube_ignores_missing_and_stale(tmp_path, built):
+    assert open_cube(tmp_path / "missing") is None
+    assert open_cube(built.path) is not None
+    manifest = json.loads((built.path / "manifest.json").read_text(encoding="utf-8"))
+    manifest["coefficients"]["revenue_per_unit"] += 1
+    manifest["outputs"] = {}
+    stale = tmp_path / "stale"
+    stale.mkdir()
+    (stale / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    assert open_cube(stale) is None
@@ -0,0 +1,67 @@
+"""计算图 Incremental vs full evaluation of the model graph."""
+
+import numpy as np
+import pytest
+
+from sandbox.graph import Graph, Incremental
+from sandbox.model import DRIVERS, LINE_ITEMS, MODEL, IncrementalModel, evaluate_one
+
+
+def random_drivers(rng):
+    return {
+        name: float(driver.min + driver.step * rng.integers(0, int(round((driver.max - driver.min) / driver.step)) + 1))
+        for name, driver in DRIVERS.items()
+    }
+
+
+def test_incremental_matches_full_evaluation():
+    rng = np.random.default_rng(0)
+    model = IncrementalModel()
+    drivers = {name: driver.default for name, driver in DRIVERS.items()}
+    for _ in range(200):
+        # 每步改动一到两个滑块, 与拖动滑块的会话一致
+        changed = random_drivers(rng)
+        for name in rng.choice(list(DRIVERS), size=rng.integers(1, 3), replace=False):
+            drivers[name] = changed[name]
+        incremental = model.update(**drivers)
+        full = evaluate_one(**drivers)
+        for name in LINE_ITEMS:
+            assert incremental[name] == pytest.approx(full[name], rel=1e-12, abs=1e-9), name
+
+
+def test_incremental_recomputes_only_downstream_nodes():
+    model = IncrementalModel()
+    drivers = {name: driver.default for name, driver in DRIVERS.items()}
+    model.update(**drivers)
+    assert set(model.recomputed) == set(MODEL.nodes)
+
+    model.update(**{**drivers, "rd_rate": drivers["rd_rate"] + 5})
+    assert set(model.recomputed) == set(MODEL.downstream(["rd_rate"]))
+    assert "equipment_revenue" not in model.recomputed
+
+    model.update(**{**drivers, "rd_rate": drivers["rd_rate"] + 5})
+    assert model.recomputed == ()
+
+
+def test_graph_rejects_undefined_dependencies():
+    graph = Graph(inputs=("x",))
+
+    with pytest.raises(ValueError, match="undefined"):
+        @graph.node()
+        def y(z):
+            return z
+
+
+def test_incremental_requires_all_inputs_first():
+    graph = Graph(inputs=("x", "y"))
+
+    @graph.node()
+    def total(x, y):
+        return x + y
+
+    state = Incremental(graph)
+    with pytest.raises(ValueError, match="missing inputs"):
+        state.update(x=1.0)
+    assert state.update(x=1.0, y=2.0)["total"] == 3.0
+    assert state.update(x=1.0, y=5.0)["total"] == 6.0
+    assert state.recomputed == ("total",)
@@ -0,0 +1,123 @@
+"""后台任务 Job pool slots, supersession and cleanup."""
+
+import threading
+import time
+
+import pytest
+
+from sandbox.jobs import JobPool
+
+
+def steps(values, gate=None):
+    """Job body yielding ``values`` as partial results, optionally waiting on ``gate`` first."""
+    def run():
+        if gate is not None:
+            gate.wait(5)
+        for i, value in enumerate(values, 1):
+            yield i / len(values), value
+    return run
+
+
+def wait(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert job.done
+
+
+@pytest.fixture
+def pool():
+    pool = JobPool(max_workers=2)
+    yield pool
+    pool._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_submit_runs_job_and_keeps_partial_results(pool):
+    job = pool.submit("s", ("sim", 1), steps(["a", "b", "c"]))
+    wait(job)
+    assert job.result == "c" and job.progress == 1.0 and job.version == 3
+    assert job.error is None and not job.running
+    # 同一槽、同一键: 返回同一个任务, 不重新计算
+    assert pool.submit("s", ("sim", 1), steps(["x"])) is job
+    assert pool.get("s") is job
+
+
+def test_new_key_supersedes_running_job(pool):
+    gate = threading.Event()
+    old = pool.submit("s", ("sim", 1), steps(["old"], gate))
+    new = pool.submit("s", ("sim", 2), steps(["new"]))
+    assert new is not old and old.cancelled
+    gate.set()
+    wait(new)
+    time.sleep(0.05)
+    assert new.result == "new"
+    assert old.result is None and pool.get("s") is new
+
+
+def test_shared_job_survives_one_session_moving_on(pool):
+    gate = threading.Event()
+    first = pool.submit("a", ("sim", 1), steps(["shared"], gate))
+    second = pool.submit("b", ("sim", 1), steps(["unused"]))
+    assert second is first
+    pool.submit("a", ("sim", 2), steps(["other"]))
+    assert not first.cancelled
+    gate.set()
+    wait(first)
+    assert first.result == "shared"
+
+
+def test_finished_results_are_reused_across_sessions(pool):
+    calls = []
+
+    def counted():
+        calls.append(1)
+        yield 1.0, "done"
+
+    job = pool.submit("a", ("sim", 1), counted)
+    wait(job)
+    assert pool.submit("b", ("sim", 1), counted) is job
+    assert len(calls) == 1
+
+
+def test_cancel_forgets_slot_and_stops_job(pool):
+    gate = threading.Event()
+    job = pool.submit("s", ("sim", 1), steps(["x"], gate))
+    assert pool.active() == 1
+    pool.cancel("s")
+    assert job.cancelled and pool.get("s") is None and pool.active() == 0
+    gate.set()
+    pool.cancel("missing")  # 空槽无操作
+
+
+def test_errors_are_captured(pool):
+    def failing():
+        yield 0.5, "partial"
+        raise RuntimeError("boom")
+
+    job = pool.submit("s", ("sim", 1), failing)
+    wait(job)
+    assert isinstance(job.error, RuntimeError) and job.result == "partial"
+    # 失败的任务不进入结果缓存, 重新提交时重算
+    assert pool.submit("t", ("sim", 1), steps(["ok"])) is not job
+
+
+def test_abandoned_slots_are_freed_after_ttl():
+    pool = JobPool(max_workers=1, slot_ttl=0.05)
+    jobs = [pool.submit(f"session-{i}", ("sim", i), steps([i])) for i in range(20)]
+    for job in jobs:
+        wait(job)
+    assert pool.slots() == 20
+    time.sleep(0.1)
+    # 下一次提交时释放所有过期槽, 只剩新会话
+    pool.submit("fresh", ("sim", "fresh"), steps([0]))
+    assert pool.slots() == 1
+    assert pool.get("session-0") is None
+
+
+def test_slot_count_is_capped():
+    pool = JobPool(max_workers=1, max_slots=8)
+    for i in range(50):
+        pool.submit(f"session-{i}", ("sim", i), steps([i]))
+    assert pool.slots() == 8
+    assert pool.get("session-49") is not None
+    assert pool.get("session-0") is None
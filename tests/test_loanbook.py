@@ -0,0 +1,91 @@
+"""贷款簿 Loan tape validation and expected-loss behaviour."""
+
+import io
+
+import numpy as np
+import pytest
+
+from sandbox.loanbook import (
+    GRADE_PD,
+    MAX_TERM,
+    apply_losses,
+    book_for_volume,
+    credit_losses,
+    load_book,
+    synthetic_book,
+)
+from sandbox.model import DRIVERS, evaluate_one
+
+DEFAULTS = {name: driver.default for name, driver in DRIVERS.items()}
+
+
+def tape(**columns):
+    header = ",".join(columns)
+    rows = zip(*columns.values())
+    return io.StringIO(header + "\n" + "\n".join(",".join(map(str, row)) for row in rows) + "\n")
+
+
+def test_load_book_reads_tape():
+    book = load_book(tape(principal=[30, 40], rate=[0.05, 0.06], term=[36, 48], grade=[0, len(GRADE_PD) - 1], cohort=[1, 2]))
+    assert book["term"].tolist() == [36, 48]
+    assert book["grade"].tolist() == [0, len(GRADE_PD) - 1]
+
+
+@pytest.mark.parametrize("columns, message", [
+    (dict(principal=[30], rate=[0.05]), "needs columns"),
+    (dict(principal=[30], rate=[0.05], term=[0]), "terms"),
+    (dict(principal=[30], rate=[0.05], term=[MAX_TERM + 1]), "terms"),
+    (dict(principal=[30], rate=[0.05], term=[36], grade=[len(GRADE_PD)]), "grades"),
+    (dict(principal=[30], rate=[0.05], term=[36], grade=[-1]), "grades"),
+    (dict(principal=[30], rate=[0.05], term=[36], grade=[255]), "grades"),
+])
+def test_load_book_rejects_invalid_tapes(columns, message):
+    with pytest.raises(ValueError, match=message):
+        load_book(tape(**columns))
+
+
+@pytest.fixture(scope="module")
+def book():
+    return synthetic_book(20_000, seed=1)
+
+
+def test_losses_increase_with_bad_debt_rate(book):
+    rates = np.arange(0, DRIVERS["bad_debt_rate"].max + 1, 2.0)
+    losses = [credit_losses(book, rate) for rate in rates]
+    assert losses[0].expected_loss == 0.0 and losses[0].expected_defaults == 0.0
+    expected = [loss.expected_loss for loss in losses]
+    stressed = [loss.stressed_loss for loss in losses]
+    defaults = [loss.expected_defaults for loss in losses]
+    assert all(np.diff(expected) > 0) and all(np.diff(stressed) > 0) and all(np.diff(defaults) > 0)
+    assert all(s >= e for s, e in zip(stressed[1:], expected[1:]))
+
+
+def test_expected_defaults_match_lifetime_rates(book):
+    rate = 5.0
+    losses = credit_losses(book, rate)
+    lifetime = np.minimum(rate / 100 * GRADE_PD, 0.99)
+    assert losses.expected_defaults == pytest.approx(lifetime[book["grade"]].sum(), rel=1e-3)
+
+
+def test_aggregates_are_consistent_and_chunk_invariant(book):
+    losses = credit_losses(book, 8.0)
+    assert losses.grade_loss.sum() == pytest.approx(losses.expected_loss, rel=1e-6)
+    assert losses.contracts == len(book)
+    # 风险等级越差, 每笔贷款的预期损失越高
+    per_loan = losses.grade_loss / np.bincount(book["grade"], minlength=len(GRADE_PD))
+    assert all(np.diff(per_loan) > 0)
+    small = credit_losses(book, 8.0, chunk=777)
+    assert small.expected_loss == pytest.approx(losses.expected_loss, rel=1e-6)
+    np.testing.assert_allclose(small.monthly_loss, losses.monthly_loss, rtol=1e-5)
+
+
+def test_apply_losses_replaces_bad_debt():
+    result = evaluate_one(**DEFAULTS)
+    losses = credit_losses(book_for_volume(DEFAULTS["volume"]), DEFAULTS["bad_debt_rate"])
+    adjusted = apply_losses(result, losses)
+    assert adjusted["bad_debt"] == pytest.approx(losses.expected_loss)
+    shift = result["bad_debt"] - losses.expected_loss
+    assert adjusted["finance_profit"] == pytest.approx(result["finance_profit"] + shift)
+    assert adjusted["total_profit"] == pytest.approx(result["total_profit"] + shift)
+    assert adjusted["equipment_profit"] == result["equipment_profit"]
+    assert 0.0 <= adjusted["finance_risk"] <= 100.0
@@ -0,0 +1,61 @@
+"""灵敏度 Forward-mode derivatives vs central finite differences."""
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from sandbox.model import DEFAULT_COEFFICIENTS, DRIVERS, LINE_ITEMS, evaluate
+from sandbox.sensitivity import COEFFICIENTS, INPUTS, Dual, elasticities, jacobian
+
+POINTS = [
+    {name: driver.default for name, driver in DRIVERS.items()},
+    {"volume": 1500, "rd_rate": 35, "raw_material_increase": 12, "inventory_growth": 25, "bad_debt_rate": 3, "service_growth": 40},
+]
+
+
+def finite_difference(drivers, name, output, h=1e-4):
+    def at(offset):
+        if name in DRIVERS:
+            return evaluate(coef=DEFAULT_COEFFICIENTS, **{**drivers, name: drivers[name] + offset})[output]
+        coef = replace(DEFAULT_COEFFICIENTS, **{name: getattr(DEFAULT_COEFFICIENTS, name) + offset})
+        return evaluate(coef=coef, **drivers)[output]
+
+    return (float(at(h)) - float(at(-h))) / (2 * h)
+
+
+@pytest.mark.parametrize("drivers", POINTS)
+def test_jacobian_matches_finite_differences(drivers):
+    values, derivatives = jacobian(drivers)
+    reference = evaluate(**drivers)
+    for output in LINE_ITEMS:
+        assert float(values[output]) == pytest.approx(float(reference[output]), rel=1e-12, abs=1e-9)
+        for i, name in enumerate(INPUTS):
+            expected = finite_difference(drivers, name, output)
+            assert derivatives[output][i] == pytest.approx(expected, rel=1e-5, abs=1e-5), (output, name)
+
+
+def test_jacobian_broadcasts_over_scenarios():
+    batch = {name: np.array([point[name] for point in POINTS], dtype=np.float64) for name in DRIVERS}
+    values, derivatives = jacobian(batch, outputs=("total_profit",))
+    assert derivatives["total_profit"].shape == (len(POINTS), len(INPUTS))
+    for row, drivers in enumerate(POINTS):
+        single_values, single = jacobian(drivers, outputs=("total_profit",))
+        assert values["total_profit"][row] == pytest.approx(float(single_values["total_profit"]))
+        np.testing.assert_allclose(derivatives["total_profit"][row], single["total_profit"])
+
+
+def test_elasticities_cover_every_input():
+    rows = elasticities(POINTS[0])
+    assert {row["input"] for row in rows} == {*DRIVERS, *COEFFICIENTS}
+    magnitudes = [abs(row["elasticity"]) for row in rows]
+    assert magnitudes == sorted(magnitudes, reverse=True)
+
+
+def test_dual_arithmetic():
+    x = Dual(3.0, np.array([1.0, 0.0]))
+    z = Dual(2.0, np.array([0.0, 1.0]))
+    y = x * x / (x + z) - 2 * z
+    # ∂/∂x = (x^2 + 2xz) / (x + z)^2, ∂/∂z = -x^2 / (x + z)^2 - 2
+    assert y.value == pytest.approx(9 / 5 - 4)
+    np.testing.assert_allclose(y.tangent, [21 / 25, -9 / 25 - 2])
@@ -0,0 +1,130 @@
+"""情景计算服务 Request validation and routing of the evaluation service."""
+
+import asyncio
+import json
+
+import pytest
+
+from sandbox import service as service_module
+from sandbox.model import DRIVERS, evaluate_one
+from sandbox.service import MAX_BODY, OUTPUTS, BadRequest, Service, parse_scenario
+
+
+def test_parse_scenario_fills_defaults():
+    assert parse_scenario({"volume": 1200}) == tuple(
+        1200.0 if name == "volume" else float(driver.default) for name, driver in DRIVERS.items()
+    )
+
+
+@pytest.mark.parametrize("obj, message", [
+    ([], "JSON object"),
+    ({"speed": 1}, "unknown drivers"),
+    ({"volume": "1000"}, "must be a number"),
+    ({"volume": True}, "must be a number"),
+    ({"volume": 0}, "positive"),
+    ({"rd_rate": float("nan")}, "must be finite"),
+    ({"rd_rate": float("inf")}, "must be finite"),
+    ({"volume": 10 ** 400}, "must be finite"),
+])
+def test_parse_scenario_rejects(obj, message):
+    with pytest.raises(BadRequest, match=message):
+        parse_scenario(obj)
+
+
+def run(requests):
+    """Send ``(method, path, body)`` requests concurrently to a fresh service."""
+    async def main():
+        service = Service(max_wait=0.01)
+        service.batcher.start()
+        try:
+            return service, await asyncio.gather(*(service.handle(*request) for request in requests))
+        finally:
+            await service.batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_single_and_batch_requests():
+    single = json.dumps({"volume": 1200}).encode()
+    batch = json.dumps([{"volume": 800}, {}, {"bad_debt_rate": 12}]).encode()
+    service, [(status1, one), (status2, many)] = run([("POST", "/evaluate", single), ("POST", "/evaluate", batch)])
+    assert status1 == status2 == 200
+    expected = evaluate_one(**{**{n: d.default for n, d in DRIVERS.items()}, "volume": 1200})
+    assert set(one) == {*OUTPUTS, "latency_ms"}
+    assert one["total_profit"] == pytest.approx(expected["total_profit"])
+    assert [row["total_profit"] for row in many["results"]] == pytest.approx([
+        evaluate_one(**{**{n: d.default for n, d in DRIVERS.items()}, **obj})["total_profit"]
+        for obj in ({"volume": 800}, {}, {"bad_debt_rate": 12})
+    ])
+    # 两个并发请求合并为一个批次
+    assert service.batcher.batches == 1 and service.batcher.evaluated == 4
+    assert service.stats()["requests"] == 2
+
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("GET", "/health", b"", 200),
+    ("GET", "/stats", b"", 200),
+    ("POST", "/evaluate", b"[]", 200),
+    ("POST", "/evaluate", b"{not json", 400),
+    ("POST", "/evaluate", b'{"volume": -1}', 400),
+    ("POST", "/evaluate", b'{"volume": 1e999}', 400),
+    ("POST", "/evaluate", b'[{"volume": 10, "speed": 1}]', 400),
+    ("GET", "/evaluate", b"", 405),
+    ("POST", "/missing", b"", 404),
+])
+def test_status_codes(method, path, body, status):
+    _, [(code, payload)] = run([(method, path, body)])
+    assert code == status, payload
+    if status >= 400:
+        assert "error" in payload
+
+
+def test_evaluation_error_fails_only_its_batch(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    async def main():
+        service = Service()
+        service.batcher.start()
+        try:
+            with monkeypatch.context() as patch:
+                patch.setattr(service_module, "evaluate", broken)
+                failed = await service.handle("POST", "/evaluate", b"{}")
+            return failed, await service.handle("POST", "/evaluate", b"{}")
+        finally:
+            await service.batcher.stop()
+
+    (status, payload), (after, _) = asyncio.run(main())
+    assert status == 500 and "boom" in payload["error"]
+    assert after == 200
+
+
+def exchange(raw):
+    """Raw HTTP exchange with a service listening on an ephemeral port; returns the status line."""
+    async def main():
+        service = Service()
+        service.batcher.start()
+        server = await asyncio.start_server(service.serve_connection, "127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response.split(b"\r\n", 1)[0].decode()
+        finally:
+            server.close()
+            await service.batcher.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("headers, status", [
+    (f"Content-Length: {MAX_BODY + 1}", "413"),
+    ("Content-Length: abc", "400"),
+    ("Content-Length: -3", "400"),
+    ("Content-Length: 2\r\nConnection: close", "200"),
+])
+def test_content_length_handling(headers, status):
+    line = exchange(f"POST /evaluate HTTP/1.1\r\n{headers}\r\n\r\n{{}}".encode())
+    assert line.split()[1] == status
@@ -0,0 +1,61 @@
+"""蒙特卡洛模拟 Monte Carlo engine: validation and reproducibility."""
+
+import pytest
+
+from sandbox.model import DRIVERS
+from sandbox.simulation import simulate, simulate_progressive
+
+DEFAULTS = {name: driver.default for name, driver in DRIVERS.items()}
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    (dict(n_samples=0), "n_samples"),
+    (dict(n_samples=-5), "n_samples"),
+    (dict(chunk_size=0), "chunk_size"),
+])
+def test_rejects_empty_runs(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        simulate(DEFAULTS, **kwargs)
+    with pytest.raises(ValueError, match=message):
+        next(simulate_progressive(DEFAULTS, **kwargs))
+
+
+def test_progressive_ends_with_the_full_result():
+    steps = list(simulate_progressive(DEFAULTS, n_samples=50_000, chunk_size=12_000, seed=3))
+    assert [progress for progress, _ in steps] == pytest.approx([12 / 50, 24 / 50, 36 / 50, 48 / 50, 1.0])
+    assert [partial.n_samples for _, partial in steps] == [12_000, 24_000, 36_000, 48_000, 50_000]
+    final = simulate(DEFAULTS, n_samples=50_000, chunk_size=12_000, seed=3)
+    last = steps[-1][1]
+    assert last.mean == final.mean and last.std == final.std and last.prob_loss == final.prob_loss
+    assert (last.counts == final.counts).all()
+
+
+def test_seed_determinism():
+    a = simulate(DEFAULTS, n_samples=20_000, seed=7)
+    b = simulate(DEFAULTS, n_samples=20_000, seed=7)
+    c = simulate(DEFAULTS, n_samples=20_000, seed=8)
+    assert a.mean == b.mean and (a.counts == b.counts).all()
+    assert a.mean != c.mean
+    # 分块大小只影响进度粒度, 不影响抽样序列
+    d = simulate(DEFAULTS, n_samples=20_000, chunk_size=3_000, seed=7)
+    assert d.mean == pytest.approx(a.mean, rel=1e-12)
+    assert (d.counts == a.counts).all()
+
+
+def test_summary_statistics_are_consistent():
+    result = simulate(DEFAULTS, spread=0.1, n_samples=100_000, seed=0)
+    assert result.counts.sum() == result.n_samples
+    assert result.p5 < result.p50 < result.p95
+    assert result.edges[0] <= result.p5 and result.p95 <= result.edges[-1]
+    assert sum(result.segment_means.values()) == pytest.approx(result.mean, rel=1e-9)
+    assert 0.0 <= result.prob_loss <= 1.0
+    counts, edges = result.coarse_histogram(64)
+    assert len(counts) == 64 and len(edges) == 65 and counts.sum() == result.n_samples
+
+
+def test_zero_spread_collapses_to_the_point_estimate():
+    from sandbox.model import evaluate_one
+
+    result = simulate(DEFAULTS, spread=0.0, n_samples=1_000)
+    assert result.mean == pytest.approx(evaluate_one(**DEFAULTS)["total_profit"])
+    assert result.std < 1e-6 * abs(result.mean)  # 只剩平方和的舍入误差
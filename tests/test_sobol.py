@@ -0,0 +1,85 @@
+"""全局灵敏度 Sobol indices on an analytic function and on the model."""
+
+import numpy as np
+import pytest
+
+from sandbox import sobol
+from sandbox.graph import Graph
+from sandbox.model import DRIVERS
+from sandbox.sobol import driver_bounds, sobol_indices, sobol_points, sobol_progressive
+
+DEFAULTS = {name: driver.default for name, driver in DRIVERS.items()}
+
+
+def test_sobol_points_are_balanced():
+    points = sobol_points(1 << 10, 12, replicates=3, seed=4)
+    assert points.shape == (3, 1 << 10, 12)
+    assert ((points > 0) & (points < 1)).all()
+    # 2 的幂前缀在每个维度的每个二分之一、四分之一区间里点数相等
+    for bins in (2, 4, 8):
+        counts = np.apply_along_axis(lambda column: np.bincount((column * bins).astype(int), minlength=bins), 1, points)
+        assert (counts == (1 << 10) // bins).all()
+
+
+@pytest.fixture
+def analytic(monkeypatch):
+    """f = a·volume + b·rd_rate + c·(volume - μ)(rd_rate - μ); other drivers have no effect.
+
+    Coefficients are chosen so the variance splits 40 / 30 / 30 between
+    volume, R&D rate and their interaction.
+    """
+    low, high = driver_bounds(DEFAULTS, 0.4)
+    names = tuple(DRIVERS)
+    mean = dict(zip(names, (low + high) / 2))
+    var = dict(zip(names, (high - low) ** 2 / 12))
+    a = np.sqrt(0.4 / var["volume"])
+    b = -np.sqrt(0.3 / var["rd_rate"])
+    c = np.sqrt(0.3 / (var["volume"] * var["rd_rate"]))
+    graph = Graph(inputs=(*DRIVERS, "coef"))
+
+    @graph.node()
+    def total_profit(volume, rd_rate, service_growth):
+        return a * volume + b * rd_rate + c * (volume - mean["volume"]) * (rd_rate - mean["rd_rate"]) + 0 * service_growth
+
+    monkeypatch.setattr(sobol, "MODEL", graph)
+    v1 = a * a * var["volume"]
+    v2 = b * b * var["rd_rate"]
+    v12 = c * c * var["volume"] * var["rd_rate"]
+    total = v1 + v2 + v12
+    first = {"volume": v1 / total, "rd_rate": v2 / total}
+    total_order = {"volume": (v1 + v12) / total, "rd_rate": (v2 + v12) / total}
+    return first, total_order, total
+
+
+def test_indices_match_analytic_values(analytic):
+    first, total_order, variance = analytic
+    result = sobol_indices(DEFAULTS, width=0.4, n=1 << 14)
+    for i, name in enumerate(result.names):
+        assert result.first[i] == pytest.approx(first.get(name, 0.0), abs=5e-3), name
+        assert result.total[i] == pytest.approx(total_order.get(name, 0.0), abs=5e-3), name
+        # 95% 置信半宽应覆盖真值
+        assert abs(result.first[i] - first.get(name, 0.0)) <= result.first_ci[i] + 1e-3, name
+    assert result.variance == pytest.approx(variance, rel=0.02)
+    assert result.converged(tolerance=0.02)
+
+
+def test_zero_width_gives_zero_indices():
+    result = sobol_indices(DEFAULTS, width=0.0, n=1 << 10)
+    assert result.variance == 0.0
+    assert not result.first.any() and not result.total.any()
+
+
+def test_model_indices_are_consistent():
+    result = sobol_indices(DEFAULTS, width=0.3, n=1 << 13)
+    assert result.evaluations == (1 << 13) * (len(DRIVERS) + 2)
+    assert (result.total >= result.first - 0.02).all()
+    assert result.first.sum() <= 1.02
+    # 渠道库存不影响总利润
+    assert result.share("inventory_growth") == pytest.approx(0.0, abs=1e-9)
+    assert result.checkpoints[-1] == result.evaluations
+
+
+def test_progressive_yields_quick_estimate_then_full_run():
+    steps = list(sobol_progressive(DEFAULTS, n=1 << 12))
+    assert [progress for progress, _ in steps] == [0.125, 1.0]
+    assert steps[0][1].evaluations < steps[1][1].evaluations
@@ -0,0 +1,74 @@
+"""情景库 Scenario store: overwrite, tags, bulk save and compare."""
+
+import pytest
+
+from sandbox.model import DRIVERS, evaluate_one
+from sandbox.store import ScenarioStore
+
+DEFAULTS = {name: driver.default for name, driver in DRIVERS.items()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScenarioStore(str(tmp_path / "scenarios.sqlite"))
+    yield store
+    store.close()
+
+
+def test_save_and_load_round_trip(store):
+    store.save("base", {"volume": 1200, "rd_rate": 25}, tags=["q1", " plan "])
+    saved = store.load("base")
+    assert saved["drivers"] == {**DEFAULTS, "volume": 1200, "rd_rate": 25}
+    expected = evaluate_one(**saved["drivers"])
+    for name, value in saved["outputs"].items():
+        assert value == pytest.approx(expected[name])
+    assert saved["tags"] == ["plan", "q1"]
+    assert store.load("missing") is None
+
+
+def test_overwrite_replaces_drivers_and_tags(store):
+    store.save("a", {"volume": 500}, tags=["q1", "base"])
+    store.save("b", {"volume": 600}, tags=["q1"])
+    store.save("a", {"volume": 700}, tags=["q2"])
+    assert len(store) == 2
+    assert store.load("a")["drivers"]["volume"] == 700
+    assert store.load("a")["tags"] == ["q2"]
+    assert store.tags() == {"q1": 1, "q2": 1}
+    assert store.names(tag="q1") == ["b"]
+    assert store.names(tag="base") == []
+
+    # 不带标签覆盖时清空标签
+    store.save("b", {"volume": 650})
+    assert store.load("b")["tags"] == []
+    assert store.tags() == {"q2": 1}
+
+
+def test_delete_removes_tags(store):
+    store.save("a", {}, tags=["q1"])
+    assert store.delete("a")
+    assert not store.delete("a")
+    assert store.tags() == {}
+
+
+def test_bulk_save_find_and_compare(store):
+    names = [f"s{i:03d}" for i in range(300)]
+    drivers = [{"volume": 200 + 10 * (i % 100), "bad_debt_rate": i % 7} for i in range(300)]
+    assert store.save_many(names, drivers, tags=["sweep"]) == 300
+    assert store.tags() == {"sweep": 300}
+    assert store.find(volume=250, bad_debt_rate=5) == ["s005"]
+    assert len(store.find(tol=10, volume=250)) == 9
+
+    current = evaluate_one(**DEFAULTS)
+    diff = store.compare(current, columns=("total_profit", "unit_cost"), tag="sweep")
+    assert len(diff["name"]) == 300
+    deltas = diff["delta_total_profit"]
+    assert deltas == sorted(deltas, reverse=True)
+    best = store.load(diff["name"][0])["outputs"]
+    assert diff["total_profit"][0] == pytest.approx(best["total_profit"])
+    assert deltas[0] == pytest.approx(best["total_profit"] - current["total_profit"])
+    assert store.compare(current, tag="none")["name"] == []
+
+
+def test_find_rejects_unknown_drivers(store):
+    with pytest.raises(ValueError, match="unknown drivers"):
+        store.find(speed=1)